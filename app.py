@@ -12,9 +12,29 @@ def create_app():
 
     # 配置
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
-    app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
+    app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB（单次请求；分块上传的文件大小由 UPLOAD_MAX_SIZE 限制）
+    app.config['UPLOAD_CHUNK_SIZE'] = int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # 分块上传每块大小，不能超过 MAX_CONTENT_LENGTH（启动时检查）
+    app.config['UPLOAD_MAX_SIZE'] = int(os.environ.get('UPLOAD_MAX_SIZE', 1024 * 1024 * 1024))  # 分块上传的文件大小上限，0 为不限制
+    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads')  # 存储根目录（共享存储时为各节点挂载的共享目录）
+    app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'local')  # 存储后端：local / shared
+    app.config['SCRATCH_FOLDER'] = os.environ.get('SCRATCH_FOLDER', '')  # 共享存储时本机临时文件目录，空为系统临时目录
     app.config['TEMPLATES_FOLDER'] = os.path.join(os.path.dirname(__file__), 'core', 'templates')
+    app.config['COMPARE_MAX_WORKERS'] = int(os.environ.get('COMPARE_MAX_WORKERS', 2))  # 每个进程同时执行的比对任务数
+    app.config['INGEST_MAX_WORKERS'] = int(os.environ.get('INGEST_MAX_WORKERS', 0))  # 多工作表全国库并行解析的进程数，0 为 CPU 核数
+    app.config['EXCEL_ENGINE'] = os.environ.get('EXCEL_ENGINE', 'auto')  # Excel 解析引擎：auto / calamine / xlrd / openpyxl
+    app.config['ADMISSION_MAX_RUNNING'] = int(os.environ.get('ADMISSION_MAX_RUNNING', 2))  # 节点上同时执行的比对/导出任务数
+    app.config['ADMISSION_QUEUE_SIZE'] = int(os.environ.get('ADMISSION_QUEUE_SIZE', 8))  # 节点上排队等待的比对任务数，超过时返回 429
+    app.config['ADMISSION_MEMORY_BUDGET'] = int(os.environ.get('ADMISSION_MEMORY_BUDGET', 0))  # 运行中任务内存估算上限（字节），0 为物理内存的一半
+    app.config['ADMISSION_RETRY_AFTER'] = int(os.environ.get('ADMISSION_RETRY_AFTER', 30))  # 429 响应的 Retry-After（秒）
+    app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 结果缓存容量，0 为禁用
+    app.config['REFERENCE_DATE'] = os.environ.get('REFERENCE_DATE', '2025-12-31')  # 党龄/年龄计算基准日期
+    app.config['COMPACT_DTYPES'] = os.environ.get('COMPACT_DTYPES', '1') != '0'  # 解析后转换为紧凑类型
+    app.config['DUPLICATE_ID_POLICY'] = os.environ.get('DUPLICATE_ID_POLICY', 'first')  # 身份证号重复时：first / last / reject
+    app.config['COMPARE_MODE'] = os.environ.get('COMPARE_MODE', 'auto')  # 比对方式：auto / memory / external
+    app.config['EXTERNAL_COMPARE_MIN_ROWS'] = int(os.environ.get('EXTERNAL_COMPARE_MIN_ROWS', 1000000))  # auto 时两库合计超过该行数使用外部排序比对
+    app.config['EXTERNAL_CHUNK_ROWS'] = int(os.environ.get('EXTERNAL_CHUNK_ROWS', 50000))  # 外部排序比对每块行数
+    app.config['PROFILE_REQUESTS'] = os.environ.get('PROFILE_REQUESTS', '0') == '1'  # 剖析所有比对/下载请求
+    app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN', '')  # 携带 X-Profile-Token 的请求被剖析
 
     # 确保上传目录存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
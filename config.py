@@ -11,10 +11,42 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
 
     # 文件上传配置
-    MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
+    MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB（单次请求；分块上传的文件大小由 UPLOAD_MAX_SIZE 限制）
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # 分块上传每块大小，不能超过 MAX_CONTENT_LENGTH（启动时检查）
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 1024 * 1024 * 1024))  # 分块上传的文件大小上限（1GB），0 为不限制
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads')
     TEMPLATES_FOLDER = os.path.join(os.path.dirname(__file__), 'core', 'templates')
 
+    # 存储后端配置
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')  # local（单节点）/ shared（多节点挂载同一目录，需设置 SECRET_KEY）
+    SCRATCH_FOLDER = os.environ.get('SCRATCH_FOLDER', '')  # 共享存储时本机临时文件目录，空为系统临时目录
+
+    # 后台比对任务配置
+    COMPARE_MAX_WORKERS = int(os.environ.get('COMPARE_MAX_WORKERS', 2))  # 每个进程同时执行的比对任务数
+    INGEST_MAX_WORKERS = int(os.environ.get('INGEST_MAX_WORKERS', 0))  # 多工作表全国库并行解析的进程数，0 为 CPU 核数
+    EXCEL_ENGINE = os.environ.get('EXCEL_ENGINE', 'auto')  # Excel 解析引擎：auto（已安装 calamine 时优先）/ calamine / xlrd / openpyxl
+
+    # 节点准入控制配置（对节点上所有 worker 进程生效）
+    ADMISSION_MAX_RUNNING = int(os.environ.get('ADMISSION_MAX_RUNNING', 2))  # 节点上同时执行的比对/导出任务数
+    ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 8))  # 节点上排队等待的比对任务数，超过时返回 429
+    ADMISSION_MEMORY_BUDGET = int(os.environ.get('ADMISSION_MEMORY_BUDGET', 0))  # 运行中任务内存估算合计上限（字节），0 为物理内存的一半
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 30))  # 429 响应的 Retry-After（秒）
+
+    # 比对结果缓存配置
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 512MB，0 为禁用
+
+    # 比对计算配置
+    REFERENCE_DATE = os.environ.get('REFERENCE_DATE', '2025-12-31')  # 党龄/年龄计算基准日期
+    COMPACT_DTYPES = os.environ.get('COMPACT_DTYPES', '1') != '0'  # 解析后转换为紧凑类型（category / Arrow 字符串）
+    DUPLICATE_ID_POLICY = os.environ.get('DUPLICATE_ID_POLICY', 'first')  # 身份证号重复时：first / last（保留第一行/最后一行）/ reject（拒绝比对）
+    COMPARE_MODE = os.environ.get('COMPARE_MODE', 'auto')  # 比对方式：auto / memory（全部读入内存）/ external（外部排序）
+    EXTERNAL_COMPARE_MIN_ROWS = int(os.environ.get('EXTERNAL_COMPARE_MIN_ROWS', 1000000))  # auto 时两库合计超过该行数使用外部排序比对
+    EXTERNAL_CHUNK_ROWS = int(os.environ.get('EXTERNAL_CHUNK_ROWS', 50000))  # 外部排序比对每块行数（决定内存上限）
+
+    # 性能剖析配置（默认关闭）
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'  # 剖析所有比对/下载请求
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')  # 非空时，请求头 X-Profile-Token 与之相同的请求被剖析
+
     # 会话配置
     SESSION_TYPE = 'filesystem'
     PERMANENT_SESSION_LIFETIME = 3600  # 1小时
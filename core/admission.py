@@ -0,0 +1,438 @@
+"""
+准入控制模块 - 限制单个节点上同时执行的比对和导出任务
+
+每个 gunicorn worker 进程都有自己的后台线程池，月底集中上传时节点上同时
+运行的比对数可能超出内存承受能力。准入控制在节点本地目录中以文件锁维护
+两组槽位，对该节点上的所有 worker 进程生效：
+
+- 等待槽（queue-<n>.lock）：已提交、尚未开始执行的任务。等待槽已满时
+  提交被拒绝（路由返回 429 和 Retry-After）
+- 运行槽（run-<n>.lock）：正在执行的任务。运行中任务的内存估算合计加上
+  新任务的估算超过内存预算时，新任务继续等待（节点空闲时总是放行，
+  超过预算的单个任务不会永远等待）
+
+持有槽位时在同名 .json 文件中记录内存估算。文件锁随进程退出自动释放，
+worker 崩溃或被回收不会遗留占用。
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from core import metrics
+from core.external_compare import count_rows
+
+logger = logging.getLogger(__name__)
+
+# 节点本地状态目录的名称
+ADMISSION_DIRNAME = 'party-compare-admission'
+
+# 等待运行槽时的轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+# 内存比对每行（两库合计）的内存估算（字节），参考 scripts/benchmark_memory.py 的
+# 实测峰值增量（紧凑类型 20 万行约 1.2KB/行）
+COMPARE_ROW_BYTES = 1200
+
+# 外部排序比对的内存估算：块行数 × 每行估算 × 该倍数（两库各一块及归并缓冲）
+EXTERNAL_CHUNK_FACTOR = 4
+
+# 没有解析缓存（行数未知）时按 Excel 文件大小的倍数估算
+EXCEL_SIZE_FACTOR = 10
+
+# 导出报告每行（各分区合计）的内存估算（字节）
+EXPORT_ROW_BYTES = 400
+
+# 未配置内存预算时使用物理内存的比例
+DEFAULT_MEMORY_FRACTION = 0.5
+
+
+class AdmissionRejected(Exception):
+    """节点繁忙，任务未被接受"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _try_lock(fd):
+    """尝试以非阻塞方式锁定文件"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _lock(fd):
+    """阻塞锁定文件"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def physical_memory():
+    """
+    读取节点物理内存
+
+    Returns:
+        int: 字节数，平台不支持时返回 None
+    """
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimate_compare_memory(local_source, national_source, external=False,
+                            chunk_rows=None):
+    """
+    估算一次比对的内存占用
+
+    Args:
+        local_source: 单机库解析缓存或 Excel 文件路径
+        national_source: 全国库解析缓存或 Excel 文件路径
+        external: 是否使用外部排序比对
+        chunk_rows: 外部排序比对每块行数
+
+    Returns:
+        int: 估算字节数
+    """
+    if external and chunk_rows:
+        return chunk_rows * COMPARE_ROW_BYTES * EXTERNAL_CHUNK_FACTOR
+
+    total = 0
+    for path in (local_source, national_source):
+        rows = count_rows(path)
+        if rows is not None:
+            total += rows * COMPARE_ROW_BYTES
+        elif path and os.path.exists(path):
+            total += os.path.getsize(path) * EXCEL_SIZE_FACTOR
+    return total
+
+
+def estimate_excel_memory(paths):
+    """
+    估算直接读取一组 Excel 文件的内存占用
+
+    Args:
+        paths: Excel 文件路径列表
+
+    Returns:
+        int: 估算字节数
+    """
+    return sum(os.path.getsize(path) * EXCEL_SIZE_FACTOR for path in paths)
+
+
+def estimate_export_memory(rows):
+    """
+    估算导出报告的内存占用
+
+    Args:
+        rows: 导出的总行数
+
+    Returns:
+        int: 估算字节数
+    """
+    return rows * EXPORT_ROW_BYTES
+
+
+class _Slot:
+    """已持有的槽位（文件锁）"""
+
+    def __init__(self, lock_path, fd):
+        self.lock_path = lock_path
+        self.fd = fd
+
+    @property
+    def info_path(self):
+        return os.path.splitext(self.lock_path)[0] + '.json'
+
+    def write_info(self, **info):
+        with open(self.info_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+
+    def release(self):
+        # 先删除记录再解锁，避免删除其他任务刚写入的记录
+        try:
+            os.remove(self.info_path)
+        except OSError:
+            pass
+        _unlock(self.fd)
+        os.close(self.fd)
+
+
+class Ticket:
+    """
+    已接受的任务
+
+    提交时占用等待槽，wait() 取得运行槽后释放等待槽，release() 释放全部
+    槽位（可重复调用）。
+    """
+
+    def __init__(self, controller, estimate, kind, queue_slot=None):
+        self.controller = controller
+        self.estimate = estimate
+        self.kind = kind
+        self._queue_slot = queue_slot
+        self._run_slot = None
+
+    def wait(self, check=None):
+        """
+        等待运行槽
+
+        Args:
+            check: 每次轮询时调用的回调（可抛出异常中止等待，如任务取消）
+        """
+        while self._run_slot is None:
+            slot = self.controller._try_run(self.estimate, self.kind)
+            if slot is not None:
+                self._run_slot = slot
+                self._release_queue_slot()
+                return
+            if check is not None:
+                check()
+            time.sleep(self.controller.poll_interval)
+
+    def _release_queue_slot(self):
+        if self._queue_slot is not None:
+            self._queue_slot.release()
+            self._queue_slot = None
+
+    def release(self):
+        """释放占用的槽位"""
+        self._release_queue_slot()
+        if self._run_slot is not None:
+            self._run_slot.release()
+            self._run_slot = None
+
+
+class AdmissionController:
+    """节点级准入控制"""
+
+    def __init__(self, state_dir, max_running=2, max_queued=8, memory_budget=None,
+                 retry_after=30, poll_interval=POLL_INTERVAL):
+        """
+        初始化准入控制
+
+        Args:
+            state_dir: 节点本地状态目录（同一节点的所有 worker 使用同一目录）
+            max_running: 节点上同时执行的最大任务数
+            max_queued: 节点上排队等待的最大任务数
+            memory_budget: 运行中任务的内存估算合计上限（字节），
+                为空时取物理内存的 DEFAULT_MEMORY_FRACTION
+            retry_after: 拒绝时建议客户端等待的秒数
+            poll_interval: 等待运行槽时的轮询间隔（秒）
+        """
+        self.state_dir = state_dir
+        self.max_running = max(1, max_running)
+        self.max_queued = max(0, max_queued)
+        if not memory_budget:
+            memory = physical_memory()
+            memory_budget = int(memory * DEFAULT_MEMORY_FRACTION) if memory else None
+        self.memory_budget = memory_budget
+        self.retry_after = retry_after
+        self.poll_interval = poll_interval
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _lock_path(self, kind, index):
+        return os.path.join(self.state_dir, f'{kind}-{index}.lock')
+
+    @contextmanager
+    def _mutex(self):
+        """节点内串行化准入判断"""
+        fd = os.open(os.path.join(self.state_dir, 'admission.lock'), os.O_RDWR | os.O_CREAT)
+        try:
+            _lock(fd)
+            try:
+                yield
+            finally:
+                _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def _scan(self, kind, count):
+        """
+        检查一组槽位
+
+        Returns:
+            tuple: (第一个空闲槽位的 _Slot（已锁定）或 None, 已占用槽位的记录列表)
+        """
+        free = None
+        held = []
+        for index in range(count):
+            path = self._lock_path(kind, index)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT)
+            if _try_lock(fd):
+                if free is None:
+                    free = _Slot(path, fd)
+                else:
+                    _unlock(fd)
+                    os.close(fd)
+                continue
+            os.close(fd)
+            held.append(self._read_info(path))
+        return free, held
+
+    @staticmethod
+    def _read_info(lock_path):
+        try:
+            with open(os.path.splitext(lock_path)[0] + '.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 持有者尚未写入记录
+            return {}
+
+    def enqueue(self, estimate, kind='compare', force=False):
+        """
+        接受任务并占用等待槽
+
+        Args:
+            estimate: 任务的内存估算（字节）
+            kind: 任务类型（记录在槽位中，便于排查）
+            force: 等待槽已满时也接受（用于比对完成后自动提交的导出任务）
+
+        Returns:
+            Ticket: 已接受的任务
+
+        Raises:
+            AdmissionRejected: 等待槽已满
+        """
+        with self._mutex():
+            slot, _ = self._scan('queue', self.max_queued)
+            if slot is not None:
+                slot.write_info(kind=kind, bytes=estimate, pid=os.getpid())
+                return Ticket(self, estimate, kind, slot)
+
+        if force:
+            return Ticket(self, estimate, kind)
+        metrics.ADMISSION_REJECTED.labels(kind).inc()
+        logger.warning(f"节点繁忙，拒绝{kind}任务（等待队列已满: {self.max_queued}）")
+        raise AdmissionRejected('服务器繁忙', self.retry_after)
+
+    def _try_run(self, estimate, kind):
+        """尝试占用运行槽（内存预算不足或没有空闲槽时返回 None）"""
+        with self._mutex():
+            slot, running = self._scan('run', self.max_running)
+            if slot is None:
+                return None
+
+            reserved = sum(info.get('bytes', 0) for info in running)
+            if running and self.memory_budget and reserved + estimate > self.memory_budget:
+                slot.release()
+                return None
+
+            slot.write_info(kind=kind, bytes=estimate, pid=os.getpid())
+            return slot
+
+    def try_run(self, estimate, kind='sync'):
+        """
+        立即占用运行槽，不排队（用于同步请求）
+
+        Args:
+            estimate: 任务的内存估算（字节）
+            kind: 任务类型
+
+        Returns:
+            Ticket: 已持有运行槽的任务
+
+        Raises:
+            AdmissionRejected: 没有空闲运行槽或内存预算不足
+        """
+        slot = self._try_run(estimate, kind)
+        if slot is None:
+            metrics.ADMISSION_REJECTED.labels(kind).inc()
+            raise AdmissionRejected('服务器繁忙', self.retry_after)
+        ticket = Ticket(self, estimate, kind)
+        ticket._run_slot = slot
+        return ticket
+
+    def stats(self):
+        """
+        节点当前的准入状态
+
+        Returns:
+            dict: running、queued（等待槽占用数）、reserved_bytes（运行中任务的
+                内存估算合计）及各项上限
+        """
+        with self._mutex():
+            free_run, running = self._scan('run', self.max_running)
+            free_queue, queued = self._scan('queue', self.max_queued)
+        for slot in (free_run, free_queue):
+            if slot is not None:
+                slot.release()
+        return {
+            'running': len(running),
+            'queued': len(queued),
+            'reserved_bytes': sum(info.get('bytes', 0) for info in running),
+            'max_running': self.max_running,
+            'max_queued': self.max_queued,
+            'memory_budget': self.memory_budget,
+        }
+
+
+def default_state_dir(scratch_root=None):
+    """
+    节点本地状态目录
+
+    Args:
+        scratch_root: 本机临时目录（默认系统临时目录）
+
+    Returns:
+        str: 目录路径
+    """
+    return os.path.join(scratch_root or tempfile.gettempdir(), ADMISSION_DIRNAME)
+
+
+# 创建全局准入控制实例（将在 app 启动时初始化）
+admission_controller = None
+
+
+def init_admission_controller(state_dir, max_running=2, max_queued=8,
+                              memory_budget=None, retry_after=30):
+    """
+    初始化全局准入控制实例
+
+    Args:
+        参数见 AdmissionController
+    """
+    global admission_controller
+    admission_controller = AdmissionController(
+        state_dir, max_running, max_queued, memory_budget, retry_after
+    )
+    budget = admission_controller.memory_budget
+    logger.info(
+        f"准入控制初始化完成，同时执行: {max_running}，等待队列: {max_queued}，"
+        f"内存预算: {budget // (1024 * 1024) if budget else '不限'}MB"
+    )
+
+
+def get_admission_controller():
+    """
+    获取全局准入控制实例
+
+    Returns:
+        AdmissionController: 准入控制实例
+    """
+    if admission_controller is None:
+        raise RuntimeError("准入控制尚未初始化，请先调用 init_admission_controller()")
+    return admission_controller
@@ -0,0 +1,385 @@
+"""
+批量比对模块 - 以进程池并行比对多个党委的单机库/全国库
+
+每个党委一对文件，来源可以是清单文件或目录：
+
+- 清单（JSON）：[{"name": "燕子山矿", "local": "a.xls", "national": "b.xls"}, ...]，
+  相对路径相对于清单文件所在目录，可选 "national_sheet" 指定全国库工作表
+  （名称或索引，多张工作表时为数组）
+- 目录：每个子目录为一个党委（子目录名即党委名称），其中的 Excel 文件
+  按表头签名（core.template_registry）自动识别单机库和全国库工作表
+
+全国库有多张工作表时依次解析并合并（见 core.ingest），不再另开进程。
+
+每对文件在独立进程中完成模板校验、比对和报告导出，阶段进度通过队列实时
+回传；全部完成后写出汇总 JSON 和汇总 Excel。
+"""
+import os
+import json
+import time
+import queue
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import pandas as pd
+
+from core import exporter, file_handler, incremental, ingest, template_registry, validator
+from core.comparison import ComparisonEngine
+
+logger = logging.getLogger(__name__)
+
+# 汇总文件名
+SUMMARY_JSON_FILENAME = 'summary.json'
+SUMMARY_EXCEL_FILENAME = '汇总.xlsx'
+
+# 主进程等待进度事件的间隔（秒）
+PROGRESS_POLL_INTERVAL = 0.2
+
+# 汇总 Excel 的列：(汇总字段, 列名)
+SUMMARY_COLUMNS = [
+    ('name', '党委'),
+    ('status', '状态'),
+    ('local_rows', '单机库人数'),
+    ('national_rows', '全国库人数'),
+    ('local_extra', '单机多出'),
+    ('national_extra', '全国多出'),
+    ('invalid_ids', '无效身份证号'),
+    ('duplicates', '重复身份证号'),
+] + [
+    (f'diff_{field}', f'{field}差异') for field in ComparisonEngine.COMPARE_FIELDS
+] + [
+    ('added', '新增人员'),
+    ('removed', '删除人员'),
+    ('modified', '修改人员'),
+    ('seconds', '耗时(秒)'),
+    ('report', '报告文件'),
+    ('error', '错误信息'),
+]
+
+
+def load_manifest(manifest_path):
+    """
+    读取批量比对清单
+
+    Args:
+        manifest_path: JSON 清单文件路径
+
+    Returns:
+        list: [{'name', 'local', 'national', 'national_sheets'}, ...]
+
+    Raises:
+        ValueError: 清单格式错误
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    if not isinstance(entries, list):
+        raise ValueError('清单必须是 JSON 数组')
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get('local') or not entry.get('national'):
+            raise ValueError(f'清单第 {index + 1} 项缺少 local 或 national')
+        sheets = entry.get('national_sheet', 0)
+        if not isinstance(sheets, list):
+            sheets = [sheets]
+        pairs.append({
+            'name': entry.get('name') or f'第{index + 1}组',
+            'local': os.path.join(base_dir, entry['local']),
+            'national': os.path.join(base_dir, entry['national']),
+            'national_sheets': [(sheet, str(sheet)) for sheet in sheets]
+        })
+    return _check_names(pairs)
+
+
+def discover_pairs(directory, templates_folder):
+    """
+    在目录中查找待比对的文件对
+
+    每个子目录为一个党委，其中各 Excel 文件的每个工作表按表头签名识别为
+    单机库或全国库（全国库可以是多工作表导出中的任意一张）；识别失败的
+    子目录也会返回，由比对时报告错误。
+
+    Args:
+        directory: 根目录
+        templates_folder: 模板文件所在目录
+
+    Returns:
+        list: [{'name', 'local', 'national', 'national_sheets'}, ...]
+    """
+    registry = template_registry.TemplateRegistry(templates_folder).load()
+
+    pairs = []
+    for name in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, name)
+        if not os.path.isdir(folder):
+            continue
+
+        local_path = national_path = None
+        national_sheets = []
+        for filename in sorted(os.listdir(folder)):
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path) or not file_handler.allowed_file(filename):
+                continue
+            try:
+                matches = registry.classify(path)
+            except Exception as e:
+                logger.warning(f"识别文件类型失败 {path}: {e}")
+                continue
+
+            # 单机库和全国库按 pd.read_excel 默认方式读取，表头必须在第一行；
+            # 全国库取第一个含全国库工作表的文件中的所有全国库工作表
+            for match in matches:
+                if match['header_row'] != 0:
+                    continue
+                if local_path is None and match['type'] == 'local' and match['sheet'] == 0:
+                    local_path = path
+                elif match['type'] == 'national' and national_path in (None, path):
+                    national_path = path
+                    national_sheets.append((match['sheet'], match['name']))
+
+        pairs.append({
+            'name': name,
+            'local': local_path,
+            'national': national_path,
+            'national_sheets': national_sheets or [(0, None)]
+        })
+
+    logger.info(f"在 {directory} 中找到 {len(pairs)} 个党委")
+    return _check_names(pairs)
+
+
+def _check_names(pairs):
+    """党委名称用作输出文件名，不能重复"""
+    names = [pair['name'] for pair in pairs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f'党委名称重复: {duplicates}')
+    return pairs
+
+
+def _report_filename(name):
+    """党委报告文件名（去除路径分隔符等非法字符）"""
+    safe = ''.join('_' if ch in '\\/:*?"<>|' else ch for ch in str(name)).strip() or 'report'
+    return f'{safe}.xlsx'
+
+
+def compare_pair(pair, output_folder, reference_date=None, compact=True, events=None,
+                 state_folder=None, duplicate_policy=None):
+    """
+    比对一对文件并导出报告（在工作进程中执行）
+
+    Args:
+        pair: {'name', 'local', 'national', 'national_sheets'}
+            （national_sheets 为全国库工作表列表 [(索引或名称, 名称), ...]，默认第一张）
+        output_folder: 报告输出目录
+        reference_date: 党龄/年龄计算基准日期
+        compact: 解析后是否转换为紧凑类型
+        events: 进度队列（可选），放入 (党委名称, 阶段) 元组
+        state_folder: 增量比对状态根目录（可选），每个党委一个子目录；
+                      有上次状态时只重新比对变化的人员，报告附带变化情况
+        duplicate_policy: 身份证号重复时的处理方式（见 ComparisonEngine）
+
+    Returns:
+        dict: 该党委的汇总结果（失败时 status 为 'failed' 并附错误信息）
+    """
+    name = pair['name']
+    start = time.perf_counter()
+    summary = {'name': name, 'status': 'failed', 'local': pair['local'], 'national': pair['national']}
+
+    def progress(phase):
+        if events is not None:
+            events.put((name, phase))
+
+    try:
+        if not pair['local'] or not pair['national']:
+            raise ValueError('未找到符合模板的单机库或全国库文件')
+
+        progress('validate')
+        template_validator = validator.get_validator()
+        national_sheets = pair.get('national_sheets') or [(0, None)]
+        for label, result in [
+            ('单机库', template_validator.validate_local_template(pair['local']))
+        ] + [
+            ('全国库', template_validator.validate_national_template(pair['national'], sheet_name=sheet))
+            for sheet, _ in national_sheets
+        ]:
+            if not result.get('valid'):
+                raise ValueError(
+                    f"{label}模板校验失败: "
+                    f"{result.get('error') or result.get('missing_columns') or result.get('extra_columns')}"
+                )
+
+        progress('read')
+        df_local = file_handler.read_roster(pair['local'], compact=compact)
+        df_national = ingest.read_sheets(
+            pair['national'], national_sheets, compact=compact, max_workers=1
+        )
+
+        if state_folder:
+            results = incremental.compare_incremental(
+                df_local, df_national,
+                os.path.join(state_folder, os.path.splitext(_report_filename(name))[0]),
+                reference_date,
+                progress=progress,
+                duplicate_policy=duplicate_policy
+            )
+        else:
+            engine = ComparisonEngine(df_local, df_national, reference_date, duplicate_policy)
+            results = engine.generate_report(progress=progress)
+
+        progress('export')
+        report_path = exporter.write_report(
+            results, os.path.join(output_folder, _report_filename(name))
+        )
+
+        summary.update({
+            'status': 'done',
+            'local_rows': len(df_local),
+            'national_rows': len(df_national),
+            'local_extra': len(results['local_extra']),
+            'national_extra': len(results['national_extra']),
+            'invalid_ids': len(results['invalid_ids']),
+            'duplicates': int(results['duplicate_ids'][['库', '身份证号']].drop_duplicates().shape[0]),
+            'report': report_path,
+        })
+        for field in ComparisonEngine.COMPARE_FIELDS:
+            summary[f'diff_{field}'] = len(results[f'diff_{field}'])
+
+        changes = results.get(incremental.CHANGES_SECTION)
+        if changes is not None:
+            counts = changes['变化'].value_counts()
+            summary['added'] = int(counts.get(incremental.CHANGE_ADDED, 0))
+            summary['removed'] = int(counts.get(incremental.CHANGE_REMOVED, 0))
+            summary['modified'] = int(counts.get(incremental.CHANGE_MODIFIED, 0))
+
+    except Exception as e:
+        logger.error(f"党委 {name} 比对失败: {e}")
+        summary['error'] = str(e)
+
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    progress(summary['status'])
+    return summary
+
+
+def run_batch(pairs, output_folder, templates_folder, workers=None,
+              reference_date=None, compact=True, on_progress=None, state_folder=None,
+              duplicate_policy=None):
+    """
+    以进程池并行比对所有文件对，并写出汇总 JSON 和汇总 Excel
+
+    Args:
+        pairs: 文件对列表（来自 load_manifest / discover_pairs）
+        output_folder: 输出目录（各党委报告和汇总文件）
+        templates_folder: 模板文件所在目录
+        workers: 进程数（默认 CPU 核数，且不超过文件对数）
+        reference_date: 党龄/年龄计算基准日期
+        compact: 解析后是否转换为紧凑类型
+        on_progress: 进度回调 on_progress(党委名称, 阶段)，在主进程中调用
+        state_folder: 增量比对状态根目录（可选，见 compare_pair）
+        duplicate_policy: 身份证号重复时的处理方式（见 ComparisonEngine）
+
+    Returns:
+        dict: 汇总结果（同 summary.json）
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pairs) or 1))
+    started_at = datetime.now()
+    logger.info(f"开始批量比对: {len(pairs)} 个党委，{workers} 个进程")
+
+    def drain(events, block):
+        """将队列中的进度事件交给回调"""
+        timeout = PROGRESS_POLL_INTERVAL if block else 0
+        while True:
+            try:
+                name, phase = events.get(timeout=timeout) if timeout else events.get_nowait()
+            except queue.Empty:
+                return
+            timeout = 0
+            if on_progress:
+                on_progress(name, phase)
+
+    summaries = {}
+    with multiprocessing.Manager() as manager:
+        events = manager.Queue()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=validator.init_validator,
+            initargs=(templates_folder,)
+        ) as executor:
+            pending = {
+                executor.submit(
+                    compare_pair, pair, output_folder, reference_date, compact, events,
+                    state_folder, duplicate_policy
+                ): pair['name']
+                for pair in pairs
+            }
+            while pending:
+                drain(events, block=True)
+                done, _ = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        summaries[name] = future.result()
+                    except Exception as e:
+                        # 工作进程异常退出等无法在进程内捕获的错误
+                        logger.error(f"党委 {name} 比对失败: {e}")
+                        summaries[name] = {'name': name, 'status': 'failed', 'error': str(e)}
+                        if on_progress:
+                            on_progress(name, 'failed')
+            drain(events, block=False)
+
+    # 按输入顺序汇总
+    committees = [summaries[pair['name']] for pair in pairs]
+    summary = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'reference_date': reference_date or ComparisonEngine.REFERENCE_DATE,
+        'duplicate_policy': duplicate_policy or ComparisonEngine.DUPLICATE_POLICY,
+        'workers': workers,
+        'total': len(committees),
+        'succeeded': sum(1 for item in committees if item['status'] == 'done'),
+        'failed': sum(1 for item in committees if item['status'] != 'done'),
+        'committees': committees,
+    }
+
+    write_summary(summary, output_folder)
+    logger.info(
+        f"批量比对完成: 成功 {summary['succeeded']} 个，失败 {summary['failed']} 个"
+    )
+    return summary
+
+
+def write_summary(summary, output_folder):
+    """
+    写出汇总 JSON 和汇总 Excel
+
+    Args:
+        summary: run_batch 生成的汇总结果
+        output_folder: 输出目录
+
+    Returns:
+        tuple: (JSON 路径, Excel 路径)
+    """
+    json_path = os.path.join(output_folder, SUMMARY_JSON_FILENAME)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    rows = [
+        [item.get(key) for key, _ in SUMMARY_COLUMNS]
+        for item in summary['committees']
+    ]
+    df = pd.DataFrame(rows, columns=[label for _, label in SUMMARY_COLUMNS], dtype=object)
+    df['状态'] = df['状态'].map({'done': '成功', 'failed': '失败'}).fillna(df['状态'])
+    df['报告文件'] = df['报告文件'].map(lambda path: os.path.basename(path) if path else None)
+
+    excel_path = os.path.join(output_folder, SUMMARY_EXCEL_FILENAME)
+    with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
+        df.to_excel(writer, sheet_name='汇总', index=False)
+        writer.sheets['汇总'].set_column(0, len(SUMMARY_COLUMNS) - 1, 12)
+
+    logger.info(f"汇总已写出: {json_path}, {excel_path}")
+    return json_path, excel_path
@@ -0,0 +1,259 @@
+"""
+分块上传模块 - 可续传的分块上传会话
+
+大文件分块上传，每个请求只携带一块，不受单次请求大小限制。上传会话保存
+在会话目录的 chunked/<上传 ID>/ 下：meta.json 记录名册类型、文件名、总大小
+和表头检查状态，data 为已接收的内容。已接收的字节数即 data 文件的大小，
+客户端中断后查询偏移量，从该位置继续上传；存储后端为共享目录时任意节点
+都能继续同一上传。
+
+同一上传的分块写入以 lock 文件的排他锁串行化（与 core.admission 相同的
+文件锁）：客户端重试的分块可能在前一个请求仍在写入时到达，或由另一个
+worker 线程、另一个节点处理，未取得锁的请求按偏移量不一致处理。
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from core.file_handler import HASH_CHUNK_SIZE, allowed_file
+
+logger = logging.getLogger(__name__)
+
+# 上传会话信息和数据文件名
+META_FILENAME = 'meta.json'
+DATA_FILENAME = 'data'
+LOCK_FILENAME = 'lock'
+
+
+class UploadOffsetMismatch(Exception):
+    """分块的偏移量与已接收的字节数不一致"""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+def is_valid_upload_id(upload_id):
+    """上传 ID 是否为合法的 UUID（防止路径遍历）"""
+    try:
+        return uuid.UUID(upload_id).hex == upload_id
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+def _try_lock(fd):
+    """尝试以非阻塞方式锁定文件"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class ChunkedUpload:
+    """一次分块上传"""
+
+    def __init__(self, upload_dir, meta):
+        """
+        Args:
+            upload_dir: 上传会话目录
+            meta: 上传会话信息
+        """
+        self.upload_dir = upload_dir
+        self.meta = meta
+
+    @classmethod
+    def create(cls, parent_dir, kind, filename, size, max_size=0):
+        """
+        创建上传会话
+
+        Args:
+            parent_dir: 分块上传目录（storage.chunked_dir）
+            kind: 名册类型（local / national）
+            filename: 原始文件名
+            size: 文件总大小（字节）
+            max_size: 允许的最大文件大小（字节），0 为不限制
+
+        Returns:
+            ChunkedUpload: 上传会话
+
+        Raises:
+            ValueError: 文件类型不允许或大小无效
+        """
+        if not filename or not allowed_file(filename):
+            raise ValueError('文件类型不允许，仅支持 .xls, .xlsx')
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError('文件大小无效')
+        if max_size and size > max_size:
+            raise ValueError(f'文件大小超过限制(最大 {max_size // (1024 * 1024)}MB)')
+
+        upload_id = uuid.uuid4().hex
+        upload_dir = os.path.join(parent_dir, upload_id)
+        os.makedirs(upload_dir)
+        open(os.path.join(upload_dir, DATA_FILENAME), 'wb').close()
+
+        upload = cls(upload_dir, {
+            'upload_id': upload_id,
+            'kind': kind,
+            'filename': filename,
+            'size': size,
+            'header_checked': False
+        })
+        upload.save_meta()
+        logger.info(f"创建分块上传 {upload_id}: {filename}（{size} 字节）")
+        return upload
+
+    @classmethod
+    def open(cls, parent_dir, upload_id):
+        """
+        打开已有的上传会话
+
+        Args:
+            parent_dir: 分块上传目录
+            upload_id: 上传 ID
+
+        Returns:
+            ChunkedUpload: 上传会话，不存在时返回 None
+        """
+        if not is_valid_upload_id(upload_id):
+            return None
+        upload_dir = os.path.join(parent_dir, upload_id)
+        try:
+            with open(os.path.join(upload_dir, META_FILENAME), 'r', encoding='utf-8') as f:
+                return cls(upload_dir, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def upload_id(self):
+        return self.meta['upload_id']
+
+    @property
+    def kind(self):
+        return self.meta['kind']
+
+    @property
+    def filename(self):
+        return self.meta['filename']
+
+    @property
+    def size(self):
+        return self.meta['size']
+
+    @property
+    def data_path(self):
+        """已接收内容的文件路径"""
+        return os.path.join(self.upload_dir, DATA_FILENAME)
+
+    @property
+    def offset(self):
+        """已接收的字节数"""
+        return os.path.getsize(self.data_path)
+
+    @property
+    def complete(self):
+        return self.offset >= self.size
+
+    @property
+    def is_xlsx(self):
+        return os.path.splitext(self.filename)[1].lower() == '.xlsx'
+
+    def save_meta(self):
+        """写入上传会话信息（先写临时文件再替换，避免读到不完整的内容）"""
+        meta_path = os.path.join(self.upload_dir, META_FILENAME)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def append(self, stream, offset):
+        """
+        追加一块数据
+
+        Args:
+            stream: 请求体数据流
+            offset: 该块在文件中的起始位置
+
+        Returns:
+            int: 追加后已接收的字节数
+
+        Raises:
+            UploadOffsetMismatch: 偏移量与已接收的字节数不一致，或其他请求正在写入该上传
+                （客户端应从返回的偏移量继续）
+            ValueError: 数据超过声明的文件大小
+        """
+        fd = os.open(os.path.join(self.upload_dir, LOCK_FILENAME), os.O_RDWR | os.O_CREAT)
+        try:
+            if not _try_lock(fd):
+                raise UploadOffsetMismatch('该上传正在写入其他分块', self.offset)
+            try:
+                # 持有锁后重新读取已接收的字节数
+                current = self.offset
+                if offset != current:
+                    raise UploadOffsetMismatch('分块偏移量不一致', current)
+
+                received = current
+                with open(self.data_path, 'ab') as f:
+                    try:
+                        while True:
+                            chunk = stream.read(HASH_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            received += len(chunk)
+                            if received > self.size:
+                                raise ValueError('上传的数据超过声明的文件大小')
+                            f.write(chunk)
+                    except ValueError:
+                        f.truncate(current)
+                        raise
+                return received
+            finally:
+                _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def finish(self, filepath):
+        """
+        上传完成：将数据移动到目标路径，计算内容的 SHA-256 并删除上传会话
+
+        Args:
+            filepath: 目标文件路径
+
+        Returns:
+            str: 文件内容 SHA-256 十六进制摘要
+        """
+        digest = hashlib.sha256()
+        with open(self.data_path, 'rb') as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+
+        os.replace(self.data_path, filepath)
+        self.discard()
+        logger.info(f"分块上传完成 {self.upload_id}: {filepath}")
+        return digest.hexdigest()
+
+    def discard(self):
+        """删除上传会话"""
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
@@ -1,16 +1,26 @@
 """
 比对引擎模块 - 党员花名册比对核心逻辑
 """
+import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime
 
+from core import id_validation, metrics
+from core.dtypes import comparable_pair, isin, plain_values
+
 logger = logging.getLogger(__name__)
 
 
 class ComparisonEngine:
     """党员花名册比对引擎"""
 
+    # 引擎版本：比对结果的语义发生变化时递增，用于使结果缓存失效
+    ENGINE_VERSION = '5'
+
+    # 党龄/年龄计算基准日期
+    REFERENCE_DATE = '2025-12-31'
+
     # 字段映射：单机库字段 -> 全国库字段
     FIELD_MAPPING = {
         '入党时间': '入党日期',
@@ -20,95 +30,197 @@ class ComparisonEngine:
     # 需要比对的字段列表
     COMPARE_FIELDS = ['姓名', '性别', '民族', '出生日期', '学历', '入党时间', '个人身份', '人员类别']
 
-    def __init__(self, df_local, df_national):
+    # 字段差异结果表列名
+    FIELD_DIFF_COLUMNS = ['姓名', '身份证号', '单机表信息', '全国表信息']
+
+    # 长表差异列名
+    DIFF_TABLE_COLUMNS = ['身份证号', '姓名', '字段', '单机表信息', '全国表信息']
+
+    # 预处理时记录身份证号校验问题的列（校验通过为空）
+    ID_CHECK_COLUMN = '身份证号校验'
+
+    # 无效身份证号结果表列名
+    INVALID_ID_COLUMNS = ['库', '身份证号', '序号', '姓名', '问题']
+
+    # 身份证号重复时的处理方式：first 保留第一行 / last 保留最后一行 / reject 拒绝比对
+    DUPLICATE_POLICIES = ('first', 'last', 'reject')
+    DUPLICATE_POLICY = 'first'
+
+    # 重复身份证号结果表列名
+    DUPLICATE_COLUMNS = ['库', '身份证号', '序号', '姓名', '重复次数', '处理']
+
+    # 重复身份证号拒绝比对时，错误信息中列出的身份证号个数
+    DUPLICATE_ERROR_SAMPLES = 5
+
+    # 各库的身份证号列、入党时间列、日志名称、是否计算人员类别
+    ROSTER_SPECS = {
+        'local': ('身份证号', '入党时间', '单机库', True),
+        'national': ('身份证号码', '入党日期', '全国库', False)
+    }
+
+    def __init__(self, df_local, df_national, reference_date=None, duplicate_policy=None):
         """
         初始化比对引擎
 
         Args:
             df_local: 单机库 DataFrame
             df_national: 全国库 DataFrame
+            reference_date: 党龄/年龄计算基准日期（默认 REFERENCE_DATE）
+            duplicate_policy: 身份证号重复时的处理方式（默认 DUPLICATE_POLICY）
+
+        Raises:
+            ValueError: 重复处理方式无效
         """
-        self.df_local = df_local.copy()
-        self.df_national = df_national.copy()
+        duplicate_policy = duplicate_policy or self.DUPLICATE_POLICY
+        if duplicate_policy not in self.DUPLICATE_POLICIES:
+            raise ValueError(f'无效的重复身份证号处理方式: {duplicate_policy}')
+
+        # 浅复制：预处理只整列赋值，不会修改调用方的数据
+        self.df_local = df_local.copy(deep=False)
+        self.df_national = df_national.copy(deep=False)
+        self.reference_date = reference_date or self.REFERENCE_DATE
+        self.duplicate_policy = duplicate_policy
         self.results = {}
 
-    def preprocess(self):
-        """预处理数据：增加序号、计算党龄/年龄、标准化身份证号"""
-        try:
-            # 处理单机库
-            self.df_local['序号'] = range(1, len(self.df_local) + 1)
-
-            # 计算党龄 - 使用异常处理避免日期格式错误
-            try:
-                self.df_local['党龄'] = (
-                    pd.to_datetime('2025-12-31') -
-                    pd.to_datetime(self.df_local['入党时间'], errors='coerce')
-                ).dt.days // 365
-            except Exception as e:
-                logger.warning(f"计算单机库党龄时出错: {e}")
-                self.df_local['党龄'] = pd.NA
-
-            # 计算年龄 - 从身份证号提取出生日期
-            try:
-                self.df_local['年龄'] = (
-                    pd.to_datetime('2025-12-31') -
-                    pd.to_datetime(
-                        self.df_local['身份证号'].astype(str).str[6:14],
-                        format='%Y%m%d',
-                        errors='coerce'
-                    )
-                ).dt.days // 365
-            except Exception as e:
-                logger.warning(f"计算单机库年龄时出错: {e}")
-                self.df_local['年龄'] = pd.NA
-
-            # 判断人员类别
-            self.df_local['人员类别'] = self.df_local['入党时间'].apply(
-                lambda x: '预备党员' if str(x).startswith('2025') else '正式党员'
+        # 参与连接的行位置（见 join_rows）
+        self._join_rows = {}
+
+        # 字段差异行在两个库中的行位置（见 build_field_diff_table）
+        self.field_diff_rows = None
+
+        # 日期解析结果缓存：原始值 -> YYYYMMDD 整数（无法解析为 NaN）
+        self._date_memo = {}
+
+    @property
+    def reference_ymd(self):
+        """基准日期的 YYYYMMDD 整数形式"""
+        ref = pd.Timestamp(self.reference_date)
+        return ref.year * 10000 + ref.month * 100 + ref.day
+
+    @staticmethod
+    def _date_text(value):
+        """将单个日期取值转换为待解析的文本"""
+        if isinstance(value, (datetime, pd.Timestamp)):
+            return value.strftime('%Y-%m-%d')
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).strip()
+
+    def _parse_ymd(self, series, date_format='mixed'):
+        """
+        将日期列解析为 YYYYMMDD 整数数组
+
+        每个不同取值只解析一次，结果缓存在引擎中，两个库共享。
+
+        Args:
+            series: 日期列
+            date_format: 日期格式（默认逐值推断）
+
+        Returns:
+            np.ndarray: float64 数组，无法解析的值为 NaN
+        """
+        codes, uniques = pd.factorize(series)
+        if len(uniques) == 0:
+            return np.full(len(codes), np.nan)
+
+        memo = self._date_memo
+        pending = [value for value in uniques if (date_format, value) not in memo]
+        if pending:
+            parsed = pd.to_datetime(
+                pd.Series([self._date_text(value) for value in pending], dtype=object),
+                format=date_format,
+                errors='coerce'
             )
+            ymd = (
+                parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day
+            ).to_numpy(dtype='float64', na_value=np.nan)
+            memo.update(zip(((date_format, value) for value in pending), ymd))
+
+        unique_ymd = np.array(
+            [memo[(date_format, value)] for value in uniques],
+            dtype='float64'
+        )
+        return np.where(codes >= 0, unique_ymd[np.maximum(codes, 0)], np.nan)
+
+    def _years_since(self, ymd):
+        """
+        按 YYYYMMDD 整数计算到基准日期的周岁年数
+
+        Args:
+            ymd: YYYYMMDD 数组（NaN 表示无法解析）
+
+        Returns:
+            pd.array: Int64 数组，无法解析的值为 <NA>
+        """
+        missing = np.isnan(ymd)
+        years = (self.reference_ymd - np.where(missing, 0, ymd)).astype('int64') // 10000
+        return pd.arrays.IntegerArray(years, missing)
+
+    def preprocess_frame(self, df, side, start=1):
+        """
+        计算派生列：序号、党龄、年龄、人员类别，并标准化、校验身份证号
 
-            # 标准化身份证号
-            self.df_local['身份证号'] = (
-                self.df_local['身份证号']
-                .astype(str)
-                .str.upper()
-                .str.strip()
+        15 位身份证号转换为 18 位；校验问题记录在 ID_CHECK_COLUMN 列。
+
+        外部排序比对按数据块调用本方法，start 为数据块首行的序号。
+
+        Args:
+            df: 库 DataFrame（原地修改）
+            side: 'local' 或 'national'
+            start: 首行序号（默认 1）
+        """
+        id_col, join_col, label, with_category = self.ROSTER_SPECS[side]
+
+        df['序号'] = range(start, start + len(df))
+
+        # 标准化并校验身份证号
+        ids = df[id_col].astype(str).str.upper().str.strip()
+        ids, id_problems = id_validation.validate_ids(ids, self.reference_ymd)
+
+        # 计算党龄
+        try:
+            df['党龄'] = self._years_since(self._parse_ymd(df[join_col]))
+        except Exception as e:
+            logger.warning(f"计算{label}党龄时出错: {e}")
+            df['党龄'] = pd.NA
+
+        # 计算年龄 - 从身份证号提取出生日期
+        try:
+            df['年龄'] = self._years_since(
+                self._parse_ymd(ids.str[6:14], date_format='%Y%m%d')
             )
+        except Exception as e:
+            logger.warning(f"计算{label}年龄时出错: {e}")
+            df['年龄'] = pd.NA
+
+        # 判断人员类别：基准年份入党的为预备党员
+        if with_category:
+            codes, uniques = pd.factorize(df[join_col])
+            is_probationary = np.array(
+                [str(value).startswith(str(self.reference_date)[:4]) for value in uniques],
+                dtype=bool
+            )
+            probationary = np.zeros(len(df), dtype=bool)
+            probationary[codes >= 0] = is_probationary[codes[codes >= 0]]
+            df['人员类别'] = np.where(probationary, '预备党员', '正式党员')
+
+        df[id_col] = ids
+        df[self.ID_CHECK_COLUMN] = id_problems
+
+    def preprocess(self):
+        """预处理数据：增加序号、计算党龄/年龄、标准化并校验身份证号"""
+        try:
+            # 处理单机库
+            self.preprocess_frame(self.df_local, 'local')
 
             # 处理全国库
-            self.df_national['序号'] = range(1, len(self.df_national) + 1)
-
-            # 计算党龄
-            try:
-                self.df_national['党龄'] = (
-                    pd.to_datetime('2025-12-31') -
-                    pd.to_datetime(self.df_national['入党日期'], errors='coerce')
-                ).dt.days // 365
-            except Exception as e:
-                logger.warning(f"计算全国库党龄时出错: {e}")
-                self.df_national['党龄'] = pd.NA
-
-            # 计算年龄
-            try:
-                self.df_national['年龄'] = (
-                    pd.to_datetime('2025-12-31') -
-                    pd.to_datetime(
-                        self.df_national['身份证号码'].astype(str).str[6:14],
-                        format='%Y%m%d',
-                        errors='coerce'
-                    )
-                ).dt.days // 365
-            except Exception as e:
-                logger.warning(f"计算全国库年龄时出错: {e}")
-                self.df_national['年龄'] = pd.NA
-
-            # 标准化身份证号
-            self.df_national['身份证号码'] = (
-                self.df_national['身份证号码']
-                .astype(str)
-                .str.upper()
-                .str.strip()
-            )
+            self.preprocess_frame(self.df_national, 'national')
+
+            # 无效身份证号单独列出，不参与比对
+            self.find_invalid_ids()
+
+            # 检查身份证号重复
+            self.find_duplicate_ids()
 
             logger.info("数据预处理完成")
 
@@ -116,6 +228,195 @@ class ComparisonEngine:
             logger.error(f"数据预处理失败: {e}")
             raise
 
+    def valid_id_mask(self, side):
+        """
+        身份证号校验通过的行掩码
+
+        Args:
+            side: 'local' 或 'national'
+
+        Returns:
+            np.ndarray: bool 数组（未经预处理校验的数据视为全部通过）
+        """
+        df = self.df_local if side == 'local' else self.df_national
+        if self.ID_CHECK_COLUMN not in df.columns:
+            return np.ones(len(df), dtype=bool)
+        return df[self.ID_CHECK_COLUMN].isna().to_numpy()
+
+    def invalid_report(self, side, ids, serials, names, problems):
+        """
+        生成一个库的无效身份证号明细
+
+        Args:
+            side: 'local' 或 'national'
+            ids: 无效身份证号所在行的身份证号（按原顺序）
+            serials: 对应行的序号
+            names: 对应行的姓名
+            problems: 对应行的校验问题
+
+        Returns:
+            DataFrame: 明细（列见 INVALID_ID_COLUMNS）
+        """
+        return pd.DataFrame({
+            '库': self.ROSTER_SPECS[side][2],
+            '身份证号': plain_values(ids),
+            '序号': np.asarray(serials),
+            '姓名': plain_values(names),
+            '问题': plain_values(problems),
+        }, columns=self.INVALID_ID_COLUMNS)
+
+    def find_invalid_ids(self):
+        """
+        列出身份证号校验不通过的行
+
+        这些行不参与多出人员判断、重复检查和字段比对，明细保存在
+        results['invalid_ids']。
+
+        Returns:
+            DataFrame: 无效身份证号明细（列见 INVALID_ID_COLUMNS）
+        """
+        pieces = []
+        for side, df in (('local', self.df_local), ('national', self.df_national)):
+            invalid = ~self.valid_id_mask(side)
+            if not invalid.any():
+                continue
+
+            rows = df[invalid]
+            report = self.invalid_report(
+                side, rows[self.ROSTER_SPECS[side][0]], rows['序号'], rows['姓名'],
+                rows[self.ID_CHECK_COLUMN]
+            )
+            logger.warning(
+                f"{self.ROSTER_SPECS[side][2]}中有 {len(report)} 行身份证号无效: "
+                + ', '.join(f"{problem} {count} 行" for problem, count in report['问题'].value_counts().items())
+            )
+            pieces.append(report)
+
+        invalid_ids = (
+            pd.concat(pieces, ignore_index=True) if pieces
+            else pd.DataFrame(columns=self.INVALID_ID_COLUMNS)
+        )
+        self.results['invalid_ids'] = invalid_ids
+        return invalid_ids
+
+    def duplicate_report(self, side, ids, serials, names):
+        """
+        生成一个库的重复身份证号明细
+
+        Args:
+            side: 'local' 或 'national'
+            ids: 重复身份证号所在的全部行的身份证号（按原顺序）
+            serials: 对应行的序号
+            names: 对应行的姓名
+
+        Returns:
+            tuple: (明细 DataFrame, 保留行掩码)
+                明细按身份证号首次出现的顺序分组，组内按原顺序排列
+        """
+        ids = pd.Series(plain_values(ids), dtype=object)
+        kept = ~ids.duplicated(keep='last' if self.duplicate_policy == 'last' else 'first').to_numpy()
+        codes, _ = pd.factorize(ids, use_na_sentinel=False)
+        order = np.argsort(codes, kind='stable')
+
+        report = pd.DataFrame({
+            '库': self.ROSTER_SPECS[side][2],
+            '身份证号': ids.to_numpy(),
+            '序号': np.asarray(serials),
+            '姓名': plain_values(names),
+            '重复次数': np.bincount(codes)[codes],
+            '处理': np.where(kept, '保留', '忽略'),
+        }, columns=self.DUPLICATE_COLUMNS)
+        return report.iloc[order].reset_index(drop=True), kept
+
+    def reject_duplicates(self, report):
+        """
+        reject 方式下存在重复身份证号时拒绝比对
+
+        Args:
+            report: 重复身份证号明细（见 duplicate_report）
+
+        Raises:
+            ValueError: 存在重复身份证号
+        """
+        if self.duplicate_policy != 'reject' or report.empty:
+            return
+
+        groups = report.drop_duplicates(['库', '身份证号'])
+        counts = '，'.join(
+            f"{label} {count} 个" for label, count in groups['库'].value_counts(sort=False).items()
+        )
+        samples = ', '.join(str(value) for value in groups['身份证号'].head(self.DUPLICATE_ERROR_SAMPLES))
+        raise ValueError(f'存在重复的身份证号（{counts}），已拒绝比对: {samples}')
+
+    def find_duplicate_ids(self):
+        """
+        检查两个库中的身份证号是否唯一，并确定参与连接的行
+
+        只检查身份证号有效的行。身份证号唯一时（基于索引的哈希检查）
+        这些行全部参与连接；否则按
+        duplicate_policy 每个身份证号只保留一行参与字段比对，避免多对多
+        连接。重复明细保存在 results['duplicate_ids']。
+
+        Returns:
+            DataFrame: 重复身份证号明细（列见 DUPLICATE_COLUMNS）
+
+        Raises:
+            ValueError: reject 方式下存在重复身份证号
+        """
+        pieces = []
+        for side, df in (('local', self.df_local), ('national', self.df_national)):
+            id_col = self.ROSTER_SPECS[side][0]
+            candidates = np.flatnonzero(self.valid_id_mask(side))
+            ids = df[id_col] if len(candidates) == len(df) else df[id_col].iloc[candidates]
+            if pd.Index(ids).is_unique:
+                self._join_rows[side] = candidates
+                continue
+
+            duplicated = ids.duplicated(keep=False).to_numpy()
+            positions = candidates[duplicated]
+            rows = df.iloc[positions]
+            report, kept = self.duplicate_report(side, rows[id_col], rows['序号'], rows['姓名'])
+
+            join_mask = np.ones(len(candidates), dtype=bool)
+            join_mask[np.flatnonzero(duplicated)[~kept]] = False
+            self._join_rows[side] = candidates[join_mask]
+
+            ignored = int((~kept).sum())
+            logger.warning(
+                f"{self.ROSTER_SPECS[side][2]}中有 {len(positions) - ignored} 个身份证号重复"
+                f"（共 {len(positions)} 行），{ignored} 行不参与字段比对"
+            )
+            pieces.append(report)
+
+        duplicates = (
+            pd.concat(pieces, ignore_index=True) if pieces
+            else pd.DataFrame(columns=self.DUPLICATE_COLUMNS)
+        )
+        self.reject_duplicates(duplicates)
+        self.results['duplicate_ids'] = duplicates
+        return duplicates
+
+    def join_rows(self, side):
+        """
+        参与字段比对连接的行位置
+
+        身份证号有效的行中，身份证号唯一时为全部行，否则每个身份证号按
+        duplicate_policy 保留一行（reject 方式在预处理时已拒绝重复数据）。
+
+        Args:
+            side: 'local' 或 'national'
+
+        Returns:
+            np.ndarray: 行位置（升序）
+        """
+        if side not in self._join_rows:
+            df = self.df_local if side == 'local' else self.df_national
+            candidates = np.flatnonzero(self.valid_id_mask(side))
+            ids = df[self.ROSTER_SPECS[side][0]].iloc[candidates]
+            keep = 'last' if self.duplicate_policy == 'last' else 'first'
+            self._join_rows[side] = candidates[~ids.duplicated(keep=keep).to_numpy()]
+        return self._join_rows[side]
+
     def find_differences(self):
         """
         找出多出和缺少的人员（按照原始比对单机.py的逻辑）
@@ -124,14 +425,18 @@ class ComparisonEngine:
             dict: {'local_extra': DataFrame, 'national_extra': DataFrame}
         """
         try:
+            # 按身份证号集合判断，重复的身份证号不影响结果；
+            # 无效身份证号已单独列出（见 find_invalid_ids），不计入多出人员
             # 单机多出的人员（全国库中没有的）
             local_extra = self.df_local[
-                ~self.df_local['身份证号'].isin(self.df_national['身份证号码'])
+                ~isin(self.df_local['身份证号'], self.df_national['身份证号码']).to_numpy()
+                & self.valid_id_mask('local')
             ]
 
             # 全国多出的人员（单机库中没有的）
             national_extra = self.df_national[
-                ~self.df_national['身份证号码'].isin(self.df_local['身份证号'])
+                ~isin(self.df_national['身份证号码'], self.df_local['身份证号']).to_numpy()
+                & self.valid_id_mask('national')
             ]
 
             self.results['local_extra'] = local_extra
@@ -149,93 +454,196 @@ class ComparisonEngine:
             logger.error(f"查找人员差异失败: {e}")
             raise
 
+    def compared_fields(self):
+        """
+        两个库中都存在、实际参与比对的字段
+
+        Returns:
+            list: 字段列表（单机库字段名，按 COMPARE_FIELDS 顺序）
+        """
+        return [
+            field for field in self.COMPARE_FIELDS
+            if field in self.df_local.columns
+            and self.FIELD_MAPPING.get(field, field) in self.df_national.columns
+        ]
+
+    def build_field_diff_table(self):
+        """
+        基于一次内连接生成所有比对字段的长表差异
+
+        只保留身份证号、姓名和待比对字段参与合并，按身份证号内连接一次
+        （重复的身份证号按 duplicate_policy 只保留一行，见 join_rows），
+        然后在同一张合并表上逐字段向量化比较。差异行在两个库中的行位置
+        保存在 self.field_diff_rows，供增量比对使用。
+
+        Returns:
+            tuple: (长表差异 DataFrame, 实际参与比对的字段列表)
+                长表列为：身份证号、姓名、字段、单机表信息、全国表信息
+        """
+        # 身份证号重复时每个身份证号只保留一行，保证一对一连接
+        local_rows = self.join_rows('local')
+        national_rows = self.join_rows('national')
+        df_local = self.df_local if len(local_rows) == len(self.df_local) else self.df_local.iloc[local_rows]
+        df_national = (
+            self.df_national if len(national_rows) == len(self.df_national)
+            else self.df_national.iloc[national_rows]
+        )
+
+        # 只投影需要的列，避免 add_suffix 复制整张表
+        left_columns = {
+            '身份证号': df_local['身份证号'],
+            '姓名_local': df_local['姓名'],
+            '行_local': local_rows
+        }
+        right_columns = {
+            '身份证号码': df_national['身份证号码'],
+            '行_national': national_rows
+        }
+
+        compared_fields = self.compared_fields()
+        for field in self.COMPARE_FIELDS:
+            national_field = self.FIELD_MAPPING.get(field, field)
+            if field in compared_fields:
+                left_columns[f'{field}_local'] = df_local[field]
+                right_columns[f'{national_field}_national'] = df_national[national_field]
+            else:
+                logger.warning(f"字段 '{field}' 在数据中不存在")
+
+        # 合并两个表（仅一次）
+        merged = pd.merge(
+            pd.DataFrame(left_columns),
+            pd.DataFrame(right_columns),
+            left_on='身份证号',
+            right_on='身份证号码',
+            how='inner'
+        )
+
+        pieces = []
+        rows = []
+        for field in compared_fields:
+            national_field = self.FIELD_MAPPING.get(field, field)
+            local_col = f'{field}_local'
+            national_col = f'{national_field}_national'
+
+            # 紧凑模式下两侧可能为类别不同的 category 列，比较前先对齐
+            local_values, national_values = comparable_pair(
+                merged[local_col], merged[national_col]
+            )
+            diff_mask = local_values != national_values
+            diff_rows = merged.loc[diff_mask]
+            pieces.append(pd.DataFrame({
+                '身份证号': plain_values(diff_rows['身份证号']),
+                '姓名': plain_values(diff_rows['姓名_local']),
+                '字段': field,
+                '单机表信息': plain_values(diff_rows[local_col]),
+                '全国表信息': plain_values(diff_rows[national_col])
+            }))
+            rows.append(diff_rows[['行_local', '行_national']].to_numpy(dtype=np.int64))
+
+        if pieces:
+            diff_table = pd.concat(pieces, ignore_index=True)
+            self.field_diff_rows = np.concatenate(rows)
+        else:
+            diff_table = pd.DataFrame(columns=self.DIFF_TABLE_COLUMNS)
+            self.field_diff_rows = np.empty((0, 2), dtype=np.int64)
+
+        diff_table['字段'] = pd.Categorical(
+            diff_table['字段'],
+            categories=self.COMPARE_FIELDS
+        )
+
+        return diff_table, compared_fields
+
     def find_field_differences(self):
         """
         逐字段比对差异
 
+        先生成长表差异（见 build_field_diff_table），再按字段拆分出
+        各 diff_<字段> 结果表。
+
         Returns:
             dict: {field_name: DataFrame, ...}
         """
         try:
-            # 为比对添加后缀
-            df_local_suffixed = self.df_local.add_suffix('_local')
-            df_local_suffixed = df_local_suffixed.rename(
-                columns={'身份证号_local': '身份证号'}
-            )
-
-            df_national_suffixed = self.df_national.add_suffix('_national')
-            df_national_suffixed = df_national_suffixed.rename(
-                columns={'身份证号码_national': '身份证号码'}
-            )
-
-            field_diffs = {}
-
-            for field in self.COMPARE_FIELDS:
-                # 获取全国库对应字段名
-                national_field = self.FIELD_MAPPING.get(field, field)
-
-                # 合并两个表
-                merged = pd.merge(
-                    df_local_suffixed,
-                    df_national_suffixed,
-                    left_on='身份证号',
-                    right_on='身份证号码',
-                    how='inner'
-                )
-
-                local_col = f'{field}_local'
-                national_col = f'{national_field}_national'
-
-                # 找出该字段不一致的记录
-                if local_col in merged.columns and national_col in merged.columns:
-                    diff_mask = merged[local_col] != merged[national_col]
-                    diff_records = merged[diff_mask][[
-                        '姓名_local',
-                        '身份证号',
-                        local_col,
-                        national_col
-                    ]]
-
-                    # 重命名列
-                    diff_records.columns = [
-                        '姓名',
-                        '身份证号',
-                        '单机表信息',
-                        '全国表信息'
-                    ]
-
-                    field_diffs[f'diff_{field}'] = diff_records
-
-                    logger.info(f"字段 '{field}' 发现 {len(diff_records)} 条差异")
-                else:
-                    logger.warning(f"字段 '{field}' 在数据中不存在")
-                    field_diffs[f'diff_{field}'] = pd.DataFrame()
-
-            self.results.update(field_diffs)
-            return field_diffs
+            diff_table, compared_fields = self.build_field_diff_table()
+            return self.split_field_diffs(diff_table, compared_fields)
 
         except Exception as e:
             logger.error(f"查找字段差异失败: {e}")
             raise
 
-    def generate_report(self):
+    def split_field_diffs(self, diff_table, compared_fields):
+        """
+        保存长表差异，并按字段拆分出各 diff_<字段> 结果表
+
+        Args:
+            diff_table: 长表差异（见 build_field_diff_table）
+            compared_fields: 实际参与比对的字段列表
+
+        Returns:
+            dict: {field_name: DataFrame, ...}
+        """
+        self.results['field_diff_table'] = diff_table
+
+        grouped = {
+            field: group
+            for field, group in diff_table.groupby('字段', sort=False, observed=True)
+        }
+
+        field_diffs = {}
+
+        for field in self.COMPARE_FIELDS:
+            if field not in compared_fields:
+                field_diffs[f'diff_{field}'] = pd.DataFrame()
+                continue
+
+            group = grouped.get(field)
+            if group is None:
+                diff_records = pd.DataFrame(columns=self.FIELD_DIFF_COLUMNS)
+            else:
+                diff_records = group[
+                    self.FIELD_DIFF_COLUMNS
+                ].reset_index(drop=True)
+
+            field_diffs[f'diff_{field}'] = diff_records
+
+            logger.info(f"字段 '{field}' 发现 {len(diff_records)} 条差异")
+
+        self.results.update(field_diffs)
+        return field_diffs
+
+    def generate_report(self, progress=None):
         """
         生成完整比对报告
 
+        Args:
+            progress: 可选的阶段回调，在每个阶段开始前以阶段名调用
+
         Returns:
             dict: 包含所有比对结果的字典，包括预处理后的完整数据
         """
         try:
             logger.info("开始生成比对报告")
 
+            rows = len(self.df_local) + len(self.df_national)
+
             # 预处理数据
-            self.preprocess()
+            if progress:
+                progress('preprocess')
+            with metrics.track_phase('preprocess', rows=rows):
+                self.preprocess()
 
             # 查找人员差异
-            self.find_differences()
+            if progress:
+                progress('find_differences')
+            with metrics.track_phase('find_differences', rows=rows):
+                self.find_differences()
 
             # 查找字段差异
-            self.find_field_differences()
+            if progress:
+                progress('find_field_differences')
+            with metrics.track_phase('find_field_differences', rows=rows):
+                self.find_field_differences()
 
             # 将预处理后的完整数据添加到结果中
             self.results['local_preprocessed'] = self.df_local
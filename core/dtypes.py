@@ -0,0 +1,202 @@
+"""
+数据类型模块 - 花名册 DataFrame 的紧凑类型转换
+
+Excel 解析得到的文本列中，性别、民族、学历、党支部等取值重复度很高，
+逐行保存 Python 字符串会占用大量内存。紧凑模式下：
+
+- 低基数文本列转换为 category（只保存一份取值和整数编码）
+- 其余文本列（身份证号、姓名等）转换为 Arrow 字符串
+
+混合类型列（如同时含日期和文本）保持原样。
+"""
+import logging
+from datetime import datetime, date
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 不同取值数 / 非空行数不超过该比例的文本列转换为 category
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _resolve_arrow_string_dtype():
+    """
+    获取以 NaN 表示缺失值的 Arrow 字符串类型
+
+    比对逻辑依赖 NaN 语义（缺失值与任何值都不相等），因此不使用以
+    pd.NA 表示缺失值的 string[pyarrow]。pandas 2.0 不支持时返回 None。
+    """
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except (TypeError, ImportError):
+        pass
+    try:
+        return pd.StringDtype('pyarrow_numpy')
+    except (TypeError, ValueError, ImportError):
+        return None
+
+
+ARROW_STRING_DTYPE = _resolve_arrow_string_dtype()
+
+
+def _is_text_column(series):
+    """判断列是否只包含文本（允许缺失值）"""
+    if isinstance(series.dtype, pd.StringDtype):
+        return True
+    if series.dtype != object:
+        return False
+    return pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty')
+
+
+def compact_frame(df, category_max_ratio=CATEGORY_MAX_RATIO):
+    """
+    将花名册 DataFrame 转换为紧凑类型
+
+    Args:
+        df: 花名册 DataFrame
+        category_max_ratio: 转换为 category 的最大基数比例
+
+    Returns:
+        DataFrame: 转换后的新 DataFrame（原 DataFrame 不变）
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if not _is_text_column(series):
+            columns[col] = series
+            continue
+
+        non_null = series.count()
+        if non_null and series.nunique(dropna=True) <= non_null * category_max_ratio:
+            series = series.astype('category')
+        elif ARROW_STRING_DTYPE is not None and series.dtype != ARROW_STRING_DTYPE:
+            series = series.astype(ARROW_STRING_DTYPE)
+        columns[col] = series
+
+    compacted = pd.DataFrame(columns, index=df.index)
+    logger.info(
+        f"紧凑类型转换完成: {frame_memory(df) / 1024 / 1024:.1f}MB -> "
+        f"{frame_memory(compacted) / 1024 / 1024:.1f}MB"
+    )
+    return compacted
+
+
+def plain_values(series):
+    """
+    将 category 列还原为其取值类型，其他列原样返回
+
+    Args:
+        series: Series
+
+    Returns:
+        Series: 非 category 的 Series
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
+
+
+def comparable_pair(left, right):
+    """
+    对齐两列的类型，使其可以逐元素比较
+
+    两列均为 category 时合并类别（仍按编码比较）；只有一列为 category
+    时将其还原为取值类型。
+
+    Args:
+        left: 左列
+        right: 右列
+
+    Returns:
+        tuple: (left, right)
+    """
+    left_is_cat = isinstance(left.dtype, pd.CategoricalDtype)
+    right_is_cat = isinstance(right.dtype, pd.CategoricalDtype)
+
+    if left_is_cat and right_is_cat:
+        categories = left.cat.categories.union(right.cat.categories)
+        return (
+            left.cat.set_categories(categories),
+            right.cat.set_categories(categories)
+        )
+    return plain_values(left), plain_values(right)
+
+
+def isin(series, values):
+    """
+    Series.isin 的快速版本
+
+    pandas 对 Arrow 字符串列的 isin 比 object 列慢一个数量级以上，
+    因此先转换为 object 再比较（缺失值与缺失值匹配，结果与 isin 相同）。
+
+    Args:
+        series: 待检查的列
+        values: 取值集合（Series、Index 或数组）
+
+    Returns:
+        Series: 布尔列，索引与 series 相同
+    """
+    values = pd.Series(values)
+    if series.dtype != object:
+        series = plain_values(series).astype(object)
+    if values.dtype != object:
+        values = plain_values(values).astype(object)
+    return series.isin(values)
+
+
+def frame_memory(df):
+    """
+    计算 DataFrame 占用的内存（包含字符串内容）
+
+    Args:
+        df: DataFrame
+
+    Returns:
+        int: 字节数
+    """
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def compare_keys(series):
+    """
+    将比对字段转换为文本比较键
+
+    键相等当且仅当原值按 pandas 的 != 比较相等，可保存到磁盘或计算指纹
+    后在不同批次、不同运行之间比较。
+
+    Args:
+        series: 比对字段
+
+    Returns:
+        Series: object 类型的键，缺失值为 None（缺失值与任何值都不相等）
+    """
+    series = plain_values(series)
+
+    if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+        keys = 's' + series.astype(object)
+    elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        keys = series.astype('float64').map(_number_key)
+    elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+        keys = 't' + series.dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+    else:
+        keys = series.map(_object_key)
+
+    return keys.where(series.notna(), None).astype(object)
+
+
+def _number_key(value):
+    # 加 0.0 使 -0.0 与 0.0 的键相同
+    return f'n{float(value) + 0.0!r}'
+
+
+def _object_key(value):
+    """单个取值的比较键"""
+    if isinstance(value, str):
+        return f's{value}'
+    if isinstance(value, (bool, np.bool_, int, float, np.integer, np.floating)):
+        return _number_key(value)
+    if isinstance(value, (datetime, date, np.datetime64)):
+        return 't' + pd.Timestamp(value).strftime('%Y-%m-%dT%H:%M:%S.%f')
+    return f'o{value}'
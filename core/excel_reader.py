@@ -0,0 +1,174 @@
+"""
+Excel 读取模块 - 按文件格式选择解析引擎（已安装 calamine 时优先使用）
+
+xlrd（.xls）和 openpyxl（.xlsx）是纯 Python 解析器；python-calamine 基于
+Rust 实现，解析整张工作表快得多，但总是加载整张工作表。因此：
+
+- 解析数据时按 ENGINE_PREFERENCES 选择第一个已安装的引擎
+- 只读取表头时使用流式引擎（xlrd on_demand / openpyxl 只读模式），
+  读到表头即停止，不解析数据行
+
+文件格式按内容（而非扩展名）判断，上传文件统一保存为 .xls 也能正确选择。
+"""
+import importlib.util
+import logging
+from functools import lru_cache
+
+import pandas as pd
+import xlrd
+
+logger = logging.getLogger(__name__)
+
+# 各文件格式可用的引擎（按优先顺序）
+ENGINE_PREFERENCES = {
+    'xls': ('calamine', 'xlrd'),
+    'xlsx': ('calamine', 'openpyxl'),
+}
+
+# 只读取表头时使用的流式引擎
+HEADER_ENGINES = {
+    'xls': 'xlrd',
+    'xlsx': 'openpyxl',
+}
+
+# 引擎对应的 Python 包
+ENGINE_MODULES = {
+    'calamine': 'python_calamine',
+    'xlrd': 'xlrd',
+    'openpyxl': 'openpyxl',
+}
+
+# 可配置的引擎：auto 为按文件格式自动选择
+ENGINE_CHOICES = ('auto',) + tuple(ENGINE_MODULES)
+
+# pandas 从 2.2 开始支持 calamine 引擎
+CALAMINE_MIN_PANDAS = (2, 2)
+
+# 当前进程的引擎配置（见 init_reader）
+_preferred_engine = 'auto'
+
+
+@lru_cache(maxsize=None)
+def is_available(engine):
+    """
+    引擎是否已安装且当前 pandas 版本支持
+
+    Args:
+        engine: 引擎名称
+
+    Returns:
+        bool: 是否可用
+    """
+    if importlib.util.find_spec(ENGINE_MODULES[engine]) is None:
+        return False
+    if engine == 'calamine':
+        version = tuple(int(part) for part in pd.__version__.split('.')[:2])
+        return version >= CALAMINE_MIN_PANDAS
+    return True
+
+
+def file_format(path):
+    """
+    按文件内容判断 Excel 格式
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        str: 'xls' 或 'xlsx'
+    """
+    return 'xls' if xlrd.inspect_format(path) == 'xls' else 'xlsx'
+
+
+def select_engine(path, preferred=None, header_only=False):
+    """
+    为文件选择解析引擎
+
+    Args:
+        path: 文件路径
+        preferred: 指定的引擎（默认使用 init_reader 配置）；不适用于该格式
+            或未安装时按自动选择处理
+        header_only: 是否只读取表头（使用流式引擎）
+
+    Returns:
+        str: 引擎名称
+
+    Raises:
+        ValueError: 没有可读取该格式的引擎
+    """
+    fmt = file_format(path)
+    if header_only:
+        return HEADER_ENGINES[fmt]
+
+    candidates = ENGINE_PREFERENCES[fmt]
+    preferred = preferred or _preferred_engine
+    if preferred != 'auto' and preferred in candidates and is_available(preferred):
+        return preferred
+
+    for engine in candidates:
+        if is_available(engine):
+            return engine
+    raise ValueError(f'没有可读取 .{fmt} 文件的引擎，请安装 {" 或 ".join(candidates)}')
+
+
+def read_excel(path, sheet_name=0, engine=None, header_only=False, **kwargs):
+    """
+    读取 Excel 工作表，参数同 pd.read_excel
+
+    xlrd 以 on_demand 方式打开，只加载目标工作表；其他引擎以文件对象读取，
+    按内容识别格式。
+
+    Args:
+        path: 文件路径
+        sheet_name: 工作表名称或索引
+        engine: 指定的引擎（可选，见 select_engine）
+        header_only: 是否只读取表头（一般与 nrows=0 一起使用）
+        **kwargs: 传给 pd.read_excel 的其他参数
+
+    Returns:
+        DataFrame: 工作表数据
+    """
+    engine = select_engine(path, engine, header_only)
+
+    if engine == 'xlrd':
+        book = xlrd.open_workbook(path, on_demand=True)
+        try:
+            return pd.read_excel(book, sheet_name=sheet_name, engine='xlrd', **kwargs)
+        finally:
+            book.release_resources()
+
+    with open(path, 'rb') as f:
+        return pd.read_excel(f, sheet_name=sheet_name, engine=engine, **kwargs)
+
+
+def engine_signature():
+    """
+    当前进程解析数据使用的引擎组合（用于结果缓存键，不同引擎的解析结果分开缓存）
+
+    Returns:
+        str: 如 'xls=calamine,xlsx=calamine'
+    """
+    signature = []
+    for fmt, candidates in ENGINE_PREFERENCES.items():
+        engine = next((name for name in candidates if is_available(name)), None)
+        if _preferred_engine in candidates and is_available(_preferred_engine):
+            engine = _preferred_engine
+        signature.append(f'{fmt}={engine}')
+    return ','.join(signature)
+
+
+def init_reader(engine='auto'):
+    """
+    配置当前进程解析数据使用的引擎
+
+    Args:
+        engine: ENGINE_CHOICES 之一
+
+    Raises:
+        ValueError: 引擎名称无效
+    """
+    global _preferred_engine
+    if engine not in ENGINE_CHOICES:
+        raise ValueError(f'无效的 Excel 引擎: {engine}，可选 {", ".join(ENGINE_CHOICES)}')
+    _preferred_engine = engine
+    logger.info(f"Excel 解析引擎: {engine}（{engine_signature()}）")
@@ -2,20 +2,120 @@
 结果导出模块 - 生成Excel格式的比对结果
 """
 import pandas as pd
+import xlsxwriter
 import logging
+import uuid
 from datetime import datetime
 import os
 
 logger = logging.getLogger(__name__)
 
+# 字段差异工作表对应的字段
+DIFF_FIELDS = [
+    '姓名', '性别', '民族', '出生日期',
+    '学历', '入党时间', '个人身份', '人员类别'
+]
 
-def export_to_excel(results, output_folder):
+# 导出所需的结果分区
+EXPORT_SECTIONS = (
+    ['local_extra', 'national_extra'] + [f'diff_{field}' for field in DIFF_FIELDS] +
+    ['invalid_ids', 'duplicate_ids']
+)
+
+
+# 预生成的报告文件名（保存在结果存储目录中）
+REPORT_FILENAME = 'report.xlsx'
+
+# 空字段差异工作表的表头
+EMPTY_DIFF_COLUMNS = ['姓名', '身份证号', '单机表信息', '全国表信息']
+
+# 每批写入的行数
+WRITE_BATCH_ROWS = 10000
+
+
+def _iter_sheets(results):
     """
-    将比对结果导出为 Excel 文件
+    按导出顺序生成 (工作表名, DataFrame) 对
+
+    空结果也生成工作表（仅表头）。
+    """
+    for key, sheet_name in [('local_extra', '单机多出人员'), ('national_extra', '全国多出人员')]:
+        df = results.get(key)
+        if df is not None and not df.empty:
+            yield sheet_name, df
+        else:
+            yield sheet_name, pd.DataFrame(columns=['无数据'])
+
+    for field in DIFF_FIELDS:
+        df = results.get(f'diff_{field}')
+        if df is not None and not df.empty:
+            yield f'{field}差异', df
+        else:
+            yield f'{field}差异', pd.DataFrame(columns=EMPTY_DIFF_COLUMNS)
+
+    # 存在无效身份证号时附带无效明细
+    invalid = results.get('invalid_ids')
+    if invalid is not None and not invalid.empty:
+        yield '无效身份证号', invalid
+
+    # 存在重复身份证号时附带重复明细
+    duplicates = results.get('duplicate_ids')
+    if duplicates is not None and not duplicates.empty:
+        yield '重复身份证号', duplicates
+
+    # 增量比对时附带自上次比对以来的变化情况
+    changes = results.get('changes')
+    if changes is not None:
+        yield '变化情况', changes if not changes.empty else pd.DataFrame(columns=['无变化'])
+
+
+def _write_sheet(worksheet, df, header_format):
+    """
+    以逐行流式方式写入一个工作表
+
+    按列批量转换为 Python 对象（缺失值转为 None），再整行写入，
+    以满足 constant_memory 模式按行顺序写入的要求。
+    """
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+
+    # 自动调整列宽
+    worksheet.set_column(0, 10, 15)
+
+    row_num = 1
+    for start in range(0, len(df), WRITE_BATCH_ROWS):
+        batch = df.iloc[start:start + WRITE_BATCH_ROWS].astype(object)
+        batch = batch.where(batch.notna(), None)
+        for row in batch.itertuples(index=False, name=None):
+            worksheet.write_row(row_num, 0, row)
+            row_num += 1
+
+
+def write_report(results, filepath):
+    """
+    以 xlsxwriter constant_memory 模式流式写出比对结果
 
     Args:
         results: 比对结果字典 (来自 ComparisonEngine.generate_report())
-        output_folder: 输出目录路径
+        filepath: 输出文件路径
+
+    Returns:
+        str: 生成的文件路径
+
+    Raises:
+        Exception: 导出失败
+    """
+    return write_workbook(_iter_sheets(results), filepath)
+
+
+def write_workbook(sheets, filepath):
+    """
+    以 xlsxwriter constant_memory 模式流式写出若干工作表
+
+    先写入临时文件，完成后再替换目标文件。
+
+    Args:
+        sheets: (工作表名, DataFrame) 对的可迭代对象
+        filepath: 输出文件路径
 
     Returns:
         str: 生成的文件路径
@@ -23,107 +123,60 @@ def export_to_excel(results, output_folder):
     Raises:
         Exception: 导出失败
     """
+    tmp_path = f'{filepath}.tmp-{uuid.uuid4().hex}'
     try:
-        # 生成文件名（带时间戳）
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        filename = f'比对结果_{timestamp}.xlsx'
-        filepath = os.path.join(output_folder, filename)
-
-        # 使用 xlsxwriter 引擎创建 Excel
-        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
-            # 写入单机多出人员
-            if 'local_extra' in results and not results['local_extra'].empty:
-                results['local_extra'].to_excel(
-                    writer,
-                    sheet_name='单机多出人员',
-                    index=False
-                )
-                logger.info(f"已写入 '单机多出人员' Sheet, "
-                          f"{len(results['local_extra'])} 条记录")
-            else:
-                # 空结果也创建 Sheet (仅表头)
-                pd.DataFrame(columns=['无数据']).to_excel(
-                    writer,
-                    sheet_name='单机多出人员',
-                    index=False
-                )
-
-            # 写入全国多出人员
-            if 'national_extra' in results and not results['national_extra'].empty:
-                results['national_extra'].to_excel(
-                    writer,
-                    sheet_name='全国多出人员',
-                    index=False
-                )
-                logger.info(f"已写入 '全国多出人员' Sheet, "
-                          f"{len(results['national_extra'])} 条记录")
-            else:
-                pd.DataFrame(columns=['无数据']).to_excel(
-                    writer,
-                    sheet_name='全国多出人员',
-                    index=False
-                )
-
-            # 写入各字段差异
-            diff_fields = [
-                '姓名', '性别', '民族', '出生日期',
-                '学历', '入党时间', '个人身份', '人员类别'
-            ]
-
-            for field in diff_fields:
-                diff_key = f'diff_{field}'
-                sheet_name = f'{field}差异'
-
-                if diff_key in results and not results[diff_key].empty:
-                    results[diff_key].to_excel(
-                        writer,
-                        sheet_name=sheet_name,
-                        index=False
-                    )
-                    logger.info(f"已写入 '{sheet_name}' Sheet, "
-                              f"{len(results[diff_key])} 条记录")
-                else:
-                    # 空差异也创建 Sheet
-                    pd.DataFrame(columns=[
-                        '姓名', '身份证号', '单机表信息', '全国表信息'
-                    ]).to_excel(
-                        writer,
-                        sheet_name=sheet_name,
-                        index=False
-                    )
-
-            # 获取 workbook 以设置格式
-            workbook = writer.book
-
-            # 定义表头格式（加粗）
-            header_format = workbook.add_format({
-                'bold': True,
-                'align': 'center',
-                'valign': 'vcenter',
-                'bg_color': '#D9E1F2'
-            })
-
-            # 应用表头格式到所有工作表
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-
-                # 设置表头格式
-                for col_num, value in enumerate(
-                    results.get('local_extra', pd.DataFrame()).columns
-                ):
-                    worksheet.write(0, col_num, value, header_format)
-
-                # 自动调整列宽
-                worksheet.set_column(0, 10, 15)
-
-        logger.info(f"比对结果已导出: {filepath}")
+        workbook = xlsxwriter.Workbook(tmp_path, {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+        })
+
+        # 定义表头格式（加粗）
+        header_format = workbook.add_format({
+            'bold': True,
+            'align': 'center',
+            'valign': 'vcenter',
+            'bg_color': '#D9E1F2'
+        })
+
+        for sheet_name, df in sheets:
+            _write_sheet(workbook.add_worksheet(sheet_name), df, header_format)
+            logger.info(f"已写入 '{sheet_name}' Sheet, {len(df)} 条记录")
+
+        workbook.close()
+        os.replace(tmp_path, filepath)
+
+        logger.info(f"Excel 文件已导出: {filepath}")
         return filepath
 
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         logger.error(f"导出 Excel 失败: {e}")
         raise
 
 
+def export_to_excel(results, output_folder):
+    """
+    将比对结果导出为 Excel 文件
+
+    Args:
+        results: 比对结果字典 (来自 ComparisonEngine.generate_report())
+        output_folder: 输出目录路径
+
+    Returns:
+        str: 生成的文件路径
+
+    Raises:
+        Exception: 导出失败
+    """
+    # 生成文件名（带时间戳）
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    filename = f'比对结果_{timestamp}.xlsx'
+    return write_report(results, os.path.join(output_folder, filename))
+
+
 def format_date_columns(df, date_columns):
     """
     格式化 DataFrame 中的日期列
@@ -0,0 +1,946 @@
+"""
+外部排序比对模块 - 以有界内存比对超大花名册
+
+ComparisonEngine 需要将两个库完整读入内存。外部排序模式按以下步骤执行：
+
+1. 分块读取两个库，每块按 ComparisonEngine.preprocess_frame 计算派生列，
+   预处理结果按原顺序写入磁盘；同时将身份证号有效行的（身份证号、行号、
+   比对字段）按身份证号排序后作为有序段写入磁盘
+2. 多路归并各有序段，按身份证号合并连接两个库，记录匹配标记和存在
+   差异的行号对；重复的身份证号按 ComparisonEngine 的重复处理方式只保留
+   一行参与比对
+3. 按原顺序读取磁盘上的预处理结果，生成多出人员和字段差异分区
+
+各分区以未压缩的 Arrow IPC 文件流式写出，直接作为结果存储的分区。
+结果的行、顺序和取值与 ComparisonEngine 一致；同一列在不同数据块中
+类型不一致（如文本和数字混合）时，该列按文本保存。
+"""
+import os
+import json
+import uuid
+import heapq
+import shutil
+import logging
+import itertools
+from array import array
+from operator import itemgetter
+from datetime import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import xlrd
+from pandas.io.parsers import TextParser
+
+from core import metrics
+from core.comparison import ComparisonEngine
+from core.dtypes import compare_keys, plain_values
+from core.file_handler import PARSED_FRAME_EXTENSION, PARSED_FRAME_FALLBACK_EXTENSION
+from core.ingest import SOURCE_SHEET_COLUMN
+from core.result_store import ArrowFileSection, ResultStore
+
+logger = logging.getLogger(__name__)
+
+# 每个数据块的行数
+DEFAULT_CHUNK_ROWS = 50000
+
+# 归并时每个有序段每次读取的行数
+MERGE_BATCH_ROWS = 1024
+
+# 生成差异分区时每次按行号取数的行数
+TAKE_BATCH_ROWS = 50000
+
+# 有序段中的身份证号列和行号列
+ID_KEY = '__id'
+ROW_KEY = '__row'
+
+# 写出 Arrow IPC 文件的选项（不压缩，便于内存映射读取）
+IPC_OPTIONS = pa.ipc.IpcWriteOptions(compression=None)
+
+
+def count_rows(path):
+    """
+    不读取数据，获取解析缓存的行数
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        int: 行数；不是 Feather 解析缓存或无法读取时返回 None
+    """
+    if not path or not path.endswith(PARSED_FRAME_EXTENSION) or not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(
+                reader.get_record_batch(i).num_rows
+                for i in range(reader.num_record_batches)
+            )
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def use_external(mode, min_rows, *paths):
+    """
+    判断是否使用外部排序比对
+
+    Args:
+        mode: 'memory'、'external' 或 'auto'
+        min_rows: auto 时使用外部排序比对的最小合计行数
+        *paths: 两个库的解析缓存路径
+
+    Returns:
+        bool: 是否使用外部排序比对
+    """
+    if mode == 'external':
+        return True
+    if mode != 'auto':
+        return False
+    counts = [count_rows(path) for path in paths]
+    # 行数未知（没有解析缓存）时按内存比对处理
+    return None not in counts and sum(counts) >= min_rows
+
+
+# ---------------------------------------------------------------------------
+# 分块读取
+# ---------------------------------------------------------------------------
+
+def iter_roster_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, sheet_name=0):
+    """
+    分块读取花名册
+
+    支持上传时缓存的解析结果（.feather / .pkl）和 Excel 文件（.xls / .xlsx）。
+    Excel 按行流式读取，单元格转换和类型推断与 pd.read_excel 相同。
+
+    Args:
+        path: 文件路径
+        chunk_rows: 每块行数
+        sheet_name: 工作表（Excel 文件，默认第一个）
+
+    Yields:
+        DataFrame: 数据块
+    """
+    if path.endswith(PARSED_FRAME_EXTENSION):
+        yield from _iter_feather_chunks(path, chunk_rows)
+    elif path.endswith(PARSED_FRAME_FALLBACK_EXTENSION):
+        df = pd.read_pickle(path)
+        # 没有数据行时也返回一个只有表头的空块
+        for start in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows].reset_index(drop=True)
+    elif xlrd.inspect_format(path) == 'xls':
+        yield from _iter_parsed_rows(_iter_xls_rows(path, sheet_name), chunk_rows)
+    else:
+        yield from _iter_parsed_rows(_iter_xlsx_rows(path, sheet_name), chunk_rows)
+
+
+def iter_sheet_chunks(path, sheets, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    依次分块读取多个工作表，多张时增加来源工作表列（与 ingest.read_sheets 一致）
+
+    Args:
+        path: 文件路径（解析缓存只有一张表，忽略 sheets）
+        sheets: 工作表列表 [(索引, 名称), ...]
+        chunk_rows: 每块行数
+
+    Yields:
+        DataFrame: 数据块
+    """
+    if len(sheets) == 1 or path.endswith((PARSED_FRAME_EXTENSION, PARSED_FRAME_FALLBACK_EXTENSION)):
+        yield from iter_roster_chunks(path, chunk_rows, sheets[0][0])
+        return
+
+    for index, name in sheets:
+        for chunk in iter_roster_chunks(path, chunk_rows, index):
+            chunk[SOURCE_SHEET_COLUMN] = name
+            yield chunk
+
+
+def _iter_feather_chunks(path, chunk_rows):
+    """按记录批次读取 Feather 文件（每次只解压一个批次；没有数据行时返回只有表头的空块）"""
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        empty = True
+        for i in range(reader.num_record_batches):
+            table = pa.Table.from_batches([reader.get_batch(i)], schema=reader.schema)
+            for start in range(0, table.num_rows, chunk_rows):
+                empty = False
+                yield table.slice(start, chunk_rows).to_pandas()
+        if empty:
+            yield reader.schema.empty_table().to_pandas()
+
+
+def _iter_xlsx_rows(path, sheet_name):
+    """以只读模式逐行读取 .xlsx，单元格转换与 pandas 的 openpyxl 读取器一致"""
+    import openpyxl
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    def convert(cell):
+        if cell.value is None:
+            return ''
+        if cell.data_type == TYPE_ERROR:
+            return np.nan
+        if cell.data_type == TYPE_NUMERIC:
+            value = int(cell.value)
+            return value if value == cell.value else float(cell.value)
+        return cell.value
+
+    # 以文件对象打开：扩展名为 .xls 的 xlsx 文件也能读取
+    with open(path, 'rb') as f:
+        workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            if isinstance(sheet_name, int):
+                sheet = workbook.worksheets[sheet_name]
+            else:
+                sheet = workbook[sheet_name]
+            for row in sheet.iter_rows():
+                yield [convert(cell) for cell in row]
+        finally:
+            workbook.close()
+
+
+def _iter_xls_rows(path, sheet_name):
+    """逐行读取 .xls，单元格转换与 pandas 的 xlrd 读取器一致"""
+    book = xlrd.open_workbook(path, on_demand=True)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = book.sheet_by_index(sheet_name)
+        else:
+            sheet = book.sheet_by_name(sheet_name)
+
+        def convert(value, cell_type):
+            if cell_type == xlrd.XL_CELL_DATE:
+                try:
+                    value = xlrd.xldate.xldate_as_datetime(value, book.datemode)
+                except OverflowError:
+                    return value
+                # 纪元当天的日期视为时间
+                year = value.timetuple()[0:3]
+                if (not book.datemode and year == (1899, 12, 31)) or (
+                    book.datemode and year == (1904, 1, 1)
+                ):
+                    value = time(value.hour, value.minute, value.second, value.microsecond)
+                return value
+            if cell_type == xlrd.XL_CELL_ERROR:
+                return np.nan
+            if cell_type == xlrd.XL_CELL_BOOLEAN:
+                return bool(value)
+            if cell_type == xlrd.XL_CELL_NUMBER and np.isfinite(value):
+                integer = int(value)
+                return integer if integer == value else value
+            return value
+
+        for i in range(sheet.nrows):
+            yield [
+                convert(value, cell_type)
+                for value, cell_type in zip(sheet.row_values(i), sheet.row_types(i))
+            ]
+    finally:
+        book.release_resources()
+
+
+def _iter_parsed_rows(rows, chunk_rows):
+    """
+    将逐行数据按块交给 pandas 的 TextParser 进行类型推断
+
+    只有表头时返回一个只有表头的空块（与 pd.read_excel 一致），工作表为空时不返回数据块。
+    """
+    header = next(rows, None)
+    if header is None:
+        return
+
+    # 去除表头末尾的空单元格
+    while header and header[-1] == '':
+        header = header[:-1]
+    width = len(header)
+
+    def parse(buffer):
+        padded = [row[:width] + [''] * (width - len(row)) for row in buffer]
+        return TextParser([header] + padded, header=0).read()
+
+    buffer = []
+    parsed = False
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= chunk_rows:
+            yield parse(buffer)
+            buffer = []
+            parsed = True
+    if buffer or not parsed:
+        yield parse(buffer)
+
+
+# ---------------------------------------------------------------------------
+# 类型处理
+# ---------------------------------------------------------------------------
+
+def _id_keys(ids):
+    """
+    身份证号的合并键
+
+    与 pd.merge / isin 一致，缺失的身份证号之间互相匹配，排在最前。
+    """
+    return ('1' + ids.astype(object)).where(ids.notna(), '0')
+
+
+def _frame_to_table(df):
+    """
+    将数据块转换为 Arrow 表
+
+    Arrow 无法表示的混合类型列转换为文本；全部为空的浮点数列和 object 列
+    （读取 Excel 时未推断出类型）记为 null 类型，以便与其他数据块统一类型。
+    """
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        df[col] = plain_values(df[col])
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        for col in df.columns:
+            try:
+                pa.Array.from_pandas(df[col])
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                df[col] = df[col].map(lambda value: value if pd.isna(value) else str(value))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+    for i, col in enumerate(df.columns):
+        column = table.column(i)
+        untyped = df[col].dtype == object or df[col].dtype == np.float64
+        if untyped and column.null_count == len(column) and column.type != pa.null():
+            table = table.set_column(i, pa.field(str(col), pa.null()), pa.nulls(len(column)))
+    return table
+
+
+def _normalize_type(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pa.large_string()
+    return arrow_type
+
+
+def _unify_type(types):
+    """统一多个数据块中同一列的类型"""
+    types = [_normalize_type(t) for t in types]
+    # 与 pd.concat 一致：整数列与全部为空的数据块合并后为浮点数
+    has_null = pa.null() in types
+    types = {t for t in types if t != pa.null()}
+    if not types:
+        # 与 pd.read_excel 一致：全部为空的列为浮点数
+        return pa.float64()
+    if len(types) == 1:
+        unified = types.pop()
+        return pa.float64() if has_null and pa.types.is_integer(unified) else unified
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.large_string()
+
+
+def _pandas_column_metadata(name, arrow_type):
+    """为类型发生变化的列生成 pandas 元数据"""
+    if pa.types.is_large_string(arrow_type):
+        series = pd.Series([], dtype='str')
+    else:
+        series = pd.Series([], dtype=arrow_type.to_pandas_dtype())
+    return pa.Schema.from_pandas(
+        pd.DataFrame({name: series}), preserve_index=False
+    ).pandas_metadata['columns'][0]
+
+
+def _unify_schemas(schemas):
+    """
+    统一各数据块的表结构
+
+    Returns:
+        pa.Schema: 统一后的表结构（附带 pandas 元数据，读取时恢复原类型）
+    """
+    names = schemas[0].names
+    fields = []
+    column_metadata = {}
+
+    for name in names:
+        types = [schema.field(name).type for schema in schemas]
+        unified = _unify_type(types)
+        fields.append(pa.field(name, unified))
+
+        # 使用第一个非空数据块的 pandas 元数据；类型变化时重新生成
+        source = next(
+            (schema for schema in schemas if schema.field(name).type != pa.null()),
+            schemas[0]
+        )
+        entries = {entry['field_name']: entry for entry in source.pandas_metadata['columns']}
+        entry = entries.get(name)
+        if entry is None or _normalize_type(source.field(name).type) != unified:
+            entry = _pandas_column_metadata(name, unified)
+        column_metadata[name] = entry
+
+    pandas_metadata = dict(schemas[0].pandas_metadata)
+    pandas_metadata['columns'] = [column_metadata[name] for name in names]
+    schema = pa.schema(fields)
+    return schema.with_metadata({b'pandas': json.dumps(pandas_metadata).encode('utf-8')})
+
+
+def _conform(table, schema):
+    """将数据块转换为统一后的表结构"""
+    columns = []
+    for field in schema:
+        column = table.column(field.name)
+        columns.append(_cast(column, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _write_ipc(path, table, max_chunksize=None):
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema, options=IPC_OPTIONS) as writer:
+            writer.write_table(table, max_chunksize=max_chunksize)
+
+
+def _read_ipc(path):
+    """以内存映射方式读取 Arrow IPC 文件（不复制数据）"""
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def _common_type(*types):
+    """两列值放入同一结果列时的类型"""
+    return _unify_type(types)
+
+
+# ---------------------------------------------------------------------------
+# 外部排序比对
+# ---------------------------------------------------------------------------
+
+class _SpilledRoster:
+    """单个库在磁盘上的预处理数据块和有序段"""
+
+    def __init__(self, side, work_dir):
+        self.side = side
+        self.work_dir = os.path.join(work_dir, side)
+        os.makedirs(self.work_dir)
+        self.rows = 0
+        self.columns = None
+        self.chunk_files = []
+        self.chunk_schemas = []
+        self.run_files = []
+        self.key_fields = []
+        self.valid_masks = []
+
+    def spill(self, chunks, engine):
+        """
+        预处理并写出各数据块，同时生成按身份证号排序的有序段
+
+        Args:
+            chunks: 数据块迭代器
+            engine: 用于计算派生列的 ComparisonEngine
+        """
+        id_col = engine.ROSTER_SPECS[self.side][0]
+
+        for index, chunk in enumerate(chunks):
+            chunk = chunk.reset_index(drop=True)
+            engine.preprocess_frame(chunk, self.side, start=self.rows + 1)
+
+            if self.columns is None:
+                self.columns = list(chunk.columns)
+                self.key_fields = self._key_fields(engine)
+
+            table = _frame_to_table(chunk)
+            chunk_path = os.path.join(self.work_dir, f'chunk_{index:05d}.arrow')
+            _write_ipc(chunk_path, table)
+            self.chunk_files.append(chunk_path)
+            self.chunk_schemas.append(table.schema)
+
+            # 无效身份证号不参与比对
+            valid = chunk[engine.ID_CHECK_COLUMN].isna().to_numpy()
+            self.valid_masks.append(valid)
+            keyed = chunk if valid.all() else chunk[valid]
+
+            run = {
+                ID_KEY: _id_keys(keyed[id_col]),
+                ROW_KEY: np.arange(self.rows, self.rows + len(chunk), dtype=np.int64)[valid],
+            }
+            for field, column in self.key_fields:
+                run[field] = compare_keys(keyed[column])
+            run_table = pa.table({
+                name: pa.array(values, type=(
+                    pa.int64() if name == ROW_KEY else pa.large_string()
+                ))
+                for name, values in run.items()
+            }).sort_by([(ID_KEY, 'ascending'), (ROW_KEY, 'ascending')])
+
+            run_path = os.path.join(self.work_dir, f'run_{index:05d}.arrow')
+            _write_ipc(run_path, run_table, max_chunksize=MERGE_BATCH_ROWS)
+            self.run_files.append(run_path)
+
+            self.rows += len(chunk)
+
+        if self.columns is None:
+            # 只有表头时数据块为空块，这里只在工作表完全为空时出现
+            raise ValueError(f'{engine.ROSTER_SPECS[self.side][2]}没有表头')
+
+    @property
+    def valid(self):
+        """身份证号校验通过的行掩码"""
+        return np.concatenate(self.valid_masks)
+
+    def _key_fields(self, engine):
+        """本库参与比对的字段：[(单机库字段名, 本库列名)]"""
+        fields = []
+        for field in engine.COMPARE_FIELDS:
+            column = field if self.side == 'local' else engine.FIELD_MAPPING.get(field, field)
+            if column in self.columns:
+                fields.append((field, column))
+        return fields
+
+    def iter_sorted(self, fields):
+        """
+        多路归并有序段，按（身份证号、行号）顺序逐行返回
+
+        Yields:
+            tuple: (身份证号, 行号, 各字段比较键...)
+        """
+        columns = [ID_KEY, ROW_KEY] + fields
+        return heapq.merge(*[_iter_run(path, columns) for path in self.run_files])
+
+    def write_section(self, path, mask=None):
+        """
+        按原顺序写出预处理数据（可按行掩码筛选）
+
+        Args:
+            path: 输出文件路径
+            mask: 行掩码（numpy bool 数组），None 表示全部行
+        """
+        schema = _unify_schemas(self.chunk_schemas)
+        offset = 0
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema, options=IPC_OPTIONS) as writer:
+                for chunk_path in self.chunk_files:
+                    table = _read_ipc(chunk_path)
+                    rows = table.num_rows
+                    if mask is not None:
+                        table = table.filter(pa.array(mask[offset:offset + rows]))
+                    writer.write_table(_conform(table, schema))
+                    offset += rows
+
+
+def _iter_run(path, columns):
+    """分批读取有序段"""
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            yield from zip(*[batch.column(name).to_pylist() for name in columns])
+
+
+def _iter_groups(rows):
+    """按身份证号分组"""
+    for key, group in itertools.groupby(rows, key=itemgetter(0)):
+        yield key, list(group)
+
+
+def _iter_unique_groups(groups, keep, duplicates):
+    """
+    按身份证号分组，并按重复处理方式选出参与比对的行
+
+    Args:
+        groups: _iter_groups 生成的分组
+        keep: 'first' 或 'last'
+        duplicates: 重复身份证号所在行的行号列表（原地追加）
+
+    Yields:
+        tuple: (身份证号, 全部行, 参与比对的行)
+    """
+    for key, rows in groups:
+        if len(rows) == 1:
+            yield key, rows, rows
+        else:
+            duplicates.extend(row[1] for row in rows)
+            yield key, rows, rows[-1:] if keep == 'last' else rows[:1]
+
+
+class ExternalComparison:
+    """外部排序比对"""
+
+    def __init__(self, local_chunks, national_chunks, work_dir, reference_date=None,
+                 duplicate_policy=None):
+        """
+        初始化外部排序比对
+
+        Args:
+            local_chunks: 单机库数据块迭代器
+            national_chunks: 全国库数据块迭代器
+            work_dir: 临时工作目录（完成后删除）
+            reference_date: 党龄/年龄计算基准日期
+            duplicate_policy: 身份证号重复时的处理方式（见 ComparisonEngine）
+        """
+        self.local_chunks = local_chunks
+        self.national_chunks = national_chunks
+        self.work_dir = work_dir
+        # 仅用于复用派生列计算、日期解析缓存和重复身份证号处理
+        self.engine = ComparisonEngine(
+            pd.DataFrame(), pd.DataFrame(), reference_date, duplicate_policy
+        )
+
+    def run(self, store_dir, progress=None):
+        """
+        执行比对并保存结果存储
+
+        Args:
+            store_dir: 结果存储目录
+            progress: 可选的阶段回调，与 ComparisonEngine.generate_report 相同
+
+        Returns:
+            ResultStore: 结果存储
+        """
+        os.makedirs(self.work_dir)
+        try:
+            logger.info("开始外部排序比对")
+
+            if progress:
+                progress('preprocess')
+            with metrics.track_phase('preprocess') as record:
+                local = _SpilledRoster('local', self.work_dir)
+                local.spill(self.local_chunks, self.engine)
+                national = _SpilledRoster('national', self.work_dir)
+                national.spill(self.national_chunks, self.engine)
+                record['rows'] = local.rows + national.rows
+            logger.info(
+                f"数据分块预处理完成: 单机库 {local.rows} 行 / {len(local.run_files)} 段，"
+                f"全国库 {national.rows} 行 / {len(national.run_files)} 段"
+            )
+
+            national_fields = {field for field, _ in national.key_fields}
+            compared = [
+                (field, column) for field, column in local.key_fields
+                if field in national_fields
+            ]
+            national_columns = dict(national.key_fields)
+
+            if progress:
+                progress('find_differences')
+            with metrics.track_phase('find_differences', rows=local.rows + national.rows):
+                local_matched, national_matched, pairs, duplicates = self._merge_join(
+                    local, national, [field for field, _ in compared]
+                )
+
+            if progress:
+                progress('find_field_differences')
+            with metrics.track_phase('find_field_differences', rows=local.rows + national.rows):
+                results = self._write_sections(
+                    local, national, local_matched, national_matched,
+                    compared, national_columns, pairs, duplicates
+                )
+
+            if progress:
+                progress('save')
+            with metrics.track_phase('save', rows=local.rows + national.rows):
+                store = ResultStore.save(results, store_dir)
+            logger.info("外部排序比对完成")
+            return store
+
+        except Exception as e:
+            logger.error(f"外部排序比对失败: {e}")
+            raise
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _merge_join(self, local, national, fields):
+        """
+        按身份证号合并连接两个库
+
+        匹配标记按身份证号集合判断（与 ComparisonEngine.find_differences
+        一致），字段比对中重复的身份证号每个库只保留一行。
+
+        Returns:
+            tuple: (单机库匹配标记, 全国库匹配标记, {字段: (单机行号数组, 全国行号数组)},
+                    {'local': 重复行号列表, 'national': 重复行号列表})
+        """
+        local_matched = np.zeros(local.rows, dtype=bool)
+        national_matched = np.zeros(national.rows, dtype=bool)
+        pairs = {field: (array('q'), array('q')) for field in fields}
+        indexed = [(2 + i, pairs[field]) for i, field in enumerate(fields)]
+        duplicates = {'local': [], 'national': []}
+        keep = 'last' if self.engine.duplicate_policy == 'last' else 'first'
+
+        local_groups = _iter_unique_groups(
+            _iter_groups(local.iter_sorted(fields)), keep, duplicates['local']
+        )
+        national_groups = _iter_unique_groups(
+            _iter_groups(national.iter_sorted(fields)), keep, duplicates['national']
+        )
+        local_group = next(local_groups, None)
+        national_group = next(national_groups, None)
+
+        while local_group is not None and national_group is not None:
+            local_id, local_rows, local_kept = local_group
+            national_id, national_rows, national_kept = national_group
+
+            if local_id < national_id:
+                local_group = next(local_groups, None)
+            elif local_id > national_id:
+                national_group = next(national_groups, None)
+            else:
+                for row in local_rows:
+                    local_matched[row[1]] = True
+                for row in national_rows:
+                    national_matched[row[1]] = True
+                for local_row in local_kept:
+                    for national_row in national_kept:
+                        for position, (local_index, national_index) in indexed:
+                            local_key = local_row[position]
+                            national_key = national_row[position]
+                            # 与 pandas 一致：缺失值与任何值都不相等
+                            if local_key is None or national_key is None or local_key != national_key:
+                                local_index.append(local_row[1])
+                                national_index.append(national_row[1])
+                local_group = next(local_groups, None)
+                national_group = next(national_groups, None)
+
+        # 剩余分组不再匹配，仍需检查其中的重复身份证号
+        for _ in itertools.chain(local_groups, national_groups):
+            pass
+
+        return local_matched, national_matched, pairs, duplicates
+
+    def _write_sections(self, local, national, local_matched, national_matched,
+                        compared, national_columns, pairs, duplicates):
+        """生成所有结果分区（顺序与 ComparisonEngine.generate_report 相同）"""
+        engine = self.engine
+        sections_dir = os.path.join(self.work_dir, 'sections')
+        os.makedirs(sections_dir)
+
+        def section_path(name):
+            return os.path.join(sections_dir, f'{name}.arrow')
+
+        local.write_section(section_path('local_preprocessed'))
+        national.write_section(section_path('national_preprocessed'))
+
+        local_table = _read_ipc(section_path('local_preprocessed'))
+        national_table = _read_ipc(section_path('national_preprocessed'))
+
+        tables = {'local': local_table, 'national': national_table}
+        valid = {'local': local.valid, 'national': national.valid}
+        results = {
+            'invalid_ids': self._invalid_section(tables, valid),
+            'duplicate_ids': self._duplicate_section(tables, duplicates),
+        }
+
+        # 无效身份证号不计入多出人员
+        local_extra = ~local_matched & valid['local']
+        national_extra = ~national_matched & valid['national']
+        local.write_section(section_path('local_extra'), mask=local_extra)
+        national.write_section(section_path('national_extra'), mask=national_extra)
+        results['local_extra'] = ArrowFileSection(section_path('local_extra'))
+        results['national_extra'] = ArrowFileSection(section_path('national_extra'))
+        logger.info(f"找到单机多出人员: {int(local_extra.sum())} 人")
+        logger.info(f"找到全国多出人员: {int(national_extra.sum())} 人")
+
+        id_col = engine.ROSTER_SPECS['local'][0]
+
+        # 按合并结果的顺序（单机库行号、全国库行号）排列差异行号对
+        ordered = {}
+        for field, _ in compared:
+            local_index = np.frombuffer(pairs[field][0], dtype=np.int64)
+            national_index = np.frombuffer(pairs[field][1], dtype=np.int64)
+            order = np.lexsort((national_index, local_index))
+            ordered[field] = (local_index[order], national_index[order])
+
+        def iter_diff_batches(field, column):
+            local_index, national_index = ordered[field]
+            value_type = _common_type(
+                local_table.schema.field(column).type,
+                national_table.schema.field(national_columns[field]).type
+            )
+            for start in range(0, len(local_index), TAKE_BATCH_ROWS):
+                local_take = pa.array(local_index[start:start + TAKE_BATCH_ROWS])
+                national_take = pa.array(national_index[start:start + TAKE_BATCH_ROWS])
+                yield {
+                    '身份证号': local_table.column(id_col).take(local_take),
+                    '姓名': local_table.column('姓名').take(local_take),
+                    '单机表信息': _cast(local_table.column(column).take(local_take), value_type),
+                    '全国表信息': _cast(
+                        national_table.column(national_columns[field]).take(national_take),
+                        value_type
+                    ),
+                }
+
+        # 长表差异
+        if compared:
+            long_value_type = _common_type(*[
+                _common_type(
+                    local_table.schema.field(column).type,
+                    national_table.schema.field(national_columns[field]).type
+                )
+                for field, column in compared
+            ])
+            long_schema = pa.schema([
+                ('身份证号', _common_type(local_table.schema.field(id_col).type)),
+                ('姓名', _common_type(local_table.schema.field('姓名').type)),
+                ('字段', pa.dictionary(pa.int8(), pa.large_string())),
+                ('单机表信息', long_value_type),
+                ('全国表信息', long_value_type),
+            ])
+            dictionary = pa.array(engine.COMPARE_FIELDS, type=pa.large_string())
+            with pa.OSFile(section_path('field_diff_table'), 'wb') as sink:
+                with pa.ipc.new_file(sink, long_schema, options=IPC_OPTIONS) as writer:
+                    for field, column in compared:
+                        code = engine.COMPARE_FIELDS.index(field)
+                        for batch in iter_diff_batches(field, column):
+                            rows = len(batch['身份证号'])
+                            writer.write_table(pa.table({
+                                '身份证号': _cast(batch['身份证号'], long_schema.field('身份证号').type),
+                                '姓名': _cast(batch['姓名'], long_schema.field('姓名').type),
+                                '字段': pa.DictionaryArray.from_arrays(
+                                    pa.array(np.full(rows, code, dtype=np.int8)), dictionary
+                                ),
+                                '单机表信息': _cast(batch['单机表信息'], long_value_type),
+                                '全国表信息': _cast(batch['全国表信息'], long_value_type),
+                            }, schema=long_schema))
+            results['field_diff_table'] = ArrowFileSection(section_path('field_diff_table'))
+        else:
+            diff_table = pd.DataFrame(columns=engine.DIFF_TABLE_COLUMNS)
+            diff_table['字段'] = pd.Categorical(diff_table['字段'], categories=engine.COMPARE_FIELDS)
+            results['field_diff_table'] = diff_table
+
+        # 各字段差异
+        compared_columns = dict(compared)
+        for field in engine.COMPARE_FIELDS:
+            name = f'diff_{field}'
+            if field not in compared_columns:
+                logger.warning(f"字段 '{field}' 在数据中不存在")
+                results[name] = pd.DataFrame()
+                continue
+
+            count = len(ordered[field][0])
+            logger.info(f"字段 '{field}' 发现 {count} 条差异")
+            if count == 0:
+                results[name] = pd.DataFrame(columns=engine.FIELD_DIFF_COLUMNS)
+                continue
+
+            writer = None
+            with pa.OSFile(section_path(name), 'wb') as sink:
+                for batch in iter_diff_batches(field, compared_columns[field]):
+                    table = pa.table({col: batch[col] for col in engine.FIELD_DIFF_COLUMNS})
+                    if writer is None:
+                        writer = pa.ipc.new_file(sink, table.schema, options=IPC_OPTIONS)
+                    writer.write_table(table)
+                writer.close()
+            results[name] = ArrowFileSection(section_path(name))
+
+        results['local_preprocessed'] = ArrowFileSection(section_path('local_preprocessed'))
+        results['national_preprocessed'] = ArrowFileSection(section_path('national_preprocessed'))
+        return results
+
+    def _invalid_section(self, tables, valid):
+        """
+        生成无效身份证号明细（与 ComparisonEngine.find_invalid_ids 相同）
+
+        Args:
+            tables: {'local': 预处理表, 'national': 预处理表}
+            valid: {'local': 身份证号有效掩码, 'national': 身份证号有效掩码}
+
+        Returns:
+            DataFrame: 无效身份证号明细
+        """
+        engine = self.engine
+        pieces = []
+        for side in ('local', 'national'):
+            positions = np.flatnonzero(~valid[side])
+            if len(positions) == 0:
+                continue
+            rows = tables[side].take(pa.array(positions, type=pa.int64()))
+            report = engine.invalid_report(
+                side,
+                rows.column(engine.ROSTER_SPECS[side][0]).to_pandas(),
+                rows.column('序号').to_numpy(),
+                rows.column('姓名').to_pandas(),
+                rows.column(engine.ID_CHECK_COLUMN).to_pandas()
+            )
+            logger.warning(f"{engine.ROSTER_SPECS[side][2]}中有 {len(report)} 行身份证号无效")
+            pieces.append(report)
+
+        return (
+            pd.concat(pieces, ignore_index=True) if pieces
+            else pd.DataFrame(columns=engine.INVALID_ID_COLUMNS)
+        )
+
+    def _duplicate_section(self, tables, duplicates):
+        """
+        生成重复身份证号明细（与 ComparisonEngine.find_duplicate_ids 相同）
+
+        Args:
+            tables: {'local': 预处理表, 'national': 预处理表}
+            duplicates: _merge_join 返回的重复行号
+
+        Returns:
+            DataFrame: 重复身份证号明细
+
+        Raises:
+            ValueError: reject 方式下存在重复身份证号
+        """
+        engine = self.engine
+        pieces = []
+        for side in ('local', 'national'):
+            if not duplicates[side]:
+                continue
+            rows = tables[side].take(pa.array(sorted(duplicates[side]), type=pa.int64()))
+            report, kept = engine.duplicate_report(
+                side,
+                rows.column(engine.ROSTER_SPECS[side][0]).to_pandas(),
+                rows.column('序号').to_numpy(),
+                rows.column('姓名').to_pandas()
+            )
+            ignored = int((~kept).sum())
+            logger.warning(
+                f"{engine.ROSTER_SPECS[side][2]}中有 {len(report) - ignored} 个身份证号重复"
+                f"（共 {len(report)} 行），{ignored} 行不参与字段比对"
+            )
+            pieces.append(report)
+
+        report = (
+            pd.concat(pieces, ignore_index=True) if pieces
+            else pd.DataFrame(columns=engine.DUPLICATE_COLUMNS)
+        )
+        engine.reject_duplicates(report)
+        return report
+
+
+def _cast(column, arrow_type):
+    if column.type == arrow_type:
+        return column
+    if column.type == pa.null():
+        return pa.nulls(len(column), arrow_type)
+    return column.cast(arrow_type)
+
+
+def compare_files(local_path, national_path, store_dir, reference_date=None,
+                  chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, duplicate_policy=None,
+                  work_dir=None, national_sheets=None):
+    """
+    以外部排序方式比对两个花名册文件并保存结果存储
+
+    Args:
+        local_path: 单机库文件（.feather / .pkl 解析缓存或 Excel 文件）
+        national_path: 全国库文件
+        store_dir: 结果存储目录
+        reference_date: 党龄/年龄计算基准日期
+        chunk_rows: 每块行数
+        progress: 可选的阶段回调
+        duplicate_policy: 身份证号重复时的处理方式（见 ComparisonEngine）
+        work_dir: 临时文件所在目录（默认与结果目录相邻）；结果目录在共享
+            存储上时可指定本机目录，只有最终结果写入共享存储
+        national_sheets: 全国库为 Excel 文件时读取的工作表 [(索引, 名称), ...]
+            （默认第一张；多张时依次读取并增加来源工作表列）
+
+    Returns:
+        ResultStore: 结果存储
+    """
+    if work_dir:
+        work_dir = os.path.join(work_dir, f'external-{uuid.uuid4().hex}')
+    else:
+        work_dir = f'{store_dir}.external-{uuid.uuid4().hex}'
+    comparison = ExternalComparison(
+        iter_roster_chunks(local_path, chunk_rows),
+        iter_sheet_chunks(national_path, national_sheets or [(0, None)], chunk_rows),
+        work_dir,
+        reference_date,
+        duplicate_policy
+    )
+    return comparison.run(store_dir, progress=progress)
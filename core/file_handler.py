@@ -4,15 +4,30 @@
 import os
 import uuid
 import shutil
+import hashlib
 import logging
 from datetime import datetime, timedelta
+import pandas as pd
 from werkzeug.utils import secure_filename
 
+from core import excel_reader
+from core.dtypes import compact_frame
+from core.result_cache import RESULT_CACHE_DIRNAME, ResultCache
+
 logger = logging.getLogger(__name__)
 
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'.xls', '.xlsx'}
 
+# 保存上传文件时的分块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 解析后数据的列式缓存扩展名
+PARSED_FRAME_EXTENSION = '.feather'
+
+# 无法以列式格式保存时的回退扩展名
+PARSED_FRAME_FALLBACK_EXTENSION = '.pkl'
+
 
 def allowed_file(filename):
     """
@@ -37,26 +52,9 @@ def get_session_id():
     return str(uuid.uuid4())
 
 
-def create_session_directory(base_upload_folder, session_id):
-    """
-    为会话创建独立的上传目录
-
-    Args:
-        base_upload_folder: 基础上传目录路径
-        session_id: 会话 ID
-
-    Returns:
-        str: 会话上传目录路径
-    """
-    session_dir = os.path.join(base_upload_folder, session_id)
-    os.makedirs(session_dir, exist_ok=True)
-    logger.info(f"创建会话目录: {session_dir}")
-    return session_dir
-
-
 def save_uploaded_file(file, upload_folder, original_filename=None):
     """
-    保存上传的文件
+    保存上传的文件，并在写入时计算内容的 SHA-256
 
     Args:
         file: werkzeug.FileStorage 对象
@@ -64,7 +62,7 @@ def save_uploaded_file(file, upload_folder, original_filename=None):
         original_filename: 可选的原始文件名
 
     Returns:
-        str: 保存后的文件路径
+        tuple: (保存后的文件路径, 文件内容 SHA-256 十六进制摘要)
 
     Raises:
         ValueError: 文件类型不允许
@@ -86,11 +84,94 @@ def save_uploaded_file(file, upload_folder, original_filename=None):
 
     filepath = os.path.join(upload_folder, safe_filename)
 
-    # 保存文件
-    file.save(filepath)
+    # 分块保存文件，同时计算摘要
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        while True:
+            chunk = file.stream.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
     logger.info(f"文件已保存: {filepath}")
 
-    return filepath
+    return filepath, digest.hexdigest()
+
+
+def read_roster(filepath, sheet_name=0, compact=False):
+    """
+    解析花名册 Excel 文件
+
+    Args:
+        filepath: Excel 文件路径
+        sheet_name: 工作表（默认第一个）
+        compact: 是否转换为紧凑类型（见 core.dtypes.compact_frame）
+
+    Returns:
+        DataFrame: 花名册数据
+    """
+    df = excel_reader.read_excel(filepath, sheet_name=sheet_name)
+    if compact:
+        df = compact_frame(df)
+    return df
+
+
+def get_parsed_frame_path(filepath):
+    """
+    获取上传文件对应的解析结果缓存路径（不含扩展名）
+
+    Args:
+        filepath: 上传文件路径
+
+    Returns:
+        str: 缓存文件基础路径，如 uploads/<session_id>/local.parsed
+    """
+    return os.path.splitext(filepath)[0] + '.parsed'
+
+
+def save_parsed_frame(df, filepath):
+    """
+    将校验通过后解析得到的 DataFrame 保存为列式缓存文件
+
+    优先使用 Feather 格式；若数据中存在 Arrow 无法表示的混合类型列，
+    回退为 pickle，保证读取结果与原始解析完全一致。
+
+    Args:
+        df: 解析后的 DataFrame
+        filepath: 上传文件路径
+
+    Returns:
+        str: 缓存文件路径
+    """
+    base_path = get_parsed_frame_path(filepath)
+    frame_path = base_path + PARSED_FRAME_EXTENSION
+
+    try:
+        df.to_feather(frame_path)
+    except Exception as e:
+        logger.warning(f"无法以 Feather 格式缓存解析结果，改用 pickle: {e}")
+        if os.path.exists(frame_path):
+            os.remove(frame_path)
+        frame_path = base_path + PARSED_FRAME_FALLBACK_EXTENSION
+        df.to_pickle(frame_path)
+
+    logger.info(f"解析结果已缓存: {frame_path}")
+    return frame_path
+
+
+def load_parsed_frame(frame_path):
+    """
+    读取解析结果缓存文件
+
+    Args:
+        frame_path: save_parsed_frame 返回的缓存文件路径
+
+    Returns:
+        DataFrame: 解析后的数据
+    """
+    if frame_path.endswith(PARSED_FRAME_EXTENSION):
+        return pd.read_feather(frame_path)
+    return pd.read_pickle(frame_path)
 
 
 def cleanup_session_files(session_folder):
@@ -112,6 +193,8 @@ def cleanup_old_files(base_upload_folder, max_age_hours=1):
     """
     清理超时的临时文件
 
+    结果缓存目录不按会话目录整体删除，而是删除其中创建时间超时的条目。
+
     Args:
         base_upload_folder: 基础上传目录路径
         max_age_hours: 最大保留时间（小时）
@@ -129,6 +212,10 @@ def cleanup_old_files(base_upload_folder, max_age_hours=1):
             if not os.path.isdir(session_path):
                 continue
 
+            if session_dir == RESULT_CACHE_DIRNAME:
+                ResultCache(session_path, max_bytes=0).purge_expired(threshold)
+                continue
+
             # 获取目录创建时间
             creation_time = datetime.fromtimestamp(os.path.getctime(session_path))
 
@@ -0,0 +1,388 @@
+"""
+增量比对模块 - 基于逐行指纹只重新比对发生变化的人员
+
+每次比对完成后，在状态目录中保存：
+
+- 两个库每个身份证号的指纹（对该身份证号所有行的比对字段取哈希，
+  同一身份证号有多行时按出现顺序组合）
+- 长表字段差异，以及每条差异在两个库中是该身份证号的第几行
+
+同一组织再次比对时，先按指纹找出新增、删除和修改的身份证号，只对这些
+人员重新比对字段差异，其余差异直接沿用上次结果并按新的行位置重新排序。
+结果与完整比对一致，并额外包含 changes 分区，列出自上次比对以来的变化。
+
+基准日期、比对引擎版本或参与比对的字段变化时，上次状态失效，执行完整比对。
+"""
+import os
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core import metrics
+from core.comparison import ComparisonEngine
+from core.dtypes import compare_keys, isin, plain_values
+from core.result_store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+# 状态格式版本（不兼容修改时递增）
+STATE_VERSION = 1
+
+# 状态元数据文件名（保存在状态目录中）
+STATE_FILENAME = 'state.json'
+
+# 变化情况结果分区
+CHANGES_SECTION = 'changes'
+CHANGE_COLUMNS = ['库', '身份证号', '姓名', '变化']
+CHANGE_ADDED = '新增'
+CHANGE_REMOVED = '删除'
+CHANGE_MODIFIED = '修改'
+
+# 库名称（变化情况中的“库”列）
+SIDE_LABELS = {'local': '单机库', 'national': '全国库'}
+
+# 同一身份证号多行时，按出现顺序加权组合行哈希
+_OCCURRENCE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# 逐列组合取值哈希
+_COLUMN_MULTIPLIER = np.uint64(1000003)
+
+# 缺失值的哈希
+_MISSING_HASH = pd.util.hash_array(np.array([None], dtype=object))[0]
+
+
+def _key_hashes(series):
+    """
+    按比较键（见 dtypes.compare_keys）计算每个取值的哈希
+
+    取值相同则哈希相同，与列的类型（category、Arrow 字符串、object）无关；
+    category 列只对类别计算一次。
+
+    Returns:
+        np.ndarray: uint64 数组
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        category_hashes = np.append(
+            pd.util.hash_array(compare_keys(pd.Series(series.cat.categories)).to_numpy()),
+            _MISSING_HASH
+        )
+        # 缺失值编码为 -1，对应末尾的缺失值哈希
+        return category_hashes[codes]
+    return pd.util.hash_array(compare_keys(series).to_numpy())
+
+
+def _side_columns(side, fields):
+    """本库参与指纹计算的列：身份证号列和各比对字段列"""
+    id_col = ComparisonEngine.ROSTER_SPECS[side][0]
+    if side == 'local':
+        return id_col, list(fields)
+    return id_col, [ComparisonEngine.FIELD_MAPPING.get(field, field) for field in fields]
+
+
+def fingerprint_frame(df, side, fields):
+    """
+    计算预处理后数据的身份证号指纹
+
+    Args:
+        df: 预处理后的库 DataFrame
+        side: 'local' 或 'national'
+        fields: 参与比对的字段
+
+    Returns:
+        tuple: (指纹 DataFrame[身份证号, 姓名, 指纹]（每个身份证号一行，按首次出现顺序）,
+                每行是该身份证号的第几行（从 0 开始）)
+    """
+    id_col, columns = _side_columns(side, fields)
+
+    # 无符号整数运算按 2^64 取模
+    with np.errstate(over='ignore'):
+        row_hashes = _key_hashes(df[id_col])
+        for column in columns:
+            row_hashes = (row_hashes * _COLUMN_MULTIPLIER) ^ _key_hashes(df[column])
+
+    codes, uniques = pd.factorize(df[id_col], use_na_sentinel=False)
+    occurrence = pd.Series(codes).groupby(codes).cumcount().to_numpy(dtype=np.int64)
+
+    with np.errstate(over='ignore'):
+        weighted = row_hashes * ((occurrence.astype(np.uint64) + np.uint64(1)) * _OCCURRENCE_MULTIPLIER)
+    fingerprints = np.zeros(len(uniques), dtype=np.uint64)
+    np.add.at(fingerprints, codes, weighted)
+
+    first_rows = np.unique(codes, return_index=True)[1]
+    table = pd.DataFrame({
+        '身份证号': plain_values(pd.Series(uniques)).astype(object),
+        '姓名': plain_values(df['姓名']).iloc[first_rows].astype(object).to_numpy(),
+        '指纹': fingerprints
+    })
+    return table, occurrence
+
+
+def detect_changes(old, new):
+    """
+    比较两次的指纹，找出新增、删除和修改的身份证号
+
+    Args:
+        old: 上次的指纹 DataFrame
+        new: 本次的指纹 DataFrame
+
+    Returns:
+        DataFrame: [身份证号, 姓名, 变化]，新增和修改按本次顺序，删除按上次顺序排在最后
+    """
+    # 指纹表中身份证号唯一
+    positions = pd.Index(old['身份证号']).get_indexer(new['身份证号'])
+    old_fingerprints = old['指纹'].to_numpy(dtype=np.uint64)[np.maximum(positions, 0)]
+    added = positions < 0
+    modified = ~added & (new['指纹'].to_numpy(dtype=np.uint64) != old_fingerprints)
+
+    current = new.loc[added | modified, ['身份证号', '姓名']].copy()
+    current['变化'] = np.where(added[added | modified], CHANGE_ADDED, CHANGE_MODIFIED)
+
+    removed = old.loc[~isin(old['身份证号'], new['身份证号']), ['身份证号', '姓名']].copy()
+    removed['变化'] = CHANGE_REMOVED
+
+    return pd.concat([current, removed], ignore_index=True)
+
+
+class IncrementalState:
+    """上次比对的指纹和字段差异（保存在状态目录中）"""
+
+    SECTIONS = ['local_fingerprints', 'national_fingerprints', 'field_diffs']
+
+    def __init__(self, state_dir):
+        """
+        Args:
+            state_dir: 状态目录（每个组织一个）
+        """
+        self.state_dir = state_dir
+        self.store = ResultStore(state_dir)
+
+    @property
+    def meta_path(self):
+        return self.store.artifact_path(STATE_FILENAME)
+
+    def load(self, engine, fields):
+        """
+        读取可用于本次比对的上次状态
+
+        Args:
+            engine: 本次比对引擎（检查版本和基准日期）
+            fields: 本次参与比对的字段
+
+        Returns:
+            dict: {分区名称: DataFrame}，没有状态或状态不兼容时返回 None
+        """
+        if not self.store.exists() or not os.path.exists(self.meta_path):
+            return None
+
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取增量比对状态失败: {e}")
+            return None
+
+        expected = {
+            'version': STATE_VERSION,
+            'engine_version': engine.ENGINE_VERSION,
+            'reference_date': str(engine.reference_date),
+            'duplicate_policy': engine.duplicate_policy,
+            'fields': list(fields)
+        }
+        if any(meta.get(key) != value for key, value in expected.items()):
+            logger.info("上次比对状态与本次比对设置不一致，执行完整比对")
+            return None
+
+        return self.store.load_many(self.SECTIONS)
+
+    def save(self, engine, fields, local_fingerprints, national_fingerprints, field_diffs):
+        """
+        保存本次比对的状态（替换上次状态）
+
+        Args:
+            engine: 本次比对引擎
+            fields: 本次参与比对的字段
+            local_fingerprints: 单机库指纹
+            national_fingerprints: 全国库指纹
+            field_diffs: 长表差异，附带“单机行序”“全国行序”列
+        """
+        self.store = ResultStore.save({
+            'local_fingerprints': local_fingerprints,
+            'national_fingerprints': national_fingerprints,
+            'field_diffs': field_diffs
+        }, self.state_dir)
+
+        meta = {
+            'version': STATE_VERSION,
+            'engine_version': engine.ENGINE_VERSION,
+            'reference_date': str(engine.reference_date),
+            'duplicate_policy': engine.duplicate_policy,
+            'fields': list(fields),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'local_rows': len(engine.df_local),
+            'national_rows': len(engine.df_national)
+        }
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def _row_positions(ids, occurrence, keys, key_occurrence):
+    """
+    将（身份证号, 第几行）映射为本次数据中的行位置
+
+    Returns:
+        np.ndarray: 行位置
+    """
+    lookup = pd.DataFrame({'身份证号': ids, '序': occurrence, '行': np.arange(len(ids))})
+    wanted = pd.DataFrame({'身份证号': keys, '序': key_occurrence})
+    positions = wanted.merge(lookup, on=['身份证号', '序'], how='left')['行']
+    if positions.isna().any():
+        raise ValueError('增量比对状态与本次数据不一致')
+    return positions.to_numpy(dtype=np.int64)
+
+
+def _patch_field_diffs(engine, fields, previous, changes, local_occurrence, national_occurrence):
+    """
+    只重新比对发生变化的身份证号，其余差异沿用上次结果
+
+    Returns:
+        tuple: (长表差异 DataFrame, 差异行位置数组 (n, 2))
+    """
+    local_id = engine.ROSTER_SPECS['local'][0]
+    national_id = engine.ROSTER_SPECS['national'][0]
+    changed_ids = pd.Index(changes['身份证号'].unique())
+
+    # 变化人员重新比对
+    local_mask = isin(engine.df_local[local_id], changed_ids).to_numpy()
+    national_mask = isin(engine.df_national[national_id], changed_ids).to_numpy()
+    sub_engine = ComparisonEngine(
+        engine.df_local[local_mask].reset_index(drop=True),
+        engine.df_national[national_mask].reset_index(drop=True),
+        engine.reference_date,
+        engine.duplicate_policy
+    )
+    fresh, _ = sub_engine.build_field_diff_table()
+    fresh_rows = np.column_stack([
+        np.flatnonzero(local_mask)[sub_engine.field_diff_rows[:, 0]],
+        np.flatnonzero(national_mask)[sub_engine.field_diff_rows[:, 1]]
+    ]) if len(fresh) else np.empty((0, 2), dtype=np.int64)
+
+    # 未变化人员沿用上次差异
+    reused = previous[~isin(previous['身份证号'], changed_ids)].reset_index(drop=True)
+    reused_rows = np.column_stack([
+        _row_positions(engine.df_local[local_id], local_occurrence,
+                       reused['身份证号'], reused['单机行序']),
+        _row_positions(engine.df_national[national_id], national_occurrence,
+                       reused['身份证号'], reused['全国行序'])
+    ]) if len(reused) else np.empty((0, 2), dtype=np.int64)
+
+    logger.info(
+        f"增量比对: {len(changed_ids)} 个身份证号发生变化，"
+        f"重新比对得到 {len(fresh)} 条差异，沿用 {len(reused)} 条差异"
+    )
+
+    # 按完整比对的顺序排列：字段顺序，再按单机库行、全国库行
+    columns = engine.DIFF_TABLE_COLUMNS
+    combined = pd.concat(
+        [reused[columns], fresh[columns]], ignore_index=True
+    ) if len(reused) and len(fresh) else (reused[columns] if len(reused) else fresh)
+    rows = np.concatenate([reused_rows, fresh_rows])
+
+    field_codes = pd.Categorical(combined['字段'], categories=engine.COMPARE_FIELDS).codes
+    order = np.lexsort((rows[:, 1], rows[:, 0], field_codes))
+    diff_table = combined.iloc[order].reset_index(drop=True)
+    diff_table['字段'] = pd.Categorical(diff_table['字段'], categories=engine.COMPARE_FIELDS)
+    return diff_table, rows[order]
+
+
+def compare_incremental(df_local, df_national, state_dir, reference_date=None, progress=None,
+                        duplicate_policy=None):
+    """
+    增量比对：有可用的上次状态时只重新比对变化的人员，并更新状态
+
+    Args:
+        df_local: 单机库 DataFrame
+        df_national: 全国库 DataFrame
+        state_dir: 该组织的状态目录
+        reference_date: 党龄/年龄计算基准日期
+        progress: 可选的阶段回调，与 ComparisonEngine.generate_report 相同
+        duplicate_policy: 身份证号重复时的处理方式（见 ComparisonEngine）
+
+    Returns:
+        dict: 与 ComparisonEngine.generate_report 相同的结果；有上次状态时
+              另含 changes 分区（库、身份证号、姓名、变化）
+    """
+    try:
+        engine = ComparisonEngine(df_local, df_national, reference_date, duplicate_policy)
+        rows = len(df_local) + len(df_national)
+
+        if progress:
+            progress('preprocess')
+        with metrics.track_phase('preprocess', rows=rows):
+            engine.preprocess()
+
+        if progress:
+            progress('find_differences')
+        with metrics.track_phase('find_differences', rows=rows):
+            engine.find_differences()
+
+        if progress:
+            progress('find_field_differences')
+        with metrics.track_phase('find_field_differences', rows=rows):
+            fields = engine.compared_fields()
+            local_fingerprints, local_occurrence = fingerprint_frame(engine.df_local, 'local', fields)
+            national_fingerprints, national_occurrence = fingerprint_frame(
+                engine.df_national, 'national', fields
+            )
+
+            state = IncrementalState(state_dir)
+            previous = state.load(engine, fields)
+
+            if previous is None:
+                logger.info("没有可用的上次比对状态，执行完整比对")
+                engine.find_field_differences()
+                diff_table = engine.results['field_diff_table']
+                diff_rows = engine.field_diff_rows
+                changes = None
+            else:
+                changes = pd.concat([
+                    detect_changes(previous[f'{side}_fingerprints'], fingerprints).assign(
+                        库=SIDE_LABELS[side]
+                    )
+                    for side, fingerprints in (
+                        ('local', local_fingerprints), ('national', national_fingerprints)
+                    )
+                ], ignore_index=True)[CHANGE_COLUMNS]
+                diff_table, diff_rows = _patch_field_diffs(
+                    engine, fields, previous['field_diffs'], changes,
+                    local_occurrence, national_occurrence
+                )
+                engine.split_field_diffs(diff_table, fields)
+
+        state.save(
+            engine, fields, local_fingerprints, national_fingerprints,
+            diff_table.assign(
+                单机行序=local_occurrence[diff_rows[:, 0]],
+                全国行序=national_occurrence[diff_rows[:, 1]]
+            )
+        )
+
+        results = engine.results
+        results['local_preprocessed'] = engine.df_local
+        results['national_preprocessed'] = engine.df_national
+        if changes is not None:
+            results[CHANGES_SECTION] = changes
+            logger.info(
+                "自上次比对以来的变化: " + ', '.join(
+                    f"{label}{change} {count} 人"
+                    for (label, change), count in changes.groupby(['库', '变化'], sort=False).size().items()
+                ) if len(changes) else "自上次比对以来没有变化"
+            )
+        return results
+
+    except Exception as e:
+        logger.error(f"增量比对失败: {e}")
+        raise
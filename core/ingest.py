@@ -0,0 +1,128 @@
+"""
+多工作表读取模块 - 全国库多工作表导出的发现、校验和并行解析
+
+全国库导出文件常常每个党支部一张工作表。表头与全国库模板一致的工作表
+都参与比对：各工作表在独立进程中解析，合并后增加来源工作表列。
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import pandas as pd
+
+from core import excel_reader
+from core.dtypes import compact_frame
+
+logger = logging.getLogger(__name__)
+
+# 多工作表合并后记录来源工作表的列
+SOURCE_SHEET_COLUMN = '来源工作表'
+
+# 判断未识别的工作表是否为表头有误的名册（而不是封面、说明等）的列
+ROSTER_ID_COLUMN = '身份证号码'
+
+
+def plan_sheets(matches, validate, key='national'):
+    """
+    根据工作表识别结果确定需要读取的工作表，并校验其余工作表
+
+    没有识别出任何工作表时按原方式校验第一张；否则其余未识别的工作表
+    中包含身份证号码列的视为表头有误的名册，校验失败并报告工作表名称，
+    其他工作表（封面、说明等）跳过。
+
+    Args:
+        matches: TemplateRegistry.classify 的结果
+        validate: 按工作表索引校验表头的函数，返回 TemplateValidator 的校验结果
+        key: 需要读取的模板类型
+
+    Returns:
+        tuple: (工作表列表 [(索引, 名称), ...], 校验结果)
+               校验失败时工作表列表为空，校验结果中 sheet_name 为出错的工作表
+    """
+    selected = [
+        (match['sheet'], match['name']) for match in matches
+        if match['type'] == key and match['header_row'] == 0
+    ]
+
+    if not selected:
+        result = validate(0)
+        name = matches[0]['name'] if matches else None
+        return ([(0, name)] if result.get('valid') else []), result
+
+    for match in matches:
+        if match['type'] is not None:
+            if match['type'] != key:
+                logger.info(f"跳过工作表 {match['name']}（{match['label']}）")
+            continue
+
+        result = validate(match['sheet'])
+        if result.get('valid'):
+            # 注册表未识别但校验通过（两者对单元格的规范化略有不同）
+            selected.append((match['sheet'], match['name']))
+        elif 'error' not in result and ROSTER_ID_COLUMN not in result.get('missing_columns', []):
+            result['sheet_name'] = match['name']
+            return [], result
+        else:
+            logger.info(f"跳过工作表 {match['name']}（非名册）")
+
+    selected.sort()
+    return selected, {'valid': True}
+
+
+def read_sheet(filepath, sheet_name=0, engine=None):
+    """
+    解析一张工作表
+
+    使用 xlrd 时 .xls 文件以 on_demand 方式打开，只加载目标工作表，各进程
+    解析不同工作表时不会重复解析整个工作簿。
+
+    Args:
+        filepath: Excel 文件路径
+        sheet_name: 工作表名称或索引
+        engine: 解析引擎（默认按 core.excel_reader 的配置选择）
+
+    Returns:
+        DataFrame: 工作表数据
+    """
+    return excel_reader.read_excel(filepath, sheet_name=sheet_name, engine=engine)
+
+
+def read_sheets(filepath, sheets, compact=False, max_workers=None):
+    """
+    解析多个工作表并合并
+
+    多张工作表时在进程池中并行解析（进程数不超过 max_workers 和工作表数），
+    合并后增加 SOURCE_SHEET_COLUMN 列；只有一张工作表时直接解析，不增加该列。
+
+    Args:
+        filepath: Excel 文件路径
+        sheets: plan_sheets 返回的工作表列表 [(索引, 名称), ...]
+        compact: 合并后是否转换为紧凑类型（见 core.dtypes.compact_frame）
+        max_workers: 最大进程数（默认 CPU 核数；1 为在当前进程中依次解析）
+
+    Returns:
+        DataFrame: 合并后的数据
+    """
+    indexes = [index for index, _ in sheets]
+
+    if len(sheets) == 1:
+        df = read_sheet(filepath, indexes[0])
+    else:
+        workers = min(len(sheets), max_workers or os.cpu_count() or 1)
+        if workers > 1:
+            # 引擎在当前进程中选定，子进程不依赖 init_reader 的配置
+            engine = excel_reader.select_engine(filepath)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                frames = list(executor.map(read_sheet, repeat(filepath), indexes, repeat(engine)))
+        else:
+            frames = [read_sheet(filepath, index) for index in indexes]
+
+        for frame, (_, name) in zip(frames, sheets):
+            frame[SOURCE_SHEET_COLUMN] = name
+        df = pd.concat(frames, ignore_index=True)
+        logger.info(f"已合并 {len(sheets)} 张工作表（{workers} 个进程），共 {len(df)} 行")
+
+    if compact:
+        df = compact_frame(df)
+    return df
@@ -0,0 +1,250 @@
+"""
+后台任务模块 - 比对任务的提交、状态查询和取消
+
+任务在有界线程池中执行，状态写入会话目录下的 JSON 文件，
+因此同一会话的轮询请求可以由任意 gunicorn worker 处理。
+"""
+import os
+import json
+import uuid
+import threading
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+# 结束状态
+FINAL_STATUSES = {STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED}
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+def is_valid_job_id(job_id):
+    """
+    检查任务 ID 是否为合法的 UUID（防止路径遍历）
+
+    Args:
+        job_id: 任务 ID
+
+    Returns:
+        bool: 是否合法
+    """
+    try:
+        return str(uuid.UUID(job_id)) == job_id
+    except (ValueError, TypeError):
+        return False
+
+
+def _status_path(job_dir, job_id):
+    return os.path.join(job_dir, f'{job_id}.json')
+
+
+def _cancel_path(job_dir, job_id):
+    return os.path.join(job_dir, f'{job_id}.cancel')
+
+
+def read_status(job_dir, job_id):
+    """
+    读取任务状态
+
+    Args:
+        job_dir: 任务状态目录
+        job_id: 任务 ID
+
+    Returns:
+        dict: 任务状态，任务不存在时返回 None
+    """
+    path = _status_path(job_dir, job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_status(job_dir, job_id, **fields):
+    """
+    更新任务状态（原子写入）
+
+    Args:
+        job_dir: 任务状态目录
+        job_id: 任务 ID
+        **fields: 需要更新的字段（status、phase、error 等）
+
+    Returns:
+        dict: 更新后的任务状态
+    """
+    status = read_status(job_dir, job_id) or {
+        'job_id': job_id,
+        'status': STATUS_QUEUED,
+        'phase': None,
+        'error': None,
+        'created_at': datetime.now().isoformat(timespec='seconds')
+    }
+    status.update(fields)
+    status['updated_at'] = datetime.now().isoformat(timespec='seconds')
+
+    path = _status_path(job_dir, job_id)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return status
+
+
+def is_cancel_requested(job_dir, job_id):
+    """
+    检查任务是否已被请求取消
+
+    Args:
+        job_dir: 任务状态目录
+        job_id: 任务 ID
+
+    Returns:
+        bool: 是否已请求取消
+    """
+    return os.path.exists(_cancel_path(job_dir, job_id))
+
+
+class JobManager:
+    """后台任务管理器"""
+
+    def __init__(self, max_workers=2):
+        """
+        初始化任务管理器
+
+        Args:
+            max_workers: 同时执行的最大任务数
+        """
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='compare-job'
+        )
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, job_dir, func, *args, on_finish=None, job_id=None):
+        """
+        提交任务
+
+        Args:
+            job_dir: 任务状态目录
+            func: 任务函数，签名为 func(progress, *args)，
+                  progress(phase) 用于上报当前阶段并检查取消请求
+            *args: 传给任务函数的参数
+            on_finish: 任务结束（含未开始即被取消）后调用的回调（可选）
+            job_id: 任务 ID（可选，默认生成；任务函数的输出文件需要以任务 ID 命名时预先生成）
+
+        Returns:
+            str: 任务 ID
+        """
+        os.makedirs(job_dir, exist_ok=True)
+        job_id = job_id or str(uuid.uuid4())
+        write_status(job_dir, job_id, status=STATUS_QUEUED)
+
+        future = self.executor.submit(self._run, job_dir, job_id, func, args)
+        with self.lock:
+            self.futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id, on_finish))
+
+        logger.info(f"已提交任务: {job_id}")
+        return job_id
+
+    def _forget(self, job_id, on_finish=None):
+        with self.lock:
+            self.futures.pop(job_id, None)
+        if on_finish is not None:
+            try:
+                on_finish()
+            except Exception as e:
+                logger.error(f"任务结束回调失败 {job_id}: {e}")
+
+    def _run(self, job_dir, job_id, func, args):
+        """在线程池中执行任务并维护状态"""
+        if is_cancel_requested(job_dir, job_id):
+            write_status(job_dir, job_id, status=STATUS_CANCELLED)
+            return
+
+        write_status(job_dir, job_id, status=STATUS_RUNNING)
+
+        def progress(phase):
+            if is_cancel_requested(job_dir, job_id):
+                raise JobCancelled('任务已被取消')
+            write_status(job_dir, job_id, phase=phase)
+
+        try:
+            func(progress, *args)
+            write_status(job_dir, job_id, status=STATUS_DONE, phase=None)
+            logger.info(f"任务完成: {job_id}")
+        except JobCancelled:
+            write_status(job_dir, job_id, status=STATUS_CANCELLED)
+            logger.info(f"任务已取消: {job_id}")
+        except Exception as e:
+            write_status(job_dir, job_id, status=STATUS_FAILED, error=str(e))
+            logger.error(f"任务失败 {job_id}: {e}")
+
+    def cancel(self, job_dir, job_id):
+        """
+        请求取消任务
+
+        排队中的任务直接取消；运行中的任务在进入下一阶段时停止。
+
+        Args:
+            job_dir: 任务状态目录
+            job_id: 任务 ID
+
+        Returns:
+            dict: 取消后的任务状态，任务不存在时返回 None
+        """
+        status = read_status(job_dir, job_id)
+        if status is None or status['status'] in FINAL_STATUSES:
+            return status
+
+        # 写入取消标记，运行中的任务（可能在其他 worker 中）会检查该标记
+        with open(_cancel_path(job_dir, job_id), 'w'):
+            pass
+
+        with self.lock:
+            future = self.futures.get(job_id)
+        if future is not None and future.cancel():
+            return write_status(job_dir, job_id, status=STATUS_CANCELLED)
+
+        return read_status(job_dir, job_id)
+
+
+# 创建全局任务管理器实例（将在 app 启动时初始化）
+job_manager = None
+
+
+def init_job_manager(max_workers=2):
+    """
+    初始化全局任务管理器实例
+
+    Args:
+        max_workers: 同时执行的最大任务数
+    """
+    global job_manager
+    job_manager = JobManager(max_workers)
+    logger.info(f"后台任务管理器初始化完成，最大并发数: {max_workers}")
+
+
+def get_job_manager():
+    """
+    获取全局任务管理器实例
+
+    Returns:
+        JobManager: 任务管理器实例
+    """
+    if job_manager is None:
+        raise RuntimeError("后台任务管理器尚未初始化，请先调用 init_job_manager()")
+    return job_manager
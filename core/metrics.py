@@ -0,0 +1,267 @@
+"""
+监控指标模块 - 以 Prometheus 文本格式暴露请求和比对阶段指标
+
+指标：
+- roster_http_request_duration_seconds{route}: 路由耗时
+- roster_http_requests_total{route, status}: 请求数
+- roster_phase_duration_seconds{phase}: 处理阶段耗时
+- roster_phase_rows{phase}: 阶段处理的行数
+- roster_phase_bytes_read{phase}: 阶段读取的字节数
+- roster_phase_peak_rss_bytes{phase}: 阶段内进程常驻内存峰值
+- roster_admission_running / roster_admission_queued: 节点上正在执行/排队等待的
+  比对和导出任务数（采集时读取准入控制状态，见 core/admission.py）
+- roster_admission_reserved_bytes / roster_admission_memory_budget_bytes:
+  运行中任务的内存估算合计及节点内存预算
+- roster_admission_rejected_total{kind}: 因节点繁忙被拒绝的任务数
+
+gunicorn 多进程部署时需设置环境变量 PROMETHEUS_MULTIPROC_DIR
+（见 gunicorn_config.py），各 worker 的指标写入该目录并在 /metrics
+中汇总；未设置时只统计当前进程。
+"""
+import os
+import time
+import threading
+import functools
+import logging
+from contextlib import contextmanager
+
+from flask import current_app
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# 阶段内 RSS 采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.05
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+ROWS_BUCKETS = (100, 1000, 10000, 50000, 100000, 500000, 1000000, 5000000)
+BYTES_BUCKETS = tuple(2 ** n for n in range(16, 34, 2))  # 64KB ~ 8GB
+
+REQUEST_DURATION = Histogram(
+    'roster_http_request_duration_seconds',
+    '路由处理耗时（秒）',
+    ['route'],
+    buckets=DURATION_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'roster_http_requests_total',
+    '请求数',
+    ['route', 'status']
+)
+PHASE_DURATION = Histogram(
+    'roster_phase_duration_seconds',
+    '处理阶段耗时（秒）',
+    ['phase'],
+    buckets=DURATION_BUCKETS
+)
+PHASE_ROWS = Histogram(
+    'roster_phase_rows',
+    '处理阶段处理的行数',
+    ['phase'],
+    buckets=ROWS_BUCKETS
+)
+PHASE_BYTES_READ = Histogram(
+    'roster_phase_bytes_read',
+    '处理阶段读取的字节数',
+    ['phase'],
+    buckets=BYTES_BUCKETS
+)
+PHASE_PEAK_RSS = Histogram(
+    'roster_phase_peak_rss_bytes',
+    '处理阶段内进程常驻内存峰值（字节）',
+    ['phase'],
+    buckets=BYTES_BUCKETS
+)
+
+ADMISSION_REJECTED = Counter(
+    'roster_admission_rejected_total',
+    '因节点繁忙被拒绝的任务数',
+    ['kind']
+)
+
+# 准入状态采集器（由 register_admission 设置）
+_admission_collector = None
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def current_rss():
+    """
+    读取当前进程常驻内存
+
+    Returns:
+        int: 字节数，平台不支持（非 Linux）时返回 None
+    """
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _PeakRSSSampler:
+    """在后台线程中按固定间隔采样 RSS，记录峰值"""
+
+    def __init__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.peak is None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss()
+        return max(self.peak, rss) if rss is not None else self.peak
+
+
+@contextmanager
+def track_phase(phase, rows=None, bytes_read=None):
+    """
+    记录处理阶段的耗时、行数、读取字节数和内存峰值
+
+    行数和字节数可以在进入时给出，也可以在阶段内写入 yield 的字典：
+
+        with metrics.track_phase('read') as record:
+            ...
+            record['rows'] = len(df)
+
+    Args:
+        phase: 阶段名称
+        rows: 处理的行数（可选）
+        bytes_read: 读取的字节数（可选）
+    """
+    record = {'rows': rows, 'bytes_read': bytes_read}
+    sampler = _PeakRSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        PHASE_DURATION.labels(phase).observe(time.perf_counter() - start)
+        peak = sampler.stop()
+        if peak is not None:
+            PHASE_PEAK_RSS.labels(phase).observe(peak)
+        if record['rows'] is not None:
+            PHASE_ROWS.labels(phase).observe(record['rows'])
+        if record['bytes_read'] is not None:
+            PHASE_BYTES_READ.labels(phase).observe(record['bytes_read'])
+
+
+def track_request(route):
+    """
+    路由装饰器：记录处理耗时和响应状态码
+
+    Args:
+        route: 路由名称（指标标签）
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+                status = response.status_code
+                return response
+            finally:
+                REQUEST_DURATION.labels(route).observe(time.perf_counter() - start)
+                REQUEST_COUNT.labels(route, str(status)).inc()
+        return wrapper
+    return decorator
+
+
+def file_size(*paths):
+    """
+    计算文件总大小，忽略不存在的文件
+
+    Returns:
+        int: 字节数
+    """
+    total = 0
+    for path in paths:
+        if path and os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+class AdmissionCollector:
+    """采集时读取节点准入状态（槽位保存在节点本地文件中，所有 worker 看到的值相同）"""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def collect(self):
+        try:
+            stats = self.controller.stats()
+        except OSError as e:
+            logger.warning(f"读取准入状态失败: {e}")
+            return
+        yield GaugeMetricFamily(
+            'roster_admission_running', '节点上正在执行的比对/导出任务数', value=stats['running']
+        )
+        yield GaugeMetricFamily(
+            'roster_admission_queued', '节点上排队等待的比对任务数', value=stats['queued']
+        )
+        yield GaugeMetricFamily(
+            'roster_admission_reserved_bytes', '运行中任务的内存估算合计（字节）',
+            value=stats['reserved_bytes']
+        )
+        if stats['memory_budget']:
+            yield GaugeMetricFamily(
+                'roster_admission_memory_budget_bytes', '节点内存预算（字节）',
+                value=stats['memory_budget']
+            )
+
+
+def register_admission(controller):
+    """
+    在 /metrics 中暴露准入状态
+
+    Args:
+        controller: AdmissionController 实例
+    """
+    global _admission_collector
+    if _admission_collector is not None:
+        REGISTRY.unregister(_admission_collector)
+    _admission_collector = AdmissionCollector(controller)
+    REGISTRY.register(_admission_collector)
+
+
+def render_metrics():
+    """
+    生成 Prometheus 文本格式的指标
+
+    Returns:
+        tuple: (内容, Content-Type)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        if _admission_collector is not None:
+            registry.register(_admission_collector)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,179 @@
+"""
+性能剖析模块 - 按需对比对和下载流程进行 cProfile / tracemalloc 剖析
+
+两种开启方式（默认均关闭）：
+- PROFILE_REQUESTS = True：剖析所有 /compare 和 /download 请求
+- PROFILE_TOKEN 非空：请求头 X-Profile-Token 与之相同的请求被剖析
+
+剖析结果写入会话目录下的 profiles/，包括可用 pstats / snakeviz 查看的
+.prof 文件和包含热点函数、内存分配位置的 .txt 报告，同时输出到日志。
+未开启时直接返回空上下文，不引入额外开销。
+"""
+import os
+import io
+import uuid
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import logging
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from flask import current_app, request
+
+logger = logging.getLogger(__name__)
+
+# 剖析结果子目录（位于会话目录下）
+PROFILES_DIRNAME = 'profiles'
+
+# 请求头名称
+PROFILE_HEADER = 'X-Profile-Token'
+
+# 日志中输出的条目数
+LOG_TOP_N = 10
+
+# 报告文件中输出的条目数
+REPORT_TOP_N = 30
+
+# tracemalloc 保存的调用栈深度
+TRACEMALLOC_FRAMES = 5
+
+# tracemalloc 是全局的，多个剖析同时进行时按引用计数启停
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def is_requested():
+    """
+    判断当前请求是否需要剖析
+
+    Returns:
+        bool: 是否剖析
+    """
+    config = current_app.config
+    if config.get('PROFILE_REQUESTS'):
+        return True
+    token = config.get('PROFILE_TOKEN')
+    return bool(token) and request.headers.get(PROFILE_HEADER) == token
+
+
+def request_profiler(session_dir, name):
+    """
+    获取当前请求的剖析上下文
+
+    Args:
+        session_dir: 会话目录
+        name: 剖析名称（如 'download'）
+
+    Returns:
+        上下文管理器：需要剖析时为 profile()，否则为空上下文
+    """
+    if not is_requested():
+        return nullcontext()
+    return profile(session_dir, name)
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # 只停止由本模块启动的跟踪（例如不影响 PYTHONTRACEMALLOC）
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+@contextmanager
+def profile(session_dir, name):
+    """
+    剖析 with 块内当前线程的执行
+
+    Args:
+        session_dir: 会话目录（结果写入其 profiles/ 子目录）
+        name: 剖析名称，用于文件名和日志
+    """
+    profiler = cProfile.Profile()
+    _start_tracemalloc()
+    tracemalloc.reset_peak()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        _stop_tracemalloc()
+        try:
+            _write_profile(profiler, snapshot, peak, session_dir, name)
+        except Exception as e:
+            logger.error(f"保存剖析结果失败 {name}: {e}")
+
+
+def _format_stats(profiler, sort_key, limit):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats(sort_key).print_stats(limit)
+    return stream.getvalue()
+
+
+def _allocation_lines(snapshot, limit):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    lines = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(
+            f'{stat.size / 1024 / 1024:8.2f}MB {stat.count:8d} 次  '
+            f'{frame.filename}:{frame.lineno}'
+        )
+    return lines
+
+
+def _write_profile(profiler, snapshot, peak, session_dir, name):
+    """写出 .prof 和 .txt 报告，并在日志中输出热点"""
+    profiles_dir = os.path.join(session_dir, PROFILES_DIRNAME)
+    os.makedirs(profiles_dir, exist_ok=True)
+    base = os.path.join(
+        profiles_dir,
+        f"{name}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    )
+
+    profiler.dump_stats(f'{base}.prof')
+
+    allocations = _allocation_lines(snapshot, REPORT_TOP_N)
+    with open(f'{base}.txt', 'w', encoding='utf-8') as f:
+        f.write(f'# {name} 剖析报告\n\n')
+        f.write(f'tracemalloc 峰值: {peak / 1024 / 1024:.2f}MB\n\n')
+        f.write('## 热点函数（按自身耗时）\n\n')
+        f.write(_format_stats(profiler, 'tottime', REPORT_TOP_N))
+        f.write('\n## 热点函数（按累计耗时）\n\n')
+        f.write(_format_stats(profiler, 'cumulative', REPORT_TOP_N))
+        f.write('\n## 内存分配位置（剖析结束时仍存活）\n\n')
+        f.write('\n'.join(allocations) + '\n')
+
+    stats = pstats.Stats(profiler)
+    hot = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:LOG_TOP_N]
+    hot_lines = [
+        f'{tottime:8.3f}s {calls:8d} 次  {os.path.basename(filename)}:{lineno}({func})'
+        for (filename, lineno, func), (_, calls, tottime, _, _) in hot
+    ]
+
+    logger.info(
+        f"剖析结果已保存: {base}.prof\n"
+        f"热点函数（按自身耗时）:\n" + '\n'.join(hot_lines) + '\n'
+        f"内存分配位置（峰值 {peak / 1024 / 1024:.2f}MB）:\n" +
+        '\n'.join(allocations[:LOG_TOP_N])
+    )
@@ -0,0 +1,413 @@
+"""
+多名册核对模块 - 基于共享身份证号索引的跨名册一致性检查
+
+支持 core/templates 中的各类名册：党员花名册（或全国库/单机库花名册）、
+入党申请人名册、发展党员名册、转入党员名册、转出党员名册、死亡党员名册。
+上传的一组名册按文件名、标题行或表头识别类型，检查：
+
+- 转出仍在册：转出党员仍在党员花名册中
+- 死亡仍在册：死亡党员仍在党员花名册中
+- 转入未在册：转入党员不在党员花名册中
+- 申请人已是党员：入党申请人已在党员花名册中
+- 发展党员未在册：新发展的党员不在党员花名册中
+
+所有名册的身份证号只哈希一次（pd.factorize）得到共享索引，每个名册对应
+一组整数编码，各项检查都是索引上的布尔数组运算，不做两两合并，核对全部
+名册的开销为一次遍历。身份证号的标准化和校验与 ComparisonEngine 相同，
+无效身份证号不参与核对，单独列出。
+"""
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from core import excel_reader, exporter, id_validation
+from core.comparison import ComparisonEngine
+
+logger = logging.getLogger(__name__)
+
+# 党员花名册（各项检查的对照名册）
+MEMBERS = 'members'
+
+# 名册类型：名称、文件名或标题中的别名、可识别类型的表头列（前缀匹配）
+ROSTER_TYPES = {
+    MEMBERS: {
+        'label': '党员花名册',
+        'aliases': ('党员花名册',),
+        'markers': ('所在党支部', '所在支部'),
+    },
+    'applicants': {
+        'label': '入党申请人名册',
+        'aliases': ('入党申请人名册',),
+        'markers': ('递交入党申请',),
+    },
+    'developing': {
+        'label': '发展党员名册',
+        'aliases': ('发展党员名册',),
+        'markers': (),
+    },
+    'transferred_in': {
+        'label': '转入党员名册',
+        'aliases': ('转入党员名册',),
+        'markers': ('转入日期',),
+    },
+    'transferred_out': {
+        'label': '转出党员名册',
+        'aliases': ('转出党员名册',),
+        'markers': ('转出日期',),
+    },
+    'deceased': {
+        'label': '死亡党员名册',
+        'aliases': ('死亡党员名册', '死亡党员名单'),
+        'markers': ('死亡日期',),
+    },
+}
+
+# 核对项：(结果键, 工作表名, 来源名册, 是否列出在党员花名册中的人员)
+CHECKS = [
+    ('transferred_out_active', '转出仍在册', 'transferred_out', True),
+    ('deceased_active', '死亡仍在册', 'deceased', True),
+    ('transferred_in_missing', '转入未在册', 'transferred_in', False),
+    ('applicants_members', '申请人已是党员', 'applicants', True),
+    ('developing_missing', '发展党员未在册', 'developing', False),
+]
+
+# 身份证号列名（按优先顺序）
+ID_COLUMNS = ('身份证号码', '身份证号')
+
+# 查找表头行的最大行数（表头前可能有标题行）
+HEADER_SEARCH_ROWS = 10
+
+# 核对结果中附加的党员花名册信息
+MEMBER_NAME_COLUMN = '党员花名册姓名'
+MEMBER_BRANCH_COLUMN = '党员花名册所在支部'
+
+# 汇总和无效身份证号表的列
+SUMMARY_COLUMNS = ['检查项', '来源名册', '人数', '状态']
+ROSTER_COLUMNS = ['名册', '文件', '行数', '有效身份证号', '无效身份证号']
+INVALID_COLUMNS = ['名册', '行号', '姓名', '身份证号', '问题']
+
+
+def _id_column(columns):
+    """返回表头中的身份证号列名，不存在时返回 None"""
+    for name in ID_COLUMNS:
+        if name in columns:
+            return name
+    return None
+
+
+def read_roster_file(path, sheet_name=0):
+    """
+    读取名册文件，自动跳过表头前的标题行
+
+    Args:
+        path: Excel 文件路径
+        sheet_name: 工作表（默认第一个）
+
+    Returns:
+        tuple: (DataFrame, 标题文本, Excel 行号数组)
+            DataFrame 只保留有身份证号或姓名的行，列名去除首尾空格；
+            标题文本为表头前各单元格的内容；行号与 DataFrame 的行一一对应
+
+    Raises:
+        ValueError: 前 HEADER_SEARCH_ROWS 行中没有身份证号列
+    """
+    raw = excel_reader.read_excel(path, sheet_name=sheet_name, header=None, dtype=object)
+
+    for header_row in range(min(HEADER_SEARCH_ROWS, len(raw))):
+        columns = [str(value).strip() if pd.notna(value) else '' for value in raw.iloc[header_row]]
+        if _id_column(columns):
+            break
+    else:
+        raise ValueError(f'{os.path.basename(path)}: 未找到身份证号列')
+
+    title = ' '.join(
+        str(value) for value in raw.iloc[:header_row].to_numpy().ravel() if pd.notna(value)
+    )
+
+    df = raw.iloc[header_row + 1:].copy()
+    df.columns = columns
+    df = df.loc[:, [bool(name) for name in columns]]
+
+    # 模板中预留的空行（只有序号）不计入名册
+    keep = df[_id_column(columns)].notna()
+    if '姓名' in df.columns:
+        keep |= df['姓名'].notna()
+    df = df[keep]
+    excel_rows = df.index.to_numpy() + 1
+    return df.reset_index(drop=True), title, excel_rows
+
+
+def detect_roster_type(path, df, title='', registry=None):
+    """
+    识别名册类型：表头与模板完全一致时按模板签名识别，否则依次按文件名、
+    标题、表头列判断
+
+    Args:
+        path: 文件路径或文件名
+        df: read_roster_file 返回的 DataFrame
+        title: 标题文本
+        registry: 模板注册表（可选，见 core.template_registry）
+
+    Returns:
+        str: ROSTER_TYPES 中的类型，无法识别时返回 None
+    """
+    if registry is not None:
+        key = registry.match_columns(list(df.columns))
+        if key in ROSTER_TYPES:
+            return key
+
+    filename = os.path.basename(path)
+    for text in (filename, title):
+        for key, spec in ROSTER_TYPES.items():
+            if any(alias in text for alias in spec['aliases']):
+                return key
+
+    for key, spec in ROSTER_TYPES.items():
+        if any(col.startswith(marker) for marker in spec['markers'] for col in df.columns):
+            return key
+    return None
+
+
+def load_rosters(paths, names=None, registry=None):
+    """
+    读取并识别一组名册文件
+
+    Args:
+        paths: 文件路径列表
+        names: 可选的原始文件名列表（上传文件保存时文件名会被清理，
+            识别名册类型和报告中使用原始文件名）
+        registry: 模板注册表（可选）
+
+    Returns:
+        dict: {名册类型: (文件名, DataFrame, Excel 行号数组)}
+
+    Raises:
+        ValueError: 名册类型无法识别、重复，或缺少党员花名册
+    """
+    if names is None:
+        names = [os.path.basename(path) for path in paths]
+
+    rosters = {}
+    for path, name in zip(paths, names):
+        df, title, excel_rows = read_roster_file(path)
+        key = detect_roster_type(name, df, title, registry)
+        if key is None:
+            raise ValueError(f'{name}: 无法识别名册类型')
+        if key in rosters:
+            raise ValueError(
+                f'{ROSTER_TYPES[key]["label"]}重复: {rosters[key][0]}、{name}'
+            )
+        rosters[key] = (name, df, excel_rows)
+        logger.info(f"{name}: {ROSTER_TYPES[key]['label']}，{len(df)} 行")
+
+    if MEMBERS not in rosters:
+        raise ValueError('缺少党员花名册')
+    return rosters
+
+
+class IdIndex:
+    """所有名册共用的身份证号索引"""
+
+    def __init__(self, ids):
+        """
+        对所有名册的身份证号做一次哈希，建立共享索引
+
+        Args:
+            ids: {名册类型: 身份证号 Series（无效身份证号为缺失值）}
+        """
+        keys = list(ids)
+        combined = pd.concat([ids[key] for key in keys], ignore_index=True)
+        codes, uniques = pd.factorize(combined)
+        self.size = len(uniques)
+
+        bounds = np.cumsum([0] + [len(ids[key]) for key in keys])
+        self.codes = {key: codes[bounds[i]:bounds[i + 1]] for i, key in enumerate(keys)}
+        self._present = {}
+        self._first_row = {}
+
+    def present(self, key):
+        """
+        名册中出现过的身份证号
+
+        Returns:
+            np.ndarray: 按索引编号的布尔数组
+        """
+        if key not in self._present:
+            codes = self.codes[key]
+            present = np.zeros(self.size, dtype=bool)
+            present[codes[codes >= 0]] = True
+            self._present[key] = present
+        return self._present[key]
+
+    def first_row(self, key):
+        """
+        每个身份证号在名册中第一次出现的行号
+
+        Returns:
+            np.ndarray: 按索引编号的行号数组，未出现为 -1
+        """
+        if key not in self._first_row:
+            codes = self.codes[key]
+            rows = np.full(self.size, -1, dtype=np.int64)
+            positions = np.flatnonzero(codes >= 0)[::-1]
+            # 倒序赋值，重复的身份证号保留第一次出现的行
+            rows[codes[positions]] = positions
+            self._first_row[key] = rows
+        return self._first_row[key]
+
+    def contains(self, key, other):
+        """
+        名册 key 的每一行的身份证号是否出现在名册 other 中
+
+        Returns:
+            np.ndarray: 按 key 行号的布尔数组（无效身份证号为 False）
+        """
+        codes = self.codes[key]
+        return (codes >= 0) & self.present(other)[codes]
+
+
+class RosterReconciler:
+    """多名册核对"""
+
+    def __init__(self, rosters, reference_date=None):
+        """
+        初始化多名册核对
+
+        Args:
+            rosters: load_rosters 返回的 {名册类型: (文件名, DataFrame, Excel 行号数组)}
+            reference_date: 出生日期校验的基准日期（默认同 ComparisonEngine）
+        """
+        self.rosters = rosters
+        self.reference_date = reference_date or ComparisonEngine.REFERENCE_DATE
+        self.reference_ymd = int(pd.Timestamp(self.reference_date).strftime('%Y%m%d'))
+        self.problems = {}
+        self.index = None
+
+    def build_index(self):
+        """标准化、校验各名册的身份证号，并建立共享索引"""
+        ids = {}
+        for key, (_, df, _) in self.rosters.items():
+            id_col = _id_column(df.columns)
+            normalized = df[id_col].astype(str).str.upper().str.strip().mask(df[id_col].isna())
+            normalized, problems = id_validation.validate_ids(normalized, self.reference_ymd)
+            df[id_col] = normalized
+            self.problems[key] = problems
+            ids[key] = normalized.where(problems.isna())
+
+        self.index = IdIndex(ids)
+        logger.info(f"共享身份证号索引: {len(self.rosters)} 个名册，{self.index.size} 个身份证号")
+
+    def _check_frame(self, source, in_members):
+        """生成一项核对的结果表：来源名册中满足条件的行，附带党员花名册中的信息"""
+        _, df, _ = self.rosters[source]
+        contained = self.index.contains(source, MEMBERS)
+        mask = contained if in_members else ~contained & (self.index.codes[source] >= 0)
+        result = df[mask].reset_index(drop=True)
+
+        if in_members and len(result):
+            _, members, _ = self.rosters[MEMBERS]
+            rows = self.index.first_row(MEMBERS)[self.index.codes[source][mask]]
+            if '姓名' in members.columns:
+                result[MEMBER_NAME_COLUMN] = members['姓名'].to_numpy()[rows]
+            branch = next((col for col in ('所在党支部', '所在支部') if col in members.columns), None)
+            if branch:
+                result[MEMBER_BRANCH_COLUMN] = members[branch].to_numpy()[rows]
+        return result
+
+    def _invalid_frame(self):
+        """各名册中的无效身份证号明细"""
+        frames = []
+        for key, (_, df, excel_rows) in self.rosters.items():
+            problems = self.problems[key]
+            invalid = np.flatnonzero(pd.notna(problems))
+            if not len(invalid):
+                continue
+            frames.append(pd.DataFrame({
+                '名册': ROSTER_TYPES[key]['label'],
+                '行号': excel_rows[invalid],
+                '姓名': df['姓名'].to_numpy()[invalid] if '姓名' in df.columns else None,
+                '身份证号': df[_id_column(df.columns)].to_numpy()[invalid],
+                '问题': np.asarray(problems)[invalid],
+            }))
+        if not frames:
+            return pd.DataFrame(columns=INVALID_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def run(self):
+        """
+        执行全部核对
+
+        Returns:
+            dict: summary（核对汇总）、rosters（名册概况）、各核对项结果、
+                invalid_ids（无效身份证号）
+        """
+        try:
+            self.build_index()
+
+            results = {}
+            summary = []
+            for key, sheet_name, source, in_members in CHECKS:
+                label = ROSTER_TYPES[source]['label']
+                if source not in self.rosters:
+                    summary.append([sheet_name, label, None, f'未提供{label}'])
+                    continue
+                results[key] = self._check_frame(source, in_members)
+                summary.append([sheet_name, label, len(results[key]), '已核对'])
+                logger.info(f"{sheet_name}: {len(results[key])} 人")
+
+            rosters = []
+            for key, (name, df, _) in self.rosters.items():
+                invalid = int(pd.notna(self.problems[key]).sum())
+                rosters.append([
+                    ROSTER_TYPES[key]['label'], name,
+                    len(df), len(df) - invalid, invalid
+                ])
+
+            return {
+                'summary': pd.DataFrame(summary, columns=SUMMARY_COLUMNS).astype({'人数': 'Int64'}),
+                'rosters': pd.DataFrame(rosters, columns=ROSTER_COLUMNS),
+                **results,
+                'invalid_ids': self._invalid_frame(),
+            }
+
+        except Exception as e:
+            logger.error(f"多名册核对失败: {e}")
+            raise
+
+
+def iter_report_sheets(results):
+    """
+    按导出顺序生成核对报告的 (工作表名, DataFrame) 对
+
+    Args:
+        results: RosterReconciler.run 的结果
+    """
+    yield '核对汇总', results['summary']
+    yield '名册', results['rosters']
+    for key, sheet_name, _, _ in CHECKS:
+        if key in results:
+            df = results[key]
+            yield sheet_name, df if not df.empty else pd.DataFrame(columns=['无数据'])
+    if not results['invalid_ids'].empty:
+        yield '无效身份证号', results['invalid_ids']
+
+
+def reconcile_files(paths, output_path, reference_date=None, names=None, registry=None):
+    """
+    读取一组名册、执行核对并写出 Excel 报告
+
+    Args:
+        paths: 名册文件路径列表
+        output_path: 报告文件路径
+        reference_date: 出生日期校验的基准日期
+        names: 可选的原始文件名列表
+        registry: 模板注册表（可选）
+
+    Returns:
+        dict: 核对结果
+    """
+    results = RosterReconciler(load_rosters(paths, names, registry), reference_date).run()
+    exporter.write_workbook(iter_report_sheets(results), output_path)
+    return results
@@ -0,0 +1,217 @@
+"""
+结果缓存模块 - 按输入内容寻址的跨会话比对结果缓存
+
+缓存键由两个上传文件的 SHA-256、比对引擎版本和计算基准日期组成，
+相同输入的重复比对直接复用已完成的结果。缓存位于上传目录下，
+受容量上限（LRU 淘汰）和上传目录过期清理的双重约束。
+"""
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 缓存目录名（位于上传目录下）
+RESULT_CACHE_DIRNAME = '_result_cache'
+
+# 缓存条目中结果存储的子目录名
+ENTRY_RESULTS_DIRNAME = 'results'
+
+# 缓存条目信息文件名
+ENTRY_INFO_FILENAME = 'entry.json'
+
+
+def make_cache_key(local_digest, national_digest, engine_version, reference_date,
+                   duplicate_policy=None, reader=None):
+    """
+    生成缓存键
+
+    Args:
+        local_digest: 单机库文件 SHA-256
+        national_digest: 全国库文件 SHA-256
+        engine_version: 比对引擎版本
+        reference_date: 党龄/年龄计算基准日期
+        duplicate_policy: 身份证号重复时的处理方式
+        reader: Excel 解析引擎组合（见 core.excel_reader.engine_signature）
+
+    Returns:
+        str: 缓存键（SHA-256 十六进制）
+    """
+    payload = json.dumps(
+        [local_digest, national_digest, str(engine_version), str(reference_date),
+         str(duplicate_policy), str(reader)]
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _link_or_copy(src, dst):
+    """优先使用硬链接，跨文件系统时回退为复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ResultCache:
+    """比对结果缓存"""
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        初始化结果缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存容量上限（字节），0 表示禁用缓存
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, target_dir):
+        """
+        查找缓存，命中时将结果存储复制到目标目录
+
+        Args:
+            key: 缓存键
+            target_dir: 会话结果目录
+
+        Returns:
+            bool: 是否命中
+        """
+        if not self.enabled:
+            return False
+
+        entry_results = os.path.join(self._entry_dir(key), ENTRY_RESULTS_DIRNAME)
+        if not os.path.isdir(entry_results):
+            return False
+
+        tmp_dir = f'{target_dir}.tmp-{uuid.uuid4().hex}'
+        try:
+            shutil.copytree(entry_results, tmp_dir, copy_function=_link_or_copy)
+            if os.path.exists(target_dir):
+                shutil.rmtree(target_dir)
+            os.replace(tmp_dir, target_dir)
+        except OSError as e:
+            # 条目可能正被其他进程淘汰，按未命中处理
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.warning(f"读取结果缓存失败 {key}: {e}")
+            return False
+
+        # 更新访问时间，用于 LRU 淘汰
+        try:
+            os.utime(self._entry_dir(key))
+        except OSError:
+            pass
+
+        logger.info(f"结果缓存命中: {key}")
+        return True
+
+    def put(self, key, results_dir):
+        """
+        将已完成的结果存储写入缓存，并按容量上限淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            results_dir: 会话结果目录
+        """
+        if not self.enabled:
+            return
+
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            os.utime(entry_dir)
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = os.path.join(self.cache_dir, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            shutil.copytree(
+                results_dir,
+                os.path.join(tmp_dir, ENTRY_RESULTS_DIRNAME),
+                copy_function=_link_or_copy
+            )
+            with open(os.path.join(tmp_dir, ENTRY_INFO_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'key': key,
+                    'created_at': datetime.now().isoformat(timespec='seconds')
+                }, f)
+            os.replace(tmp_dir, entry_dir)
+            logger.info(f"比对结果已写入缓存: {key}")
+        except OSError as e:
+            # 其他进程可能已写入同一条目
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.warning(f"写入结果缓存失败 {key}: {e}")
+            return
+
+        self.evict()
+
+    def evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过容量上限"""
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                entries.append((os.path.getmtime(path), _dir_size(path), path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"淘汰结果缓存: {path}")
+
+    def purge_expired(self, threshold):
+        """
+        删除创建时间早于阈值的条目（遵循上传目录的过期清理策略）
+
+        Args:
+            threshold: datetime，早于该时间创建的条目将被删除
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                if name.startswith('.'):
+                    # 未完成的临时目录按修改时间判断
+                    created = datetime.fromtimestamp(os.path.getmtime(path))
+                else:
+                    with open(os.path.join(path, ENTRY_INFO_FILENAME), 'r', encoding='utf-8') as f:
+                        created = datetime.fromisoformat(json.load(f)['created_at'])
+            except (OSError, ValueError, KeyError):
+                created = datetime.min
+            if created < threshold:
+                shutil.rmtree(path, ignore_errors=True)
+                logger.info(f"清理过期结果缓存: {path}")
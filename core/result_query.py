@@ -0,0 +1,114 @@
+"""
+结果查询模块 - 比对结果表的分页、排序、筛选和搜索
+"""
+import json
+import math
+import logging
+import pandas as pd
+
+from core.comparison import ComparisonEngine
+
+logger = logging.getLogger(__name__)
+
+# 可查询的结果分区（与 ComparisonEngine.generate_report() 的键对应）
+RESULT_SECTIONS = (
+    ['local_extra', 'national_extra'] +
+    [f'diff_{field}' for field in ComparisonEngine.COMPARE_FIELDS] +
+    ['invalid_ids', 'duplicate_ids', 'local_preprocessed', 'national_preprocessed']
+)
+
+# 身份证号/姓名搜索使用的列
+SEARCH_COLUMNS = ['身份证号', '身份证号码', '姓名']
+
+# 分页大小
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _sort_frame(df, sort_column, ascending):
+    """按列排序；混合类型列无法直接比较时按字符串排序"""
+    try:
+        return df.sort_values(sort_column, ascending=ascending, kind='stable')
+    except TypeError:
+        return df.sort_values(
+            sort_column,
+            ascending=ascending,
+            kind='stable',
+            key=lambda col: col.astype(str)
+        )
+
+
+def query_section(df, page=1, page_size=DEFAULT_PAGE_SIZE, sort=None,
+                  order='asc', column=None, value=None, q=None):
+    """
+    查询结果表的一页数据
+
+    Args:
+        df: 结果 DataFrame
+        page: 页码（从 1 开始）
+        page_size: 每页行数（最大 MAX_PAGE_SIZE）
+        sort: 排序列名
+        order: 排序方向，'asc' 或 'desc'
+        column: 筛选列名
+        value: 筛选值（包含匹配）
+        q: 身份证号或姓名搜索关键字（包含匹配）
+
+    Returns:
+        dict: {
+            'columns': list,  # 列名
+            'rows': list,     # 当前页数据（二维列表）
+            'total': int,     # 筛选后的总行数
+            'page': int,
+            'page_size': int,
+            'pages': int
+        }
+
+    Raises:
+        ValueError: 排序或筛选列不存在
+    """
+    if df is None:
+        df = pd.DataFrame()
+
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    # 列筛选
+    if column and value:
+        if column not in df.columns:
+            raise ValueError(f"筛选列不存在: {column}")
+        df = df[df[column].astype(str).str.contains(value, regex=False, na=False)]
+
+    # 身份证号/姓名搜索
+    if q:
+        search_columns = [col for col in SEARCH_COLUMNS if col in df.columns]
+        if search_columns:
+            mask = pd.Series(False, index=df.index)
+            for col in search_columns:
+                mask |= df[col].astype(str).str.contains(q, case=False, regex=False, na=False)
+            df = df[mask]
+
+    # 排序
+    if sort:
+        if sort not in df.columns:
+            raise ValueError(f"排序列不存在: {sort}")
+        df = _sort_frame(df, sort, ascending=(order != 'desc'))
+
+    total = len(df)
+    pages = max(1, math.ceil(total / page_size))
+    page = max(1, min(int(page), pages))
+
+    start = (page - 1) * page_size
+    page_df = df.iloc[start:start + page_size]
+
+    # 借助 to_json 统一处理日期、缺失值等类型
+    rows = json.loads(
+        page_df.to_json(orient='values', date_format='iso', force_ascii=False)
+    ) if total else []
+
+    return {
+        'columns': [str(col) for col in df.columns],
+        'rows': rows,
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'pages': pages
+    }
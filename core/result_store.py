@@ -0,0 +1,287 @@
+"""
+结果存储模块 - 以列式文件按分区保存比对结果
+
+每个结果分区（local_extra、diff_姓名 等）单独保存为一个未压缩的
+Feather 文件，可按列、按需以内存映射方式读取；manifest.json 记录
+各分区的行数和表结构，统计数据只需读取 manifest。
+"""
+import os
+import json
+import uuid
+import shutil
+import logging
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+# manifest 文件名
+MANIFEST_FILENAME = 'manifest.json'
+
+# manifest 格式版本
+MANIFEST_VERSION = 1
+
+# 分区文件格式
+FORMAT_FEATHER = 'feather'
+FORMAT_PICKLE = 'pickle'
+
+
+class ArrowFileSection:
+    """
+    已写好的 Arrow IPC（Feather V2）文件分区
+
+    外部排序比对直接将分区流式写入文件，保存时移动到结果目录，
+    不需要先读入内存。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 未压缩的 Arrow IPC 文件路径
+        """
+        self.path = path
+
+
+class ResultStore:
+    """比对结果存储"""
+
+    def __init__(self, store_dir):
+        """
+        初始化结果存储
+
+        Args:
+            store_dir: 结果存储目录，如 uploads/<session_id>/results
+        """
+        self.store_dir = store_dir
+        self._manifest = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.store_dir, MANIFEST_FILENAME)
+
+    def exists(self):
+        """
+        检查结果是否已完整保存（以 manifest 存在为准）
+
+        Returns:
+            bool: 是否存在
+        """
+        return os.path.exists(self.manifest_path)
+
+    @property
+    def manifest(self):
+        """读取并缓存 manifest"""
+        if self._manifest is None:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self._manifest = json.load(f)
+        return self._manifest
+
+    @classmethod
+    def save(cls, results, store_dir):
+        """
+        保存比对结果
+
+        先写入临时目录，全部写完后再替换旧结果，避免读到半成品。
+
+        Args:
+            results: 比对结果字典 (来自 ComparisonEngine.generate_report())，
+                     值也可以是 ArrowFileSection
+            store_dir: 结果存储目录
+
+        Returns:
+            ResultStore: 结果存储实例
+        """
+        tmp_dir = f'{store_dir}.tmp-{uuid.uuid4().hex}'
+        os.makedirs(tmp_dir)
+
+        try:
+            sections = {}
+            for index, (name, df) in enumerate(results.items()):
+                if isinstance(df, ArrowFileSection):
+                    sections[name] = _move_section(tmp_dir, index, name, df)
+                elif isinstance(df, pd.DataFrame):
+                    sections[name] = _write_section(tmp_dir, index, name, df)
+
+            manifest = {
+                'version': MANIFEST_VERSION,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'sections': sections
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            if os.path.exists(store_dir):
+                shutil.rmtree(store_dir)
+            os.replace(tmp_dir, store_dir)
+
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"比对结果已保存: {store_dir}，共 {len(sections)} 个分区")
+        return cls(store_dir)
+
+    def artifact_path(self, filename):
+        """
+        获取结果派生文件（如预生成的 Excel 报告）的路径
+
+        派生文件与分区文件保存在同一目录，结果被替换时一并失效。
+
+        Args:
+            filename: 文件名
+
+        Returns:
+            str: 文件路径
+        """
+        return os.path.join(self.store_dir, filename)
+
+    def sections(self):
+        """
+        获取所有分区名称
+
+        Returns:
+            list: 分区名称
+        """
+        return list(self.manifest['sections'])
+
+    def count(self, section):
+        """
+        获取分区行数（仅读取 manifest）
+
+        Args:
+            section: 分区名称
+
+        Returns:
+            int: 行数，分区不存在时返回 0
+        """
+        info = self.manifest['sections'].get(section)
+        return info['rows'] if info else 0
+
+    def columns(self, section):
+        """
+        获取分区列名（仅读取 manifest）
+
+        Args:
+            section: 分区名称
+
+        Returns:
+            list: 列名，分区不存在时返回空列表
+        """
+        info = self.manifest['sections'].get(section)
+        return info['columns'] if info else []
+
+    def summary(self):
+        """
+        获取所有分区的行数（仅读取 manifest）
+
+        Returns:
+            dict: {分区名称: 行数}
+        """
+        return {
+            name: info['rows']
+            for name, info in self.manifest['sections'].items()
+        }
+
+    def load(self, section, columns=None):
+        """
+        读取单个分区
+
+        Args:
+            section: 分区名称
+            columns: 需要读取的列（默认全部）
+
+        Returns:
+            DataFrame: 分区数据，分区不存在时返回 None
+        """
+        info = self.manifest['sections'].get(section)
+        if info is None:
+            return None
+
+        path = os.path.join(self.store_dir, info['file'])
+
+        if info['format'] == FORMAT_FEATHER:
+            table = feather.read_table(path, columns=columns, memory_map=True)
+            return table.to_pandas()
+
+        df = pd.read_pickle(path)
+        return df[columns] if columns is not None else df
+
+    def load_many(self, sections):
+        """
+        读取多个分区
+
+        Args:
+            sections: 分区名称列表
+
+        Returns:
+            dict: {分区名称: DataFrame}，不存在的分区被忽略
+        """
+        loaded = {}
+        for section in sections:
+            df = self.load(section)
+            if df is not None:
+                loaded[section] = df
+        return loaded
+
+
+def _write_section(store_dir, index, name, df):
+    """
+    写入单个分区文件
+
+    优先写入未压缩的 Feather 文件（可内存映射）；若存在 Arrow 无法
+    表示的混合类型列，则回退为 pickle，保证数据与比对结果完全一致。
+
+    Returns:
+        dict: manifest 中该分区的描述信息
+    """
+    df = df.reset_index(drop=True)
+    file_base = f'{index:02d}_{name}'
+
+    try:
+        filename = f'{file_base}.feather'
+        df.to_feather(os.path.join(store_dir, filename), compression='uncompressed')
+        file_format = FORMAT_FEATHER
+    except Exception as e:
+        logger.warning(f"结果分区 '{name}' 无法以 Feather 格式保存，改用 pickle: {e}")
+        if os.path.exists(os.path.join(store_dir, filename)):
+            os.remove(os.path.join(store_dir, filename))
+        filename = f'{file_base}.pkl'
+        df.to_pickle(os.path.join(store_dir, filename))
+        file_format = FORMAT_PICKLE
+
+    return {
+        'file': filename,
+        'format': file_format,
+        'rows': len(df),
+        'columns': [str(col) for col in df.columns],
+        'dtypes': {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+    }
+
+
+def _move_section(store_dir, index, name, section):
+    """
+    将已写好的 Arrow IPC 文件移动到结果目录
+
+    Returns:
+        dict: manifest 中该分区的描述信息
+    """
+    filename = f'{index:02d}_{name}.feather'
+    path = os.path.join(store_dir, filename)
+    shutil.move(section.path, path)
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        schema = reader.schema
+        rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+    empty = schema.empty_table().to_pandas()
+    return {
+        'file': filename,
+        'format': FORMAT_FEATHER,
+        'rows': rows,
+        'columns': [str(col) for col in empty.columns],
+        'dtypes': {str(col): str(dtype) for col, dtype in empty.dtypes.items()}
+    }
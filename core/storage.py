@@ -0,0 +1,255 @@
+"""
+存储后端模块 - 上传文件、解析缓存、任务状态和比对结果的存放位置
+
+会话数据按会话 ID 存放在存储根目录下（<根目录>/<会话 ID>/），路由和文件
+处理通过存储后端获取路径。session 中只保存相对于根目录的路径，因此多个
+节点挂载同一共享目录（挂载点可以不同）时，任意节点都能处理同一会话的
+/result、/download 和任务状态查询，不需要粘性会话。
+
+- local：本机目录（默认，单节点部署）
+- shared：多个节点共享的目录（NFS 等）。外部排序比对等计算过程中的临时
+  文件写入本机临时目录，只有最终结果写入共享目录；所有节点必须使用相同
+  的 SECRET_KEY，才能识别其他节点签发的 session
+"""
+import os
+import uuid
+import tempfile
+import logging
+
+from core.result_cache import RESULT_CACHE_DIRNAME
+
+logger = logging.getLogger(__name__)
+
+# 可选的存储后端
+STORAGE_BACKENDS = ('local', 'shared')
+
+# 会话目录下的子目录
+JOBS_DIRNAME = 'jobs'
+RESULTS_DIRNAME = 'results'
+CHUNKED_DIRNAME = 'chunked'
+RECONCILE_DIRNAME = 'reconcile'
+
+# 共享存储时本机临时目录的名称
+SCRATCH_DIRNAME = 'party-compare-scratch'
+
+
+def is_valid_session_id(session_id):
+    """
+    检查会话 ID 是否为合法的 UUID（防止路径遍历）
+
+    Args:
+        session_id: 会话 ID
+
+    Returns:
+        bool: 是否合法
+    """
+    try:
+        return str(uuid.UUID(session_id)) == session_id
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+class LocalStorage:
+    """本机目录存储"""
+
+    backend = 'local'
+
+    def __init__(self, root):
+        """
+        初始化本机目录存储
+
+        Args:
+            root: 存储根目录
+        """
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def shared(self):
+        """是否为多节点共享的存储"""
+        return False
+
+    def session_dir(self, session_id, create=False):
+        """
+        获取会话目录
+
+        Args:
+            session_id: 会话 ID
+            create: 不存在时是否创建
+
+        Returns:
+            str: 会话目录路径
+
+        Raises:
+            ValueError: 会话 ID 无效
+        """
+        if not is_valid_session_id(session_id):
+            raise ValueError('会话无效')
+
+        path = os.path.join(self.root, session_id)
+        if create and not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            logger.info(f"创建会话目录: {path}")
+        return path
+
+    def jobs_dir(self, session_id):
+        """会话的任务状态目录"""
+        return os.path.join(self.session_dir(session_id), JOBS_DIRNAME)
+
+    def results_dir(self, session_id):
+        """会话的结果存储目录"""
+        return os.path.join(self.session_dir(session_id), RESULTS_DIRNAME)
+
+    def chunked_dir(self, session_id):
+        """会话的分块上传目录（已创建）"""
+        path = os.path.join(self.session_dir(session_id, create=True), CHUNKED_DIRNAME)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def reconcile_dir(self, session_id):
+        """会话的多名册核对目录（已创建）：uploads/ 为上传的名册，jobs/ 为任务状态，reports/ 为报告"""
+        path = os.path.join(self.session_dir(session_id, create=True), RECONCILE_DIRNAME)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def cache_dir(self):
+        """跨会话的结果缓存目录"""
+        return os.path.join(self.root, RESULT_CACHE_DIRNAME)
+
+    def scratch_dir(self, session_id):
+        """
+        计算过程中临时文件的目录（本机存储即为会话目录）
+
+        Args:
+            session_id: 会话 ID
+
+        Returns:
+            str: 目录路径（已创建）
+        """
+        return self.session_dir(session_id, create=True)
+
+    def to_ref(self, path):
+        """
+        将存储中的文件路径转换为可保存在 session 中的引用（相对于根目录）
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            str: 引用
+        """
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def from_ref(self, ref):
+        """
+        将 session 中保存的引用转换为本节点的文件路径
+
+        Args:
+            ref: to_ref 返回的引用
+
+        Returns:
+            str: 文件路径，引用为空或不在存储根目录下时返回 None
+        """
+        if not ref:
+            return None
+        path = os.path.abspath(os.path.join(self.root, ref))
+        if os.path.commonpath([path, self.root]) != self.root:
+            logger.warning(f"忽略存储根目录之外的路径: {ref}")
+            return None
+        return path
+
+    def cleanup_expired(self, cleanup, max_age_hours):
+        """
+        清理过期的会话数据
+
+        Args:
+            cleanup: 清理函数 cleanup(目录, max_age_hours)
+            max_age_hours: 最大保留时间（小时）
+        """
+        cleanup(self.root, max_age_hours)
+
+
+class SharedDirectoryStorage(LocalStorage):
+    """多节点共享目录存储"""
+
+    backend = 'shared'
+
+    def __init__(self, root, scratch_root=None):
+        """
+        初始化共享目录存储
+
+        Args:
+            root: 共享存储根目录（各节点挂载同一目录）
+            scratch_root: 本机临时目录（默认系统临时目录）
+        """
+        super().__init__(root)
+        self.scratch_root = os.path.join(scratch_root or tempfile.gettempdir(), SCRATCH_DIRNAME)
+
+    @property
+    def shared(self):
+        return True
+
+    def scratch_dir(self, session_id):
+        """计算过程中临时文件写入本机目录，不占用共享存储的带宽"""
+        if not is_valid_session_id(session_id):
+            raise ValueError('会话无效')
+        path = os.path.join(self.scratch_root, session_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def cleanup_expired(self, cleanup, max_age_hours):
+        super().cleanup_expired(cleanup, max_age_hours)
+        if os.path.isdir(self.scratch_root):
+            cleanup(self.scratch_root, max_age_hours)
+
+
+def create_storage(backend, root, scratch_root=None):
+    """
+    按名称创建存储后端
+
+    Args:
+        backend: 'local' 或 'shared'
+        root: 存储根目录
+        scratch_root: 本机临时目录（仅 shared 使用）
+
+    Returns:
+        LocalStorage: 存储后端实例
+
+    Raises:
+        ValueError: 后端名称无效
+    """
+    if backend == 'local':
+        return LocalStorage(root)
+    if backend == 'shared':
+        return SharedDirectoryStorage(root, scratch_root)
+    raise ValueError(f'无效的存储后端: {backend}（可选 {", ".join(STORAGE_BACKENDS)}）')
+
+
+# 创建全局存储后端实例（将在 app 启动时初始化）
+storage = None
+
+
+def init_storage(backend, root, scratch_root=None):
+    """
+    初始化全局存储后端实例
+
+    Args:
+        backend: 'local' 或 'shared'
+        root: 存储根目录
+        scratch_root: 本机临时目录（仅 shared 使用）
+    """
+    global storage
+    storage = create_storage(backend, root, scratch_root)
+    logger.info(f"存储后端初始化完成: {backend}，根目录: {storage.root}")
+
+
+def get_storage():
+    """
+    获取全局存储后端实例
+
+    Returns:
+        LocalStorage: 存储后端实例
+    """
+    if storage is None:
+        raise RuntimeError("存储后端尚未初始化，请先调用 init_storage()")
+    return storage
@@ -0,0 +1,276 @@
+"""
+模板注册表模块 - 按表头签名识别上传文件及其各工作表的名册类型
+"""
+import os
+import logging
+
+import xlrd
+
+from core.validator import header_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# 注册的模板：(类型, 名称, 模板文件名)
+# 名册类型与 core.reconciliation.ROSTER_TYPES 一致
+TEMPLATES = [
+    ('local', '单机库', '单机模板.xls'),
+    ('national', '全国库', '全国模板.xls'),
+    ('members', '党员花名册', '1党员花名册.xlsx'),
+    ('organizations', '党组织名单', '2党组织名单.xls'),
+    ('applicants', '入党申请人名册', '4入党申请人名册.xlsx'),
+    ('developing', '发展党员名册', '5发展党员名册.xlsx'),
+    ('transferred_in', '转入党员名册', '6转入党员名册.xls'),
+    ('transferred_out', '转出党员名册', '7转出党员名册.xls'),
+    ('deceased', '死亡党员名册', '10死亡党员名册.xls'),
+]
+
+# 查找表头行的最大行数（表头前可能有标题行）
+HEADER_SEARCH_ROWS = 10
+
+# 模板中作为表头的行至少包含的非空单元格数（标题行通常只有一个单元格）
+MIN_HEADER_COLUMNS = 3
+
+
+def normalize_header(values):
+    """
+    规范化一行单元格为表头列名：去除首尾空格，去掉末尾的空单元格
+
+    Args:
+        values: 单元格值序列
+
+    Returns:
+        list: 列名列表
+    """
+    columns = []
+    for value in values:
+        if value is None:
+            columns.append('')
+        elif isinstance(value, float) and value.is_integer():
+            columns.append(str(int(value)))
+        else:
+            columns.append(str(value).strip())
+    while columns and not columns[-1]:
+        columns.pop()
+    return columns
+
+
+def iter_sheet_heads(file_path, nrows=HEADER_SEARCH_ROWS):
+    """
+    逐个工作表读取前若干行，不解析其余数据行
+
+    .xls 文件以 on_demand 方式打开，逐个加载并释放工作表；.xlsx 文件由
+    openpyxl 只读模式读取，每个工作表读到第 nrows 行即停止。
+
+    Args:
+        file_path: Excel 文件路径
+        nrows: 每个工作表读取的行数
+
+    Yields:
+        tuple: (工作表索引, 工作表名称, 各行单元格值列表)
+    """
+    if xlrd.inspect_format(file_path) == 'xls':
+        book = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            for index in range(book.nsheets):
+                sheet = book.sheet_by_index(index)
+                rows = [sheet.row_values(i) for i in range(min(nrows, sheet.nrows))]
+                book.unload_sheet(index)
+                yield index, sheet.name, rows
+        finally:
+            book.release_resources()
+    else:
+        import openpyxl
+
+        # 以文件对象打开：扩展名为 .xls 的 xlsx 文件也能读取
+        with open(file_path, 'rb') as f:
+            workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+            try:
+                for index, sheet in enumerate(workbook.worksheets):
+                    rows = [list(row) for row in sheet.iter_rows(max_row=nrows, values_only=True)]
+                    yield index, sheet.title, rows
+            finally:
+                workbook.close()
+
+
+class TemplateRegistry:
+    """模板表头签名注册表"""
+
+    def __init__(self, templates_folder):
+        """
+        初始化模板注册表
+
+        Args:
+            templates_folder: 模板文件所在目录
+        """
+        self.templates_folder = templates_folder
+        # 类型 -> {'label', 'columns', 'header_row'}
+        self.templates = {}
+        # 表头签名 -> 类型
+        self.signatures = {}
+
+    def load(self):
+        """
+        读取所有模板第一张工作表的表头并注册签名
+
+        模板文件不存在时跳过；表头与已注册模板完全相同时保留先注册的类型。
+
+        Returns:
+            TemplateRegistry: 自身，便于链式调用
+        """
+        try:
+            for key, label, filename in TEMPLATES:
+                path = os.path.join(self.templates_folder, filename)
+                if not os.path.exists(path):
+                    logger.warning(f"模板文件不存在，跳过: {path}")
+                    continue
+
+                _, _, rows = next(iter_sheet_heads(path))
+                for header_row, row in enumerate(rows):
+                    columns = normalize_header(row)
+                    if sum(1 for name in columns if name) >= MIN_HEADER_COLUMNS:
+                        break
+                else:
+                    logger.warning(f"模板中未找到表头，跳过: {path}")
+                    continue
+
+                signature = header_fingerprint(columns)
+                if signature in self.signatures:
+                    logger.warning(
+                        f"{label}模板表头与{self.templates[self.signatures[signature]]['label']}相同，跳过"
+                    )
+                    continue
+
+                self.templates[key] = {
+                    'label': label,
+                    'columns': columns,
+                    'header_row': header_row
+                }
+                self.signatures[signature] = key
+
+            logger.info(f"模板注册表已加载 {len(self.templates)} 个模板")
+            return self
+
+        except Exception as e:
+            logger.error(f"加载模板注册表失败: {e}")
+            raise
+
+    def label(self, key):
+        """模板类型的名称"""
+        return self.templates[key]['label']
+
+    def match_columns(self, columns):
+        """
+        按表头列名查找模板类型
+
+        Args:
+            columns: 列名列表
+
+        Returns:
+            str: 模板类型，未注册时返回 None
+        """
+        return self.signatures.get(header_fingerprint(normalize_header(columns)))
+
+    def match_rows(self, rows):
+        """
+        在工作表前若干行中查找与模板表头一致的行
+
+        每行只计算一次签名并做一次字典查找，开销与注册的模板数量无关。
+
+        Args:
+            rows: 各行单元格值列表
+
+        Returns:
+            tuple: (模板类型, 表头行号)，未识别时为 (None, None)
+        """
+        for header_row, row in enumerate(rows[:HEADER_SEARCH_ROWS]):
+            key = self.match_columns(row)
+            if key is not None:
+                return key, header_row
+        return None, None
+
+    def classify(self, file_path):
+        """
+        识别工作簿中每个工作表的名册类型（只读取表头）
+
+        Args:
+            file_path: Excel 文件路径
+
+        Returns:
+            list: [{'sheet', 'name', 'type', 'label', 'header_row'}, ...]
+                  sheet 为工作表索引；未识别的工作表 type、label、header_row 为 None
+        """
+        matches = []
+        for index, name, rows in iter_sheet_heads(file_path):
+            key, header_row = self.match_rows(rows)
+            matches.append({
+                'sheet': index,
+                'name': name,
+                'type': key,
+                'label': self.label(key) if key else None,
+                'header_row': header_row
+            })
+        return matches
+
+    def find_sheets(self, file_path, key, header_row=None):
+        """
+        查找工作簿中属于指定类型的工作表
+
+        Args:
+            file_path: Excel 文件路径
+            key: 模板类型
+            header_row: 要求的表头行号（可选，如 0 表示表头必须在第一行）
+
+        Returns:
+            list: 工作表索引列表
+        """
+        return [
+            match['sheet'] for match in self.classify(file_path)
+            if match['type'] == key and header_row in (None, match['header_row'])
+        ]
+
+
+def describe_mismatch(matches, expected):
+    """
+    上传位置错误时的提示信息
+
+    Args:
+        matches: TemplateRegistry.classify 的结果
+        expected: 期望的模板类型
+
+    Returns:
+        str: 文件被识别为其他名册时的提示，未识别时返回 None
+    """
+    labels = []
+    for match in matches:
+        if match['type'] and match['type'] != expected and match['label'] not in labels:
+            labels.append(match['label'])
+    if not labels:
+        return None
+    return f"上传的文件是{'、'.join(labels)}，请确认上传位置"
+
+
+# 全局注册表实例（将在 app 启动时初始化）
+registry = None
+
+
+def init_registry(templates_folder):
+    """
+    初始化全局模板注册表
+
+    Args:
+        templates_folder: 模板文件所在目录
+    """
+    global registry
+    registry = TemplateRegistry(templates_folder).load()
+
+
+def get_registry():
+    """
+    获取全局模板注册表
+
+    Returns:
+        TemplateRegistry: 注册表实例
+    """
+    if registry is None:
+        raise RuntimeError("模板注册表尚未初始化，请先调用 init_registry()")
+    return registry
@@ -2,12 +2,61 @@
 模板校验模块 - 验证上传文件是否符合标准模板格式
 """
 import os
-import pandas as pd
+import hashlib
 import logging
 
+from core import excel_reader
+
 logger = logging.getLogger(__name__)
 
 
+def read_header(file_path, sheet_name=0):
+    """
+    只读取工作表表头（第一行），不解析任何数据行
+
+    按文件内容（而非扩展名）判断格式，使用流式引擎（见 core.excel_reader）：
+    .xls 文件以 on_demand 方式打开，只加载目标工作表；.xlsx 文件由 openpyxl
+    只读模式逐行读取，读到表头即停止。
+
+    Args:
+        file_path: Excel 文件路径
+        sheet_name: 工作表名称或索引
+
+    Returns:
+        list: 去除首尾空格后的列名（保留顺序）
+    """
+    df_header = excel_reader.read_excel(file_path, sheet_name=sheet_name, header_only=True, nrows=0)
+
+    # 去除列名中的空格
+    return [str(col).strip() for col in df_header.columns]
+
+
+def header_fingerprint(columns):
+    """
+    计算表头指纹（与列顺序相关）
+
+    Args:
+        columns: 列名列表
+
+    Returns:
+        str: SHA-1 十六进制摘要
+    """
+    return hashlib.sha1('\x1f'.join(columns).encode('utf-8')).hexdigest()
+
+
+def column_letter(index):
+    """
+    将从 0 开始的列索引转换为 Excel 列字母（A, B, ..., Z, AA, AB...）
+
+    Args:
+        index: 列索引
+
+    Returns:
+        str: 列字母
+    """
+    return chr(65 + index) if index < 26 else f'{chr(65 + index//26 - 1)}{chr(65 + index%26)}'
+
+
 class TemplateValidator:
     """模板校验器"""
 
@@ -21,6 +70,8 @@ class TemplateValidator:
         self.templates_folder = templates_folder
         self.local_template_columns = None
         self.national_template_columns = None
+        self.local_template_fingerprint = None
+        self.national_template_fingerprint = None
 
         # 模板文件路径 - 使用标准模板
         self.local_template_path = os.path.join(
@@ -34,7 +85,7 @@ class TemplateValidator:
 
     def load_templates(self):
         """
-        加载模板文件并提取表头列名（保留顺序）
+        加载模板文件表头列名（保留顺序）并预先计算表头指纹
 
         Raises:
             FileNotFoundError: 模板文件不存在
@@ -47,9 +98,10 @@ class TemplateValidator:
                     f"单机库模板文件不存在: {self.local_template_path}"
                 )
 
-            df_local = pd.read_excel(self.local_template_path)
-            # 去除列名中的空格
-            self.local_template_columns = [str(col).strip() for col in df_local.columns]
+            self.local_template_columns = read_header(self.local_template_path)
+            self.local_template_fingerprint = header_fingerprint(
+                self.local_template_columns
+            )
             logger.info(
                 f"已加载单机库模板，包含 {len(self.local_template_columns)} 列"
             )
@@ -60,12 +112,13 @@ class TemplateValidator:
                     f"全国库模板文件不存在: {self.national_template_path}"
                 )
 
-            df_national = pd.read_excel(
+            self.national_template_columns = read_header(
                 self.national_template_path,
                 sheet_name=0
             )
-            # 去除列名中的空格
-            self.national_template_columns = [str(col).strip() for col in df_national.columns]
+            self.national_template_fingerprint = header_fingerprint(
+                self.national_template_columns
+            )
             logger.info(
                 f"已加载全国库模板，包含 {len(self.national_template_columns)} 列"
             )
@@ -77,10 +130,134 @@ class TemplateValidator:
             logger.error(f"加载模板失败: {e}")
             raise
 
+    def compare_columns(self, template_columns, uploaded_columns):
+        """
+        详细比对模板列与上传文件列（仅在表头指纹不一致时调用）
+
+        Args:
+            template_columns: 模板列名列表
+            uploaded_columns: 上传文件列名列表
+
+        Returns:
+            dict: 包含 valid、missing_columns、extra_columns、
+                  order_mismatch、column_details 的校验结果
+        """
+        # 比对列名（使用集合检查缺失和多余）
+        template_set = set(template_columns)
+        uploaded_set = set(uploaded_columns)
+
+        missing_columns = list(template_set - uploaded_set)
+        extra_columns = list(uploaded_set - template_set)
+
+        # 检查列顺序并生成详细信息
+        order_mismatch = False
+        column_details = []
+
+        if len(missing_columns) == 0 and len(extra_columns) == 0:
+            order_mismatch = uploaded_columns != template_columns
+
+            if order_mismatch:
+                # 提供每列的详细对比信息
+                for i, (expected, actual) in enumerate(zip(template_columns, uploaded_columns)):
+                    if expected != actual:
+                        column_details.append({
+                            'position': f'{column_letter(i)}列',
+                            'expected': expected,
+                            'actual': actual
+                        })
+        else:
+            # 如果有缺失或多余的列，提供位置信息
+            max_len = max(len(template_columns), len(uploaded_columns))
+            for i in range(max_len):
+                expected = template_columns[i] if i < len(template_columns) else '(无)'
+                actual = uploaded_columns[i] if i < len(uploaded_columns) else '(无)'
+                if expected != actual:
+                    column_details.append({
+                        'position': f'{column_letter(i)}列',
+                        'expected': expected,
+                        'actual': actual
+                    })
+
+        is_valid = (len(missing_columns) == 0 and
+                   len(extra_columns) == 0 and
+                   not order_mismatch)
+
+        return {
+            'valid': is_valid,
+            'missing_columns': missing_columns,
+            'extra_columns': extra_columns,
+            'order_mismatch': order_mismatch,
+            'column_details': column_details
+        }
+
+    def _validate(self, file_path, template_columns, template_fingerprint, label, sheet_name=0):
+        """
+        按表头指纹校验上传文件，不一致时再做详细比对
+
+        Args:
+            file_path: 上传文件路径
+            template_columns: 模板列名列表
+            template_fingerprint: 模板表头指纹
+            label: 日志中使用的库名称（单机库/全国库）
+            sheet_name: 需要校验的工作表
+
+        Returns:
+            dict: 校验结果，结构同 compare_columns
+        """
+        uploaded_columns = read_header(file_path, sheet_name=sheet_name)
+        return self._check_columns(
+            uploaded_columns, template_columns, template_fingerprint, label, file_path
+        )
+
+    def _check_columns(self, uploaded_columns, template_columns, template_fingerprint, label, source):
+        """
+        按表头指纹校验列名，不一致时再做详细比对
+
+        Args:
+            uploaded_columns: 上传文件列名列表
+            template_columns: 模板列名列表
+            template_fingerprint: 模板表头指纹
+            label: 日志中使用的库名称（单机库/全国库）
+            source: 日志中使用的文件描述
+
+        Returns:
+            dict: 校验结果，结构同 compare_columns
+        """
+        # 指纹一致即通过，无需逐列分析
+        if header_fingerprint(uploaded_columns) == template_fingerprint:
+            logger.info(f"{label}文件校验通过: {source}")
+            return {
+                'valid': True,
+                'missing_columns': [],
+                'extra_columns': [],
+                'order_mismatch': False,
+                'column_details': []
+            }
+
+        result = self.compare_columns(template_columns, uploaded_columns)
+
+        if result['valid']:
+            logger.info(f"{label}文件校验通过: {source}")
+        else:
+            error_details = []
+            if result['missing_columns']:
+                error_details.append(f"缺失列: {result['missing_columns']}")
+            if result['extra_columns']:
+                error_details.append(f"多余列: {result['extra_columns']}")
+            if result['order_mismatch']:
+                error_details.append("列顺序不匹配")
+            logger.warning(
+                f"{label}文件校验失败: {', '.join(error_details)}"
+            )
+
+        return result
+
     def validate_local_template(self, file_path):
         """
         验证单机库文件是否符合模板（包括列数量和顺序）
 
+        只读取表头，不解析数据行。
+
         Args:
             file_path: 上传文件路径
 
@@ -98,76 +275,12 @@ class TemplateValidator:
             if self.local_template_columns is None:
                 self.load_templates()
 
-            # 读取上传文件
-            df_uploaded = pd.read_excel(file_path)
-            # 去除列名中的空格
-            uploaded_columns = [str(col).strip() for col in df_uploaded.columns]
-
-            # 比对列名（使用集合检查缺失和多余）
-            template_set = set(self.local_template_columns)
-            uploaded_set = set(uploaded_columns)
-
-            missing_columns = list(template_set - uploaded_set)
-            extra_columns = list(uploaded_set - template_set)
-
-            # 检查列顺序并生成详细信息
-            order_mismatch = False
-            column_details = []
-
-            if len(missing_columns) == 0 and len(extra_columns) == 0:
-                order_mismatch = uploaded_columns != self.local_template_columns
-
-                if order_mismatch:
-                    # 提供每列的详细对比信息
-                    for i, (expected, actual) in enumerate(zip(self.local_template_columns, uploaded_columns)):
-                        col_letter = chr(65 + i)  # A, B, C...
-                        if expected != actual:
-                            column_details.append({
-                                'position': f'{col_letter}列',
-                                'expected': expected,
-                                'actual': actual
-                            })
-            else:
-                # 如果有缺失或多余的列，提供位置信息
-                max_len = max(len(self.local_template_columns), len(uploaded_columns))
-                for i in range(max_len):
-                    col_letter = chr(65 + i) if i < 26 else f'{chr(65 + i//26 - 1)}{chr(65 + i%26)}'
-                    expected = self.local_template_columns[i] if i < len(self.local_template_columns) else '(无)'
-                    actual = uploaded_columns[i] if i < len(uploaded_columns) else '(无)'
-                    if expected != actual:
-                        column_details.append({
-                            'position': f'{col_letter}列',
-                            'expected': expected,
-                            'actual': actual
-                        })
-
-            is_valid = (len(missing_columns) == 0 and
-                       len(extra_columns) == 0 and
-                       not order_mismatch)
-
-            result = {
-                'valid': is_valid,
-                'missing_columns': missing_columns,
-                'extra_columns': extra_columns,
-                'order_mismatch': order_mismatch,
-                'column_details': column_details
-            }
-
-            if is_valid:
-                logger.info(f"单机库文件校验通过: {file_path}")
-            else:
-                error_details = []
-                if missing_columns:
-                    error_details.append(f"缺失列: {missing_columns}")
-                if extra_columns:
-                    error_details.append(f"多余列: {extra_columns}")
-                if order_mismatch:
-                    error_details.append("列顺序不匹配")
-                logger.warning(
-                    f"单机库文件校验失败: {', '.join(error_details)}"
-                )
-
-            return result
+            return self._validate(
+                file_path,
+                self.local_template_columns,
+                self.local_template_fingerprint,
+                '单机库'
+            )
 
         except Exception as e:
             logger.error(f"校验单机库文件失败: {e}")
@@ -176,12 +289,15 @@ class TemplateValidator:
                 'error': str(e)
             }
 
-    def validate_national_template(self, file_path):
+    def validate_national_template(self, file_path, sheet_name=0):
         """
         验证全国库文件是否符合模板（包括列数量和顺序）
 
+        只读取指定工作表（默认第一张）的表头，不解析数据行。
+
         Args:
             file_path: 上传文件路径
+            sheet_name: 需要校验的工作表
 
         Returns:
             dict: {
@@ -197,76 +313,13 @@ class TemplateValidator:
             if self.national_template_columns is None:
                 self.load_templates()
 
-            # 读取上传文件的第一张表
-            df_uploaded = pd.read_excel(file_path, sheet_name=0)
-            # 去除列名中的空格
-            uploaded_columns = [str(col).strip() for col in df_uploaded.columns]
-
-            # 比对列名（使用集合检查缺失和多余）
-            template_set = set(self.national_template_columns)
-            uploaded_set = set(uploaded_columns)
-
-            missing_columns = list(template_set - uploaded_set)
-            extra_columns = list(uploaded_set - template_set)
-
-            # 检查列顺序并生成详细信息
-            order_mismatch = False
-            column_details = []
-
-            if len(missing_columns) == 0 and len(extra_columns) == 0:
-                order_mismatch = uploaded_columns != self.national_template_columns
-
-                if order_mismatch:
-                    # 提供每列的详细对比信息
-                    for i, (expected, actual) in enumerate(zip(self.national_template_columns, uploaded_columns)):
-                        col_letter = chr(65 + i)  # A, B, C...
-                        if expected != actual:
-                            column_details.append({
-                                'position': f'{col_letter}列',
-                                'expected': expected,
-                                'actual': actual
-                            })
-            else:
-                # 如果有缺失或多余的列，提供位置信息
-                max_len = max(len(self.national_template_columns), len(uploaded_columns))
-                for i in range(max_len):
-                    col_letter = chr(65 + i) if i < 26 else f'{chr(65 + i//26 - 1)}{chr(65 + i%26)}'
-                    expected = self.national_template_columns[i] if i < len(self.national_template_columns) else '(无)'
-                    actual = uploaded_columns[i] if i < len(uploaded_columns) else '(无)'
-                    if expected != actual:
-                        column_details.append({
-                            'position': f'{col_letter}列',
-                            'expected': expected,
-                            'actual': actual
-                        })
-
-            is_valid = (len(missing_columns) == 0 and
-                       len(extra_columns) == 0 and
-                       not order_mismatch)
-
-            result = {
-                'valid': is_valid,
-                'missing_columns': missing_columns,
-                'extra_columns': extra_columns,
-                'order_mismatch': order_mismatch,
-                'column_details': column_details
-            }
-
-            if is_valid:
-                logger.info(f"全国库文件校验通过: {file_path}")
-            else:
-                error_details = []
-                if missing_columns:
-                    error_details.append(f"缺失列: {missing_columns}")
-                if extra_columns:
-                    error_details.append(f"多余列: {extra_columns}")
-                if order_mismatch:
-                    error_details.append("列顺序不匹配")
-                logger.warning(
-                    f"全国库文件校验失败: {', '.join(error_details)}"
-                )
-
-            return result
+            return self._validate(
+                file_path,
+                self.national_template_columns,
+                self.national_template_fingerprint,
+                '全国库',
+                sheet_name=sheet_name
+            )
 
         except Exception as e:
             logger.error(f"校验全国库文件失败: {e}")
@@ -275,6 +328,31 @@ class TemplateValidator:
                 'error': str(e)
             }
 
+    def validate_columns(self, columns, kind, source=''):
+        """
+        按已读取的表头列名校验（如分块上传尚未完成时从已接收部分读出的表头）
+
+        Args:
+            columns: 去除首尾空格后的列名列表
+            kind: 模板类型（local / national）
+            source: 日志中使用的文件描述
+
+        Returns:
+            dict: 校验结果，结构同 validate_local_template
+        """
+        if self.local_template_columns is None:
+            self.load_templates()
+
+        if kind == 'local':
+            return self._check_columns(
+                columns, self.local_template_columns, self.local_template_fingerprint,
+                '单机库', source
+            )
+        return self._check_columns(
+            columns, self.national_template_columns, self.national_template_fingerprint,
+            '全国库', source
+        )
+
 
 # 创建全局验证器实例（将在 app 启动时初始化）
 validator = None
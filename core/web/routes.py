@@ -2,16 +2,22 @@
 Web 路由定义
 """
 import os
-import pandas as pd
-import pickle
+import uuid
 import logging
+from contextlib import nullcontext
+from datetime import datetime
 from flask import (
     render_template, request, jsonify, session,
     redirect, url_for, send_file
 )
 from werkzeug.exceptions import RequestEntityTooLarge
 
-from core import file_handler, validator, comparison, exporter
+from core import (
+    file_handler, validator, comparison, exporter, jobs,
+    result_query, result_store, result_cache, metrics, profiling,
+    external_compare, storage, admission, reconciliation, template_registry, ingest,
+    excel_reader, chunked_upload, xlsx_stream
+)
 
 # 配置日志
 logging.basicConfig(
@@ -21,11 +27,403 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def remove_upload_files(*paths):
+    """清理上传的临时文件及解析缓存"""
+    try:
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+    except Exception as e:
+        logger.warning(f"清理临时文件失败: {e}")
+
+
+def run_compare_job(progress, session_dir, local_file, national_file,
+                    local_frame=None, national_frame=None,
+                    cache=None, cache_key=None, reference_date=None,
+                    compact=False, profile=False, compare_mode='memory',
+                    external_min_rows=None,
+                    chunk_rows=external_compare.DEFAULT_CHUNK_ROWS,
+                    duplicate_policy=None, scratch_dir=None, ticket=None,
+                    national_sheets=None):
+    """
+    后台比对任务：读取数据、执行比对并保存结果
+
+    Args:
+        progress: 阶段回调（由 JobManager 提供）
+        session_dir: 会话目录
+        local_file: 单机库上传文件路径
+        national_file: 全国库上传文件路径
+        local_frame: 单机库解析缓存路径（可选）
+        national_frame: 全国库解析缓存路径（可选）
+        cache: 结果缓存（可选）
+        cache_key: 结果缓存键（可选）
+        reference_date: 党龄/年龄计算基准日期（可选）
+        compact: 重新解析 Excel 时是否转换为紧凑类型
+        profile: 是否对本次比对进行性能剖析（结果写入会话目录）
+        compare_mode: 比对方式 'memory'、'external' 或 'auto'
+        external_min_rows: auto 时使用外部排序比对的最小合计行数
+        chunk_rows: 外部排序比对每块行数
+        duplicate_policy: 身份证号重复时的处理方式（见 ComparisonEngine）
+        scratch_dir: 外部排序比对临时文件目录（默认与结果目录相邻）
+        ticket: 准入控制的任务凭据（可选），执行前等待节点运行槽
+        national_sheets: 没有解析缓存时读取的全国库工作表 [(索引, 名称), ...]（默认第一张）
+    """
+    if ticket is not None:
+        ticket.wait(check=lambda: progress('admission'))
+
+    try:
+        profiler = profiling.profile(session_dir, 'compare') if profile else nullcontext()
+        with profiler:
+            if external_compare.use_external(
+                compare_mode, external_min_rows, local_frame, national_frame
+            ):
+                _compare_external(
+                    progress, session_dir, local_file, national_file,
+                    local_frame, national_frame, reference_date, chunk_rows, duplicate_policy,
+                    scratch_dir, national_sheets
+                )
+            else:
+                _compare_and_save(
+                    progress, session_dir, local_file, national_file,
+                    local_frame, national_frame, reference_date, compact, duplicate_policy,
+                    national_sheets
+                )
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+    # 比对完成后立即在后台预生成 Excel 报告（导出同样受准入控制，但不会因队列已满被拒绝）
+    results_dir = os.path.join(session_dir, 'results')
+    export_ticket = None
+    if ticket is not None:
+        export_ticket = ticket.controller.enqueue(
+            admission.estimate_export_memory(export_rows(result_store.ResultStore(results_dir))),
+            kind='export',
+            force=True
+        )
+    jobs.get_job_manager().submit(
+        os.path.join(session_dir, 'jobs'),
+        run_export_job,
+        results_dir,
+        cache,
+        cache_key,
+        export_ticket,
+        on_finish=export_ticket.release if export_ticket is not None else None
+    )
+
+
+def _compare_and_save(progress, session_dir, local_file, national_file,
+                      local_frame, national_frame, reference_date, compact, duplicate_policy,
+                      national_sheets):
+    """读取数据、执行比对并保存结果（参数见 run_compare_job）"""
+    # 读取校验时缓存的解析结果，缺失时回退为重新解析 Excel
+    progress('read')
+    with metrics.track_phase('read') as record:
+        if local_frame and os.path.exists(local_frame):
+            local_source = local_frame
+            df_local = file_handler.load_parsed_frame(local_frame)
+        else:
+            local_source = local_file
+            df_local = file_handler.read_roster(local_file, compact=compact)
+
+        if national_frame and os.path.exists(national_frame):
+            national_source = national_frame
+            df_national = file_handler.load_parsed_frame(national_frame)
+        else:
+            national_source = national_file
+            df_national = ingest.read_sheets(
+                national_file, national_sheets or [(0, None)], compact=compact
+            )
+
+        record['rows'] = len(df_local) + len(df_national)
+        record['bytes_read'] = metrics.file_size(local_source, national_source)
+
+    # 执行比对
+    engine = comparison.ComparisonEngine(df_local, df_national, reference_date, duplicate_policy)
+    results = engine.generate_report(progress=progress)
+
+    # 按分区保存比对结果
+    progress('save')
+    results_dir = os.path.join(session_dir, 'results')
+    with metrics.track_phase('save', rows=len(df_local) + len(df_national)):
+        result_store.ResultStore.save(results, results_dir)
+
+    remove_upload_files(local_file, national_file, local_frame, national_frame)
+
+
+def _compare_external(progress, session_dir, local_file, national_file,
+                      local_frame, national_frame, reference_date, chunk_rows,
+                      duplicate_policy, scratch_dir, national_sheets):
+    """以外部排序方式分块比对并保存结果（参数见 run_compare_job）"""
+    local_source = local_frame if local_frame and os.path.exists(local_frame) else local_file
+    national_source = (
+        national_frame if national_frame and os.path.exists(national_frame) else national_file
+    )
+
+    logger.info(f"使用外部排序比对，每块 {chunk_rows} 行")
+    external_compare.compare_files(
+        local_source,
+        national_source,
+        os.path.join(session_dir, 'results'),
+        reference_date=reference_date,
+        chunk_rows=chunk_rows,
+        progress=progress,
+        duplicate_policy=duplicate_policy,
+        work_dir=scratch_dir,
+        national_sheets=national_sheets
+    )
+
+    remove_upload_files(local_file, national_file, local_frame, national_frame)
+
+
+def export_rows(store):
+    """
+    计算 Excel 报告包含的总行数
+
+    Args:
+        store: ResultStore 实例
+
+    Returns:
+        int: 行数
+    """
+    summary = store.summary()
+    return sum(summary.get(section, 0) for section in exporter.EXPORT_SECTIONS)
+
+
+def write_report_artifact(store):
+    """
+    根据结果存储生成 Excel 报告并保存在结果目录中
+
+    Args:
+        store: ResultStore 实例
+
+    Returns:
+        str: 报告文件路径
+    """
+    with metrics.track_phase('export', rows=export_rows(store)):
+        return exporter.write_report(
+            store.load_many(exporter.EXPORT_SECTIONS),
+            store.artifact_path(exporter.REPORT_FILENAME)
+        )
+
+
+def run_export_job(progress, results_dir, cache=None, cache_key=None, ticket=None):
+    """
+    后台导出任务：预生成 Excel 报告，并将结果（含报告）写入缓存
+
+    Args:
+        progress: 阶段回调（由 JobManager 提供）
+        results_dir: 会话结果目录
+        cache: 结果缓存（可选）
+        cache_key: 结果缓存键（可选）
+        ticket: 准入控制的任务凭据（可选），执行前等待节点运行槽
+    """
+    if ticket is not None:
+        ticket.wait(check=lambda: progress('admission'))
+
+    try:
+        progress('export')
+        write_report_artifact(result_store.ResultStore(results_dir))
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+    if cache is not None and cache_key:
+        cache.put(cache_key, results_dir)
+
+
+def run_reconcile_job(progress, paths, names, report_path, registry=None, ticket=None):
+    """
+    后台多名册核对任务：读取名册、执行核对并写出报告
+
+    Args:
+        progress: 阶段回调（由 JobManager 提供）
+        paths: 上传的名册文件路径列表（完成后删除）
+        names: 原始文件名列表（识别名册类型和报告中使用）
+        report_path: 报告文件路径
+        registry: 模板注册表（可选）
+        ticket: 准入控制的任务凭据（可选），执行前等待节点运行槽
+    """
+    try:
+        if ticket is not None:
+            ticket.wait(check=lambda: progress('admission'))
+
+        progress('reconcile')
+        with metrics.track_phase('reconcile') as record:
+            results = reconciliation.reconcile_files(paths, report_path, names=names, registry=registry)
+            record['rows'] = int(results['rosters']['行数'].sum())
+            record['bytes_read'] = sum(metrics.file_size(path) for path in paths)
+    finally:
+        if ticket is not None:
+            ticket.release()
+        remove_upload_files(*paths)
+
+
+def busy_response(error):
+    """
+    节点繁忙时的 429 响应
+
+    Args:
+        error: AdmissionRejected 异常
+
+    Returns:
+        Response: 带 Retry-After 头的 JSON 响应
+    """
+    response = jsonify({
+        'success': False,
+        'error': f'{error}，请约 {error.retry_after} 秒后重试',
+        'retry_after': error.retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def validation_error_message(validation_result, misfiled=None):
+    """
+    模板校验失败时返回给前端的错误信息
+
+    Args:
+        validation_result: TemplateValidator 的校验结果
+        misfiled: 上传位置错误时的提示（见 template_registry.describe_mismatch）
+
+    Returns:
+        str: 错误信息
+    """
+    if 'error' in validation_result:
+        return validation_result['error']
+
+    error_msg = '上传表格格式不正确'
+
+    # 添加详细的列位置信息
+    if validation_result.get('column_details'):
+        details = validation_result['column_details']
+        error_msg += '：'
+        detail_msgs = []
+        for detail in details[:5]:  # 最多显示前5个差异
+            detail_msgs.append(
+                f"{detail['position']}应为'{detail['expected']}'，实际为'{detail['actual']}'"
+            )
+        error_msg += '；'.join(detail_msgs)
+        if len(details) > 5:
+            error_msg += f'；等共{len(details)}处差异'
+    elif validation_result.get('order_mismatch'):
+        error_msg += "，列顺序不匹配"
+    elif 'missing_columns' in validation_result and validation_result['missing_columns']:
+        error_msg += f"，缺少列: {', '.join(validation_result['missing_columns'])}"
+
+    if validation_result.get('sheet_name'):
+        # 多工作表导出中某张名册的表头有误
+        return f"工作表“{validation_result['sheet_name']}”{error_msg}"
+    if misfiled:
+        return misfiled
+    return error_msg
+
+
 def register_routes(app):
     """注册所有路由到 Flask 应用"""
 
-    # 在应用启动时初始化模板校验器
+    # 在应用启动时初始化模板校验器和后台任务管理器
+    excel_reader.init_reader(app.config['EXCEL_ENGINE'])
     validator.init_validator(app.config['TEMPLATES_FOLDER'])
+    template_registry.init_registry(app.config['TEMPLATES_FOLDER'])
+    registry = template_registry.get_registry()
+    jobs.init_job_manager(app.config['COMPARE_MAX_WORKERS'])
+    storage.init_storage(
+        app.config['STORAGE_BACKEND'],
+        app.config['UPLOAD_FOLDER'],
+        app.config['SCRATCH_FOLDER']
+    )
+    backend = storage.get_storage()
+
+    # 共享存储时各节点必须使用相同的密钥，才能识别其他节点签发的 session
+    if backend.shared and not os.environ.get('SECRET_KEY'):
+        raise RuntimeError('共享存储部署必须设置 SECRET_KEY 环境变量')
+
+    # 分块上传的每一块是一次请求，不能超过单次请求上限
+    if not 0 < app.config['UPLOAD_CHUNK_SIZE'] <= app.config['MAX_CONTENT_LENGTH']:
+        raise RuntimeError(
+            f"UPLOAD_CHUNK_SIZE（{app.config['UPLOAD_CHUNK_SIZE']} 字节）必须大于 0 且不超过"
+            f"单次请求上限 MAX_CONTENT_LENGTH（{app.config['MAX_CONTENT_LENGTH']} 字节）"
+        )
+
+    # 节点级准入控制（状态保存在本机目录，对节点上所有 worker 进程生效）
+    admission.init_admission_controller(
+        admission.default_state_dir(app.config['SCRATCH_FOLDER']),
+        app.config['ADMISSION_MAX_RUNNING'],
+        app.config['ADMISSION_QUEUE_SIZE'],
+        app.config['ADMISSION_MEMORY_BUDGET'],
+        app.config['ADMISSION_RETRY_AFTER']
+    )
+    controller = admission.get_admission_controller()
+    metrics.register_admission(controller)
+
+    # 跨会话的比对结果缓存
+    cache = result_cache.ResultCache(
+        backend.cache_dir(),
+        app.config['RESULT_CACHE_MAX_BYTES']
+    )
+
+    def session_file(key):
+        """将 session 中保存的文件引用转换为本节点的路径"""
+        return backend.from_ref(session.get(key))
+
+    def classify_upload(filepath):
+        """识别上传文件各工作表的名册类型，文件无法读取时返回空列表（由模板校验报告错误）"""
+        try:
+            return registry.classify(filepath)
+        except Exception as e:
+            logger.warning(f"识别上传文件类型失败: {e}")
+            return []
+
+    def clear_upload_session(kind):
+        """清除 session 中某个名册的上传记录"""
+        for key in ('file', 'frame', 'digest', 'sheets'):
+            session.pop(f'{kind}_{key}', None)
+
+    def check_upload_head(upload):
+        """
+        分块上传尚未完成时检查 .xlsx 第一张工作表的表头
+
+        只在能确定上传完成后校验也会失败时拒绝：
+        - 单机库：第一行与模板不一致（表头文字尚未到达时按列数判断）
+        - 全国库：第一张工作表不是任何已知名册，且含身份证号码列但表头与
+          全国库模板不一致（与 ingest.plan_sheets 的判断相同）
+
+        Args:
+            upload: ChunkedUpload
+
+        Returns:
+            tuple: (校验结果, 工作表识别结果)，已接收的数据还不足以判断时返回 None；
+                   校验结果 valid 为 True 表示不再需要提前检查
+        """
+        val = validator.get_validator()
+        rows = xlsx_stream.read_head(upload.data_path, nrows=template_registry.HEADER_SEARCH_ROWS)
+
+        if rows is None:
+            # 表头引用的共享字符串尚未到达：单机库先按列数判断
+            width = xlsx_stream.header_width(upload.data_path)
+            if upload.kind == 'local' and width is not None and width != len(val.local_template_columns):
+                return {
+                    'valid': False,
+                    'error': f'上传表格格式不正确：表头共 {width} 列，模板为 {len(val.local_template_columns)} 列'
+                }, []
+            return None
+
+        if not rows or not any(value not in (None, '') for value in rows[0]):
+            # 第一行为空时表头位置不确定，留给上传完成后的校验
+            return {'valid': True}, []
+
+        key, header_row = registry.match_rows(rows)
+        matches = [{'type': key, 'label': registry.label(key) if key else None}]
+        columns = template_registry.normalize_header(rows[0])
+        result = val.validate_columns(columns, upload.kind, upload.filename)
+
+        if upload.kind == 'national' and not result['valid']:
+            if key is not None or ingest.ROSTER_ID_COLUMN in result.get('missing_columns', []):
+                # 可能是封面或其他名册，后续工作表中仍可能有全国库名册
+                return {'valid': True}, matches
+        return result, matches
 
     @app.route('/')
     def index():
@@ -37,7 +435,123 @@ def register_routes(app):
 
         return render_template('index.html')
 
+    def accept_local(filepath, digest):
+        """
+        校验已保存的单机库文件，通过时缓存解析结果并记录到 session
+
+        Args:
+            filepath: 已保存的上传文件路径
+            digest: 文件内容 SHA-256
+
+        Returns:
+            Response: 上传结果 JSON 响应
+        """
+        # 校验模板
+        val = validator.get_validator()
+        with metrics.track_phase('validate'):
+            validation_result = val.validate_local_template(filepath)
+
+        if validation_result['valid']:
+            session['local_file'] = backend.to_ref(filepath)
+            session['local_digest'] = digest
+            # 缓存解析结果，比对时不再重复解析 Excel
+            with metrics.track_phase('parse') as record:
+                df = file_handler.read_roster(
+                    filepath, compact=app.config['COMPACT_DTYPES']
+                )
+                session['local_frame'] = backend.to_ref(
+                    file_handler.save_parsed_frame(df, filepath)
+                )
+                record['rows'] = len(df)
+                record['bytes_read'] = metrics.file_size(filepath)
+            return jsonify({
+                'success': True,
+                'valid': True,
+                'message': '文件上传成功，格式校验通过'
+            })
+        else:
+            # 校验失败时识别文件类型，上传位置错误时直接提示
+            misfiled = template_registry.describe_mismatch(classify_upload(filepath), 'local')
+
+            # 校验失败，删除文件并清除session
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            clear_upload_session('local')
+            error_msg = validation_error_message(validation_result, misfiled)
+
+            return jsonify({
+                'success': True,
+                'valid': False,
+                'error': error_msg,
+                'column_details': validation_result.get('column_details', [])
+            })
+
+    def accept_national(filepath, digest):
+        """
+        校验已保存的全国库文件，通过时缓存解析结果并记录到 session
+
+        Args:
+            filepath: 已保存的上传文件路径
+            digest: 文件内容 SHA-256
+
+        Returns:
+            Response: 上传结果 JSON 响应
+        """
+        # 校验模板：多工作表的导出文件按表头找出所有全国库工作表，找不到时校验第一张
+        val = validator.get_validator()
+        with metrics.track_phase('validate'):
+            matches = classify_upload(filepath)
+            national_sheets, validation_result = ingest.plan_sheets(
+                matches,
+                lambda sheet: val.validate_national_template(filepath, sheet_name=sheet)
+            )
+
+        if validation_result['valid']:
+            session['national_file'] = backend.to_ref(filepath)
+            session['national_digest'] = digest
+            session['national_sheets'] = national_sheets
+            # 缓存解析结果，比对时不再重复解析 Excel
+            with metrics.track_phase('parse') as record:
+                df = ingest.read_sheets(
+                    filepath,
+                    national_sheets,
+                    compact=app.config['COMPACT_DTYPES'],
+                    max_workers=app.config['INGEST_MAX_WORKERS']
+                )
+                session['national_frame'] = backend.to_ref(
+                    file_handler.save_parsed_frame(df, filepath)
+                )
+                record['rows'] = len(df)
+                record['bytes_read'] = metrics.file_size(filepath)
+
+            message = '文件上传成功，格式校验通过'
+            if len(national_sheets) > 1:
+                message += f'（合并 {len(national_sheets)} 张工作表，共 {len(df)} 行）'
+            elif national_sheets[0][0] != 0:
+                message += f"（使用工作表“{national_sheets[0][1]}”）"
+            return jsonify({
+                'success': True,
+                'valid': True,
+                'message': message
+            })
+        else:
+            misfiled = template_registry.describe_mismatch(matches, 'national')
+
+            # 校验失败，删除文件并清除session
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            clear_upload_session('national')
+            error_msg = validation_error_message(validation_result, misfiled)
+
+            return jsonify({
+                'success': True,
+                'valid': False,
+                'error': error_msg,
+                'column_details': validation_result.get('column_details', [])
+            })
+
     @app.route('/upload/local', methods=['POST'])
+    @metrics.track_request('upload_local')
     def upload_local():
         """处理单机库文件上传和校验"""
         try:
@@ -62,68 +576,25 @@ def register_routes(app):
                 session_id = file_handler.get_session_id()
                 session['session_id'] = session_id
 
-            session_dir = file_handler.create_session_directory(
-                app.config['UPLOAD_FOLDER'],
-                session_id
-            )
+            session_dir = backend.session_dir(session_id, create=True)
 
             # 保存文件
-            filepath = file_handler.save_uploaded_file(file, session_dir, 'local.xls')
-
-            # 校验模板
-            val = validator.get_validator()
-            validation_result = val.validate_local_template(filepath)
-
-            if validation_result['valid']:
-                session['local_file'] = filepath
-                return jsonify({
-                    'success': True,
-                    'valid': True,
-                    'message': '文件上传成功，格式校验通过'
-                })
-            else:
-                # 校验失败，删除文件并清除session
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                session.pop('local_file', None)  # 清除session中的文件路径
-                error_msg = '上传表格格式不正确'
-
-                # 添加详细的列位置信息
-                if validation_result.get('column_details'):
-                    details = validation_result['column_details']
-                    error_msg += '：'
-                    detail_msgs = []
-                    for detail in details[:5]:  # 最多显示前5个差异
-                        detail_msgs.append(
-                            f"{detail['position']}应为'{detail['expected']}'，实际为'{detail['actual']}'"
-                        )
-                    error_msg += '；'.join(detail_msgs)
-                    if len(details) > 5:
-                        error_msg += f'；等共{len(details)}处差异'
-                elif validation_result.get('order_mismatch'):
-                    error_msg += "，列顺序不匹配"
-                elif 'missing_columns' in validation_result and validation_result['missing_columns']:
-                    error_msg += f"，缺少列: {', '.join(validation_result['missing_columns'])}"
-
-                if 'error' in validation_result:
-                    error_msg = validation_result['error']
+            with metrics.track_phase('upload') as record:
+                filepath, digest = file_handler.save_uploaded_file(file, session_dir, 'local.xls')
+                record['bytes_read'] = metrics.file_size(filepath)
 
-                return jsonify({
-                    'success': True,
-                    'valid': False,
-                    'error': error_msg,
-                    'column_details': validation_result.get('column_details', [])
-                })
+            return accept_local(filepath, digest)
 
         except ValueError as e:
-            session.pop('local_file', None)  # 清除session
+            clear_upload_session('local')
             return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
-            session.pop('local_file', None)  # 清除session
+            clear_upload_session('local')
             logger.error(f"上传单机库文件失败: {e}")
             return jsonify({'success': False, 'error': '文件上传失败'}), 500
 
     @app.route('/upload/national', methods=['POST'])
+    @metrics.track_request('upload_national')
     def upload_national():
         """处理全国库文件上传和校验"""
         try:
@@ -147,74 +618,169 @@ def register_routes(app):
                 session_id = file_handler.get_session_id()
                 session['session_id'] = session_id
 
-            session_dir = file_handler.create_session_directory(
-                app.config['UPLOAD_FOLDER'],
-                session_id
-            )
+            session_dir = backend.session_dir(session_id, create=True)
 
             # 保存文件
-            filepath = file_handler.save_uploaded_file(file, session_dir, 'national.xls')
+            with metrics.track_phase('upload') as record:
+                filepath, digest = file_handler.save_uploaded_file(file, session_dir, 'national.xls')
+                record['bytes_read'] = metrics.file_size(filepath)
+
+            return accept_national(filepath, digest)
+
+        except ValueError as e:
+            clear_upload_session('national')
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            clear_upload_session('national')
+            logger.error(f"上传全国库文件失败: {e}")
+            return jsonify({'success': False, 'error': '文件上传失败'}), 500
+
+    @app.route('/upload/<kind>/chunked', methods=['POST'])
+    @metrics.track_request('upload_chunked')
+    def start_chunked_upload(kind):
+        """
+        创建分块上传
+
+        请求体 JSON：{"filename": 原始文件名, "size": 文件大小}
+        返回上传 ID 和分块大小；之后按顺序 PUT /upload/chunked/<上传 ID>。
+        kind 为 local / national（比对）或 reconcile（多名册核对的一个名册）
+        """
+        try:
+            if kind not in ('local', 'national', 'reconcile'):
+                return jsonify({'success': False, 'error': '未知的名册类型'}), 404
 
-            # 校验模板
-            val = validator.get_validator()
-            validation_result = val.validate_national_template(filepath)
+            data = request.get_json(silent=True) or {}
 
-            if validation_result['valid']:
-                session['national_file'] = filepath
+            session_id = session.get('session_id')
+            if not session_id:
+                session_id = file_handler.get_session_id()
+                session['session_id'] = session_id
+
+            upload = chunked_upload.ChunkedUpload.create(
+                backend.chunked_dir(session_id),
+                kind,
+                data.get('filename'),
+                data.get('size'),
+                app.config['UPLOAD_MAX_SIZE']
+            )
+            return jsonify({
+                'success': True,
+                'upload_id': upload.upload_id,
+                'offset': 0,
+                'chunk_size': app.config['UPLOAD_CHUNK_SIZE']
+            })
+
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"创建分块上传失败: {e}")
+            return jsonify({'success': False, 'error': '文件上传失败'}), 500
+
+    def open_chunked_upload(upload_id):
+        """打开当前会话的分块上传，不存在时返回 None"""
+        session_id = session.get('session_id')
+        if not session_id:
+            return None
+        return chunked_upload.ChunkedUpload.open(backend.chunked_dir(session_id), upload_id)
+
+    @app.route('/upload/chunked/<upload_id>', methods=['GET'])
+    def chunked_upload_status(upload_id):
+        """查询分块上传已接收的字节数（断点续传）"""
+        upload = open_chunked_upload(upload_id)
+        if upload is None:
+            return jsonify({'success': False, 'error': '上传不存在或已过期，请重新上传'}), 404
+        return jsonify({
+            'success': True,
+            'offset': upload.offset,
+            'size': upload.size,
+            'chunk_size': app.config['UPLOAD_CHUNK_SIZE']
+        })
+
+    @app.route('/upload/chunked/<upload_id>', methods=['PUT'])
+    @metrics.track_request('upload_chunk')
+    def upload_chunk(upload_id):
+        """
+        上传一块数据
+
+        请求头 Upload-Offset 为该块在文件中的起始位置，请求体为原始字节。
+        .xlsx 文件在第一张工作表的表头到达后即检查，确定不符合模板时立即
+        返回校验失败并删除已接收的数据；最后一块到达后按普通上传校验和解析。
+        多名册核对的名册没有固定模板，上传完成后保存待核对，返回上传 ID。
+        """
+        upload = None
+        try:
+            upload = open_chunked_upload(upload_id)
+            if upload is None:
+                return jsonify({'success': False, 'error': '上传不存在或已过期，请重新上传'}), 404
+
+            offset = request.headers.get('Upload-Offset', type=int)
+            if offset is None:
+                return jsonify({'success': False, 'error': '缺少 Upload-Offset 请求头'}), 400
+
+            with metrics.track_phase('upload') as record:
+                received = upload.append(request.stream, offset)
+                record['bytes_read'] = received - offset
+
+            if received < upload.size:
+                if upload.kind != 'reconcile' and upload.is_xlsx and not upload.meta['header_checked']:
+                    checked = check_upload_head(upload)
+                    if checked is not None:
+                        result, matches = checked
+                        if not result['valid']:
+                            upload.discard()
+                            clear_upload_session(upload.kind)
+                            logger.info(f"分块上传 {upload_id} 表头校验失败，已提前终止")
+                            return jsonify({
+                                'success': True,
+                                'valid': False,
+                                'complete': False,
+                                'error': validation_error_message(
+                                    result, template_registry.describe_mismatch(matches, upload.kind)
+                                ),
+                                'column_details': result.get('column_details', [])
+                            })
+                        upload.meta['header_checked'] = True
+                        upload.save_meta()
+
+                return jsonify({'success': True, 'complete': False, 'offset': received})
+
+            if upload.kind == 'reconcile':
+                upload.finish(reconcile_upload_path(upload_id, upload.filename))
                 return jsonify({
                     'success': True,
                     'valid': True,
-                    'message': '文件上传成功，格式校验通过'
+                    'upload_id': upload_id,
+                    'message': '文件上传成功'
                 })
-            else:
-                # 校验失败，删除文件并清除session
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                session.pop('national_file', None)  # 清除session中的文件路径
-                error_msg = '上传表格格式不正确'
-
-                # 添加详细的列位置信息
-                if validation_result.get('column_details'):
-                    details = validation_result['column_details']
-                    error_msg += '：'
-                    detail_msgs = []
-                    for detail in details[:5]:  # 最多显示前5个差异
-                        detail_msgs.append(
-                            f"{detail['position']}应为'{detail['expected']}'，实际为'{detail['actual']}'"
-                        )
-                    error_msg += '；'.join(detail_msgs)
-                    if len(details) > 5:
-                        error_msg += f'；等共{len(details)}处差异'
-                elif validation_result.get('order_mismatch'):
-                    error_msg += "，列顺序不匹配"
-                elif 'missing_columns' in validation_result and validation_result['missing_columns']:
-                    error_msg += f"，缺少列: {', '.join(validation_result['missing_columns'])}"
-
-                if 'error' in validation_result:
-                    error_msg = validation_result['error']
 
-                return jsonify({
-                    'success': True,
-                    'valid': False,
-                    'error': error_msg,
-                    'column_details': validation_result.get('column_details', [])
-                })
+            session_dir = backend.session_dir(session['session_id'], create=True)
+            filepath = os.path.join(session_dir, f'{upload.kind}.xls')
+            digest = upload.finish(filepath)
+            if upload.kind == 'local':
+                return accept_local(filepath, digest)
+            return accept_national(filepath, digest)
 
+        except chunked_upload.UploadOffsetMismatch as e:
+            return jsonify({'success': False, 'error': str(e), 'offset': e.offset}), 409
         except ValueError as e:
-            session.pop('national_file', None)  # 清除session
+            if upload is not None:
+                upload.discard()
+                clear_upload_session(upload.kind)
             return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
-            session.pop('national_file', None)  # 清除session
-            logger.error(f"上传全国库文件失败: {e}")
+            if upload is not None:
+                clear_upload_session(upload.kind)
+            logger.error(f"分块上传失败: {e}")
             return jsonify({'success': False, 'error': '文件上传失败'}), 500
 
     @app.route('/compare', methods=['POST'])
+    @metrics.track_request('compare')
     def compare():
-        """执行比对"""
+        """提交比对任务，返回任务 ID"""
         try:
             # 检查是否已上传两个文件
-            local_file = session.get('local_file')
-            national_file = session.get('national_file')
+            local_file = session_file('local_file')
+            national_file = session_file('national_file')
 
             if not local_file or not national_file:
                 return jsonify({
@@ -237,170 +803,339 @@ def register_routes(app):
                     'error': '全国库文件不存在，请重新上传'
                 }), 400
 
-            # 读取文件
-            df_local = pd.read_excel(local_file)
-            df_national = pd.read_excel(national_file, sheet_name=0)
-
-            # 执行比对
-            engine = comparison.ComparisonEngine(df_local, df_national)
-            results = engine.generate_report()
-
             # 获取会话目录
             session_id = session.get('session_id')
-            if not session_id:
+            if not storage.is_valid_session_id(session_id):
                 return jsonify({'success': False, 'error': '会话无效'}), 400
 
-            session_dir = os.path.join(
-                app.config['UPLOAD_FOLDER'],
-                session_id
+            session_dir = backend.session_dir(session_id)
+            local_frame = session_file('local_frame')
+            national_frame = session_file('national_frame')
+
+            # 新任务开始前清除旧结果标志
+            session.pop('has_results', None)
+
+            # 相同输入的比对直接复用缓存结果
+            cache_key = None
+            if session.get('local_digest') and session.get('national_digest'):
+                cache_key = result_cache.make_cache_key(
+                    session['local_digest'],
+                    session['national_digest'],
+                    comparison.ComparisonEngine.ENGINE_VERSION,
+                    app.config['REFERENCE_DATE'],
+                    app.config['DUPLICATE_ID_POLICY'],
+                    excel_reader.engine_signature()
+                )
+
+            if cache_key and cache.get(cache_key, backend.results_dir(session_id)):
+                remove_upload_files(local_file, national_file, local_frame, national_frame)
+                session['has_results'] = True
+                session.modified = True
+                return jsonify({'success': True, 'cached': True})
+
+            # 按行数/文件大小估算内存，节点等待队列已满时返回 429
+            external = external_compare.use_external(
+                app.config['COMPARE_MODE'],
+                app.config['EXTERNAL_COMPARE_MIN_ROWS'],
+                local_frame,
+                national_frame
             )
+            ticket = controller.enqueue(admission.estimate_compare_memory(
+                local_frame if local_frame and os.path.exists(local_frame) else local_file,
+                national_frame if national_frame and os.path.exists(national_frame) else national_file,
+                external,
+                app.config['EXTERNAL_CHUNK_ROWS']
+            ))
 
-            # 将比对结果保存到pickle文件
-            results_file = os.path.join(session_dir, 'results.pkl')
-            with open(results_file, 'wb') as f:
-                pickle.dump(results, f)
+            try:
+                job_id = jobs.get_job_manager().submit(
+                    backend.jobs_dir(session_id),
+                    run_compare_job,
+                    session_dir,
+                    local_file,
+                    national_file,
+                    local_frame,
+                    national_frame,
+                    cache,
+                    cache_key,
+                    app.config['REFERENCE_DATE'],
+                    app.config['COMPACT_DTYPES'],
+                    profiling.is_requested(),
+                    app.config['COMPARE_MODE'],
+                    app.config['EXTERNAL_COMPARE_MIN_ROWS'],
+                    app.config['EXTERNAL_CHUNK_ROWS'],
+                    app.config['DUPLICATE_ID_POLICY'],
+                    backend.scratch_dir(session_id),
+                    ticket,
+                    session.get('national_sheets'),
+                    on_finish=ticket.release
+                )
+            except Exception:
+                ticket.release()
+                raise
+
+            return jsonify({'success': True, 'job_id': job_id}), 202
+
+        except admission.AdmissionRejected as e:
+            return busy_response(e)
+        except Exception as e:
+            logger.error(f"提交比对任务失败: {e}")
+            return jsonify({'success': False, 'error': f'比对失败: {str(e)}'}), 500
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        """查询比对任务状态"""
+        session_id = session.get('session_id')
+        if not storage.is_valid_session_id(session_id) or not jobs.is_valid_job_id(job_id):
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+
+        job_dir = backend.jobs_dir(session_id)
+        status = jobs.read_status(job_dir, job_id)
+        if status is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
 
+        if status['status'] == jobs.STATUS_DONE:
             # 在session中只存储标志
             session['has_results'] = True
             session.modified = True
 
-            # 清理上传的临时文件
-            try:
-                if os.path.exists(local_file):
-                    os.remove(local_file)
-                if os.path.exists(national_file):
-                    os.remove(national_file)
-            except Exception as e:
-                logger.warning(f"清理临时文件失败: {e}")
+        return jsonify({'success': True, **status})
 
-            return jsonify({'success': True})
+    @app.route('/jobs/<job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id):
+        """取消比对任务"""
+        session_id = session.get('session_id')
+        if not storage.is_valid_session_id(session_id) or not jobs.is_valid_job_id(job_id):
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
 
-        except Exception as e:
-            logger.error(f"比对失败: {e}")
-            return jsonify({'success': False, 'error': f'比对失败: {str(e)}'}), 500
+        job_dir = backend.jobs_dir(session_id)
+        status = jobs.get_job_manager().cancel(job_dir, job_id)
+        if status is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
 
-    @app.route('/result')
-    def result():
-        """显示比对结果"""
-        # 检查是否有比对结果
+        return jsonify({'success': True, **status})
+
+    def get_session_result_store():
+        """
+        获取当前会话的结果存储
+
+        Returns:
+            ResultStore: 结果存储，无结果时返回 None
+        """
         if not session.get('has_results'):
-            return redirect(url_for('index'))
+            return None
 
-        # 获取会话目录
         session_id = session.get('session_id')
-        if not session_id:
-            return redirect(url_for('index'))
+        if not storage.is_valid_session_id(session_id):
+            return None
 
-        session_dir = os.path.join(
-            app.config['UPLOAD_FOLDER'],
-            session_id
-        )
-        results_file = os.path.join(session_dir, 'results.pkl')
+        results = result_store.ResultStore(backend.results_dir(session_id))
+        return results if results.exists() else None
 
-        # 从pickle文件读取结果
-        if not os.path.exists(results_file):
+    @app.route('/result')
+    def result():
+        """显示比对结果（统计数据只读取 manifest，表格按需分页加载）"""
+        store = get_session_result_store()
+        if store is None:
             return redirect(url_for('index'))
 
-        with open(results_file, 'rb') as f:
-            results = pickle.load(f)
-
-        # 将 DataFrame 转换为 HTML 表格
-        def df_to_html(df):
-            if df is None or (isinstance(df, pd.DataFrame) and df.empty):
-                return '<p class="no-data">暂无数据</p>'
-            if df.empty:
-                return '<p class="no-data">暂无数据</p>'
-            return df.to_html(
-                classes='result-table',
-                index=False,
-                escape=False,
-                na_rep=''
-            )
-
-        # 准备展示数据
-        local_extra_df = results.get('local_extra')
-        national_extra_df = results.get('national_extra')
-
         display_data = {
-            'local_extra': df_to_html(local_extra_df),
-            'local_extra_count': len(local_extra_df) if local_extra_df is not None else 0,
-            'national_extra': df_to_html(national_extra_df),
-            'national_extra_count': len(national_extra_df) if national_extra_df is not None else 0,
+            'local_extra_count': store.count('local_extra'),
+            'national_extra_count': store.count('national_extra'),
+            'local_preprocessed_count': store.count('local_preprocessed'),
+            'national_preprocessed_count': store.count('national_preprocessed'),
+            'invalid_count': store.count('invalid_ids'),
+            'duplicate_count': store.count('duplicate_ids'),
         }
 
         # 字段差异
-        diff_fields = [
-            '姓名', '性别', '民族', '出生日期',
-            '学历', '入党时间', '个人身份', '人员类别'
-        ]
-
-        field_diffs = {}
-        for field in diff_fields:
-            diff_key = f'diff_{field}'
-            df = results.get(diff_key)
-            field_diffs[field] = {
-                'html': df_to_html(df),
-                'count': len(df) if df is not None and not (isinstance(df, pd.DataFrame) and df.empty) else 0
-            }
+        display_data['field_diffs'] = {
+            field: {'count': store.count(f'diff_{field}')}
+            for field in comparison.ComparisonEngine.COMPARE_FIELDS
+        }
 
-        display_data['field_diffs'] = field_diffs
+        return render_template('result.html', data=display_data)
 
-        # 添加预处理数据表
-        local_preprocessed = results.get('local_preprocessed')
-        national_preprocessed = results.get('national_preprocessed')
+    @app.route('/api/results/<section>')
+    def result_section(section):
+        """分页查询比对结果表（支持排序、列筛选和身份证号/姓名搜索）"""
+        if section not in result_query.RESULT_SECTIONS:
+            return jsonify({'success': False, 'error': '结果分区不存在'}), 404
 
-        display_data['local_preprocessed'] = df_to_html(local_preprocessed)
-        display_data['local_preprocessed_count'] = len(local_preprocessed) if local_preprocessed is not None else 0
+        store = get_session_result_store()
+        if store is None:
+            return jsonify({
+                'success': False,
+                'error': '未找到比对结果，请先执行比对'
+            }), 404
 
-        display_data['national_preprocessed'] = df_to_html(national_preprocessed)
-        display_data['national_preprocessed_count'] = len(national_preprocessed) if national_preprocessed is not None else 0
+        try:
+            page = result_query.query_section(
+                store.load(section),
+                page=request.args.get('page', 1, type=int),
+                page_size=request.args.get(
+                    'page_size', result_query.DEFAULT_PAGE_SIZE, type=int
+                ),
+                sort=request.args.get('sort'),
+                order=request.args.get('order', 'asc'),
+                column=request.args.get('column'),
+                value=request.args.get('value'),
+                q=request.args.get('q')
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
-        return render_template('result.html', data=display_data)
+        return jsonify({'success': True, 'section': section, **page})
 
     @app.route('/download')
+    @metrics.track_request('download')
     def download():
         """下载比对结果 Excel 文件"""
         try:
             # 检查是否有比对结果
-            if not session.get('has_results'):
+            store = get_session_result_store()
+            if store is None:
                 return jsonify({
                     'error': '未找到比对结果，请先执行比对'
                 }), 404
 
-            # 获取会话目录
-            session_id = session.get('session_id')
-            if not session_id:
-                return jsonify({'error': '会话无效'}), 400
-
-            session_dir = os.path.join(
-                app.config['UPLOAD_FOLDER'],
-                session_id
-            )
-            results_file = os.path.join(session_dir, 'results.pkl')
-
-            # 从pickle文件读取结果
-            if not os.path.exists(results_file):
-                return jsonify({
-                    'error': '未找到比对结果，请先执行比对'
-                }), 404
+            session_dir = os.path.dirname(store.store_dir)
+            with profiling.request_profiler(session_dir, 'download'):
+                # 优先使用比对完成后预生成的报告，尚未生成时现场生成
+                filepath = store.artifact_path(exporter.REPORT_FILENAME)
+                if not os.path.exists(filepath):
+                    ticket = controller.try_run(
+                        admission.estimate_export_memory(export_rows(store)), kind='export'
+                    )
+                    try:
+                        write_report_artifact(store)
+                    finally:
+                        ticket.release()
+
+                # 发送文件
+                timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+                return send_file(
+                    filepath,
+                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                    as_attachment=True,
+                    download_name=f'比对结果_{timestamp}.xlsx'
+                )
+
+        except admission.AdmissionRejected as e:
+            return busy_response(e)
+        except Exception as e:
+            logger.error(f"下载文件失败: {e}")
+            return jsonify({'error': '下载失败'}), 500
 
-            with open(results_file, 'rb') as f:
-                results = pickle.load(f)
+    def reconcile_upload_path(upload_id, filename):
+        """多名册核对中已上传完成的名册的保存路径"""
+        folder = os.path.join(backend.reconcile_dir(session['session_id']), 'uploads')
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, upload_id + os.path.splitext(filename)[1].lower())
 
-            # 导出到 Excel
-            filepath = exporter.export_to_excel(results, session_dir)
+    def reconcile_jobs_dir():
+        """多名册核对的任务状态目录，会话无效时返回 None"""
+        session_id = session.get('session_id')
+        if not storage.is_valid_session_id(session_id):
+            return None
+        return os.path.join(backend.reconcile_dir(session_id), 'jobs')
+
+    @app.route('/reconcile', methods=['POST'])
+    @metrics.track_request('reconcile')
+    def reconcile():
+        """
+        提交多名册核对任务，返回任务 ID
+
+        各名册先通过分块上传（kind 为 reconcile）上传，不受单次请求大小限制。
+        请求体 JSON：{"files": [{"upload_id": 上传 ID, "filename": 原始文件名}, ...]}
+        """
+        try:
+            files = (request.get_json(silent=True) or {}).get('files') or []
+            if not files:
+                return jsonify({'success': False, 'error': '未选择文件'}), 400
 
-            # 发送文件
-            return send_file(
-                filepath,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=os.path.basename(filepath)
-            )
+            session_id = session.get('session_id')
+            if not storage.is_valid_session_id(session_id):
+                return jsonify({'success': False, 'error': '会话无效'}), 400
 
+            # 上传文件按上传 ID 保存，名册类型按原始文件名识别
+            paths, names = [], []
+            for item in files:
+                upload_id = item.get('upload_id') if isinstance(item, dict) else None
+                filename = os.path.basename(str(item.get('filename') or '')) if upload_id else ''
+                if not chunked_upload.is_valid_upload_id(upload_id) or not file_handler.allowed_file(filename):
+                    return jsonify({'success': False, 'error': '名册文件无效，请重新上传'}), 400
+                filepath = reconcile_upload_path(upload_id, filename)
+                if not os.path.exists(filepath):
+                    return jsonify({'success': False, 'error': f'{filename}不存在，请重新上传'}), 400
+                paths.append(filepath)
+                names.append(filename)
+
+            # 按文件大小估算内存，节点等待队列已满时返回 429
+            ticket = controller.enqueue(admission.estimate_excel_memory(paths), kind='reconcile')
+            try:
+                job_id = str(uuid.uuid4())
+                reports_dir = os.path.join(backend.reconcile_dir(session_id), 'reports')
+                os.makedirs(reports_dir, exist_ok=True)
+                jobs.get_job_manager().submit(
+                    reconcile_jobs_dir(),
+                    run_reconcile_job,
+                    paths,
+                    names,
+                    os.path.join(reports_dir, f'{job_id}.xlsx'),
+                    registry,
+                    ticket,
+                    on_finish=ticket.release,
+                    job_id=job_id
+                )
+            except Exception:
+                ticket.release()
+                raise
+
+            return jsonify({'success': True, 'job_id': job_id}), 202
+
+        except admission.AdmissionRejected as e:
+            return busy_response(e)
         except Exception as e:
-            logger.error(f"下载文件失败: {e}")
-            return jsonify({'error': '下载失败'}), 500
+            logger.error(f"提交多名册核对任务失败: {e}")
+            return jsonify({'success': False, 'error': '多名册核对失败'}), 500
+
+    @app.route('/reconcile/<job_id>')
+    def reconcile_status(job_id):
+        """查询多名册核对任务状态"""
+        job_dir = reconcile_jobs_dir()
+        status = jobs.read_status(job_dir, job_id) if job_dir and jobs.is_valid_job_id(job_id) else None
+        if status is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        return jsonify({'success': True, **status})
+
+    @app.route('/reconcile/<job_id>/download')
+    def reconcile_download(job_id):
+        """下载多名册核对报告"""
+        job_dir = reconcile_jobs_dir()
+        status = jobs.read_status(job_dir, job_id) if job_dir and jobs.is_valid_job_id(job_id) else None
+        if status is None or status['status'] != jobs.STATUS_DONE:
+            return jsonify({'success': False, 'error': '核对报告不存在'}), 404
+
+        report_path = os.path.join(
+            backend.reconcile_dir(session['session_id']), 'reports', f'{job_id}.xlsx'
+        )
+        if not os.path.exists(report_path):
+            return jsonify({'success': False, 'error': '核对报告不存在'}), 404
+
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        return send_file(
+            report_path,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f'多名册核对_{timestamp}.xlsx'
+        )
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Prometheus 指标（多进程部署时汇总所有 worker）"""
+        content, content_type = metrics.render_metrics()
+        return content, 200, {'Content-Type': content_type}
 
     @app.route('/download/template/local')
     def download_local_template():
@@ -457,10 +1192,10 @@ def register_routes(app):
     @app.errorhandler(413)
     @app.errorhandler(RequestEntityTooLarge)
     def request_entity_too_large(error):
-        """文件过大错误处理"""
+        """请求过大错误处理（MAX_CONTENT_LENGTH 限制的是单次请求，不是分块上传的文件大小）"""
         return jsonify({
             'success': False,
-            'error': '文件大小超过限制(最大 10MB)'
+            'error': f"请求大小超过限制(单次请求最大 {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB)"
         }), 413
 
     @app.errorhandler(500)
@@ -0,0 +1,350 @@
+"""
+xlsx 流式读取模块 - 从尚未接收完整的 .xlsx 文件中读取第一张工作表的前若干行
+
+.xlsx 是 zip 包，各部件按本地文件头依次存放，中央目录在文件末尾。这里
+不依赖中央目录，按本地文件头顺序查找第一张工作表（xl/worksheets/sheet1.xml）
+和共享字符串表（xl/sharedStrings.xml），对已接收的部分增量解压并解析 XML，
+读到需要的行即停止。分块上传时据此在上传完成前检查表头。
+
+第一张工作表的开头在 Excel、WPS、xlsxwriter、openpyxl 写出的文件中都
+位于文件开头附近，表头的列数（header_width）很快就能得到；共享字符串表
+通常写在工作表之后，表头单元格引用共享字符串时，表头文字（read_head）
+需要等到该部件的开头到达。
+"""
+import struct
+import zlib
+import logging
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# zip 本地文件头：签名、版本、标志、压缩方法、时间、日期、CRC、压缩大小、原始大小、文件名长度、扩展字段长度
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+# 数据描述符（标志位 3：大小写在数据之后）
+DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+DATA_DESCRIPTOR_SIZE = 12
+FLAG_DATA_DESCRIPTOR = 0x08
+
+# 支持的压缩方法
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+# 第一张工作表和共享字符串表的部件名称
+FIRST_SHEET_PART = 'xl/worksheets/sheet1.xml'
+SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+
+# 每次读取和解压的字节数
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def _local_name(tag):
+    """去掉 XML 命名空间前缀"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def column_index(reference):
+    """
+    单元格引用（如 'AB3'）对应的从 0 开始的列索引
+
+    Args:
+        reference: 单元格引用
+
+    Returns:
+        int: 列索引
+    """
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _skip_streamed_entry(f, data_offset, available):
+    """
+    大小写在数据之后的 deflate 部件：解压到压缩流结束，返回部件结束位置
+
+    Returns:
+        int: 数据描述符之后的位置，数据尚未接收完整时返回 None
+    """
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    position = data_offset
+    f.seek(position)
+    while position < available:
+        block = f.read(min(READ_BLOCK_SIZE, available - position))
+        decompressor.decompress(block)
+        if decompressor.eof:
+            end = position + len(block) - len(decompressor.unused_data)
+            f.seek(end)
+            signature = f.read(4)
+            return end + DATA_DESCRIPTOR_SIZE + (4 if signature == DATA_DESCRIPTOR_SIGNATURE else 0)
+        position += len(block)
+    return None
+
+
+def iter_entries(f, available):
+    """
+    按本地文件头依次列出已接收的 zip 部件
+
+    Args:
+        f: 以二进制方式打开的文件
+        available: 已接收的字节数
+
+    Yields:
+        tuple: (部件名称, 数据起始位置, 压缩大小, 压缩方法)
+               压缩大小写在数据之后时为 None
+    """
+    position = 0
+    while position + LOCAL_HEADER.size <= available:
+        f.seek(position)
+        fields = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+        signature, _, flags, method, _, _, _, compressed_size, _, name_length, extra_length = fields
+        if signature != LOCAL_HEADER_SIGNATURE:
+            # 到达中央目录
+            return
+
+        data_offset = position + LOCAL_HEADER.size + name_length + extra_length
+        if data_offset > available:
+            return
+        name = f.read(name_length).decode('utf-8', errors='replace')
+
+        streamed = bool(flags & FLAG_DATA_DESCRIPTOR) and compressed_size == 0
+        yield name, data_offset, (None if streamed else compressed_size), method
+
+        if not streamed:
+            position = data_offset + compressed_size
+            if flags & FLAG_DATA_DESCRIPTOR:
+                f.seek(position)
+                has_signature = f.read(4) == DATA_DESCRIPTOR_SIGNATURE
+                position += DATA_DESCRIPTOR_SIZE + (4 if has_signature else 0)
+        elif method == METHOD_DEFLATED:
+            position = _skip_streamed_entry(f, data_offset, available)
+            if position is None:
+                return
+        else:
+            return
+
+
+def iter_entry_data(f, data_offset, compressed_size, method, available):
+    """
+    依次解压部件已接收的部分
+
+    Yields:
+        bytes: 解压后的数据块
+    """
+    end = available if compressed_size is None else min(available, data_offset + compressed_size)
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == METHOD_DEFLATED else None
+    position = data_offset
+    while position < end:
+        f.seek(position)
+        block = f.read(min(READ_BLOCK_SIZE, end - position))
+        position += len(block)
+        if decompressor is None:
+            yield block
+        else:
+            yield decompressor.decompress(block)
+            if decompressor.eof:
+                return
+
+
+def parse_sheet_rows(chunks, nrows):
+    """
+    从工作表 XML 中解析前 nrows 行
+
+    Args:
+        chunks: 工作表 XML 数据块
+        nrows: 需要的行数
+
+    Returns:
+        tuple: ({行号: {列索引: (类型, 值文本)}}, 是否已读完前 nrows 行)
+    """
+    parser = ET.XMLPullParser(events=('end',))
+    rows = {}
+    row_number = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            tag = _local_name(element.tag)
+            if tag == 'sheetData':
+                return rows, True
+            if tag != 'row':
+                continue
+
+            row_number = int(element.get('r', row_number + 1))
+            if row_number > nrows:
+                return rows, True
+
+            cells = {}
+            column = -1
+            for cell in element:
+                column = column_index(cell.get('r')) if cell.get('r') else column + 1
+                cell_type = cell.get('t', 'n')
+                if cell_type == 'inlineStr':
+                    text = ''.join(node.text or '' for node in cell.iter() if _local_name(node.tag) == 't')
+                else:
+                    value = next((node for node in cell if _local_name(node.tag) == 'v'), None)
+                    if value is None:
+                        continue
+                    text = value.text or ''
+                cells[column] = (cell_type, text)
+            rows[row_number] = cells
+            element.clear()
+            if row_number == nrows:
+                return rows, True
+    return rows, False
+
+
+def parse_shared_strings(chunks, count):
+    """
+    从共享字符串表中解析前 count 个字符串（忽略注音）
+
+    Args:
+        chunks: sharedStrings.xml 数据块
+        count: 需要的字符串个数
+
+    Returns:
+        list: 字符串列表，已接收的数据不足 count 个时返回 None
+    """
+    parser = ET.XMLPullParser(events=('end',))
+    strings = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if _local_name(element.tag) != 'si':
+                continue
+            texts = []
+            for child in element:
+                name = _local_name(child.tag)
+                if name == 't':
+                    texts.append(child.text or '')
+                elif name == 'r':
+                    texts.extend(node.text or '' for node in child if _local_name(node.tag) == 't')
+            strings.append(''.join(texts))
+            element.clear()
+            if len(strings) >= count:
+                return strings
+    return None
+
+
+def _cell_value(cell_type, text, shared_strings):
+    """按单元格类型转换值（数字转换为浮点数，与 xlrd 一致）"""
+    if cell_type == 's':
+        return shared_strings[int(text)]
+    if cell_type == 'b':
+        return text == '1'
+    if cell_type in ('str', 'inlineStr', 'e'):
+        return text
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _read_sheet_rows(f, available, nrows):
+    """
+    查找第一张工作表并解析前 nrows 行
+
+    Returns:
+        tuple: (parse_sheet_rows 的行字典, 共享字符串表部件)，工作表的这些行
+               尚未接收完整时行字典为 None；共享字符串表尚未到达时部件为 None
+    """
+    sheet = strings = None
+    for name, data_offset, compressed_size, method in iter_entries(f, available):
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            continue
+        if name == FIRST_SHEET_PART:
+            sheet = (data_offset, compressed_size, method)
+        elif name == SHARED_STRINGS_PART:
+            strings = (data_offset, compressed_size, method)
+        if sheet and strings:
+            break
+
+    if sheet is None:
+        return None, strings
+    rows, complete = parse_sheet_rows(iter_entry_data(f, *sheet, available), nrows)
+    return (rows if complete else None), strings
+
+
+def _available(f, available):
+    """已接收的字节数（默认为当前文件大小）"""
+    if available is None:
+        f.seek(0, 2)
+        available = f.tell()
+    return available
+
+
+def header_width(file_path, available=None):
+    """
+    第一张工作表第一行的列数（到最后一个有值的单元格为止）
+
+    不需要共享字符串表，工作表开头到达即可得到，用于在表头文字可用之前
+    判断列数是否与模板一致。
+
+    Args:
+        file_path: .xlsx 文件路径（可以尚未接收完整）
+        available: 已接收的字节数（默认为当前文件大小）
+
+    Returns:
+        int: 列数；第一行尚未到达或为空时返回 None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            rows, _ = _read_sheet_rows(f, _available(f, available), 1)
+        if not rows or not rows.get(1):
+            return None
+        return max(rows[1]) + 1
+
+    except (OSError, ValueError, struct.error, zlib.error, ET.ParseError) as e:
+        logger.warning(f"读取 .xlsx 表头失败: {file_path}: {e}")
+        return None
+
+
+def read_head(file_path, available=None, nrows=10):
+    """
+    读取 .xlsx 文件第一张工作表的前 nrows 行
+
+    Args:
+        file_path: .xlsx 文件路径（可以尚未接收完整）
+        available: 已接收的字节数（默认为当前文件大小）
+        nrows: 需要的行数
+
+    Returns:
+        list: 各行单元格值列表（同 template_registry.iter_sheet_heads），
+              已接收的数据中还没有这些行（或其引用的共享字符串）时返回 None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            available = _available(f, available)
+            rows, strings = _read_sheet_rows(f, available, nrows)
+            if rows is None:
+                return None
+
+            shared = [
+                int(text) for cells in rows.values()
+                for cell_type, text in cells.values() if cell_type == 's'
+            ]
+            shared_strings = []
+            if shared:
+                if strings is None:
+                    return None
+                shared_strings = parse_shared_strings(
+                    iter_entry_data(f, *strings, available), max(shared) + 1
+                )
+                if shared_strings is None:
+                    return None
+
+        last_row = max(rows, default=0)
+        head = []
+        for row_number in range(1, last_row + 1):
+            cells = rows.get(row_number, {})
+            values = [None] * (max(cells, default=-1) + 1)
+            for column, (cell_type, text) in cells.items():
+                values[column] = _cell_value(cell_type, text, shared_strings)
+            head.append(values)
+        return head
+
+    except (OSError, ValueError, IndexError, struct.error, zlib.error, ET.ParseError) as e:
+        logger.warning(f"读取 .xlsx 表头失败: {file_path}: {e}")
+        return None
@@ -1,8 +1,17 @@
 """
 Gunicorn 配置文件
 """
+import os
+import shutil
 import multiprocessing
 
+# Prometheus 多进程指标目录：必须在应用（prometheus_client）导入之前设置，
+# 各 worker 的指标写入该目录，由 /metrics 汇总（见 core/metrics.py）
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'prometheus')
+)
+
 # 绑定地址和端口
 bind = "0.0.0.0:5000"
 
@@ -38,3 +47,16 @@ graceful_timeout = 30
 # 最大请求数（防止内存泄漏）
 max_requests = 1000
 max_requests_jitter = 50
+
+
+def on_starting(server):
+    """启动时清空上次运行留下的多进程指标文件"""
+    multiproc_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """worker 退出后标记其指标文件，汇总时不再计入其 Gauge"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
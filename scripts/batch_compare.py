@@ -0,0 +1,102 @@
+"""
+批量比对命令 - 按清单或目录并行比对多个党委的单机库/全国库
+
+用法:
+    python scripts/batch_compare.py --manifest 2025-11.json --output 比对结果/2025-11
+    python scripts/batch_compare.py --dir 表格/2025-11 --output 比对结果/2025-11 --workers 4
+    python scripts/batch_compare.py --dir 表格/2025-12 --output 比对结果/2025-12 --state 比对状态
+
+清单格式见 core/batch.py。每个党委的报告写入输出目录（<党委名称>.xlsx），
+全部完成后写出 summary.json 和 汇总.xlsx；有党委失败时以非零状态退出。
+指定 --state 时按党委保存逐行指纹，下次比对只重新比对变化的人员，
+报告和汇总中列出自上次比对以来的新增、删除和修改人员。
+"""
+import sys
+import os
+import argparse
+import logging
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core import batch
+from core.comparison import ComparisonEngine
+
+TEMPLATES_FOLDER = os.path.join(PROJECT_ROOT, 'core', 'templates')
+
+# 进度输出中的阶段名称
+PHASE_LABELS = {
+    'validate': '校验模板',
+    'read': '读取数据',
+    'preprocess': '预处理',
+    'find_differences': '查找人员差异',
+    'find_field_differences': '查找字段差异',
+    'export': '导出报告',
+    'done': '完成',
+    'failed': '失败',
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量比对多个党委的单机库/全国库')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help='JSON 清单文件')
+    source.add_argument('--dir', dest='directory', help='每个子目录为一个党委的根目录')
+    parser.add_argument('--output', required=True, help='输出目录')
+    parser.add_argument('--workers', type=int, help='进程数（默认 CPU 核数）')
+    parser.add_argument('--reference-date', default=ComparisonEngine.REFERENCE_DATE,
+                        help='党龄/年龄计算基准日期')
+    parser.add_argument('--no-compact', action='store_true', help='不使用紧凑类型')
+    parser.add_argument('--duplicate-policy', choices=ComparisonEngine.DUPLICATE_POLICIES,
+                        default=ComparisonEngine.DUPLICATE_POLICY,
+                        help='身份证号重复时的处理方式：first / last 保留第一行或最后一行，reject 拒绝比对')
+    parser.add_argument('--state', help='增量比对状态目录（各党委沿用上次比对结果，只比对变化的人员）')
+    args = parser.parse_args(argv)
+
+    # 工作进程的详细日志只保留警告和错误，进度由主进程输出
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    if args.manifest:
+        pairs = batch.load_manifest(args.manifest)
+    else:
+        pairs = batch.discover_pairs(args.directory, TEMPLATES_FOLDER)
+
+    if not pairs:
+        print('没有待比对的党委')
+        return 1
+
+    finished = []
+
+    def on_progress(name, phase):
+        if phase in ('done', 'failed'):
+            finished.append(name)
+            print(f'[{len(finished)}/{len(pairs)}] {name}: {PHASE_LABELS[phase]}', flush=True)
+        else:
+            print(f'        {name}: {PHASE_LABELS.get(phase, phase)}', flush=True)
+
+    summary = batch.run_batch(
+        pairs,
+        args.output,
+        TEMPLATES_FOLDER,
+        workers=args.workers,
+        reference_date=args.reference_date,
+        compact=not args.no_compact,
+        on_progress=on_progress,
+        state_folder=args.state,
+        duplicate_policy=args.duplicate_policy
+    )
+
+    print(f"完成: 成功 {summary['succeeded']} 个，失败 {summary['failed']} 个")
+    for item in summary['committees']:
+        if item['status'] != 'done':
+            print(f"  {item['name']}: {item.get('error')}")
+    print(f"汇总: {os.path.join(args.output, batch.SUMMARY_EXCEL_FILENAME)}")
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Excel 解析引擎基准测试 - 比较各引擎解析不同规模花名册的耗时
+
+对每种文件格式（.xls / .xlsx）和每个行数，用该格式所有已安装的引擎
+（见 core/excel_reader.py 的 ENGINE_PREFERENCES）解析单机库和全国库，
+各取最短耗时；并核对各引擎的解析结果与默认引擎（xlrd / openpyxl）一致。
+
+输入文件由 generate_rosters.py 生成（不存在时自动生成，.xls 需要安装
+xlwt，最多 65535 行）。未安装的引擎跳过；calamine 需要安装 python-calamine。
+
+用法:
+    python scripts/benchmark_excel_engines.py --rows 1000 10000 50000 --formats xls xlsx
+    python scripts/benchmark_excel_engines.py --rows 100000 --formats xlsx --output benchmarks/engines.json
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+from datetime import datetime
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import pandas as pd
+
+from benchmark_phases import ensure_inputs, git_revision
+from core import excel_reader
+
+# .xls 格式的最大数据行数
+XLS_MAX_ROWS = 65535
+
+
+def time_engine(paths, engine, repeat):
+    """
+    用指定引擎解析单机库和全国库
+
+    Returns:
+        tuple: (最短耗时, {'local': DataFrame, 'national': DataFrame})
+    """
+    best = None
+    frames = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = {
+            key: excel_reader.read_excel(paths[key], engine=engine)
+            for key in ('local', 'national')
+        }
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, frames
+
+
+def frames_match(frames, reference):
+    """各引擎的解析结果是否与默认引擎一致（不比较列类型）"""
+    try:
+        for key, df in reference.items():
+            pd.testing.assert_frame_equal(frames[key], df, check_dtype=False)
+    except AssertionError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Excel 解析引擎基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--formats', nargs='+', choices=list(excel_reader.ENGINE_PREFERENCES),
+                        default=list(excel_reader.ENGINE_PREFERENCES))
+    parser.add_argument('--data', default='benchmarks/data', help='输入数据目录')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最短耗时）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='结果 JSON 文件路径')
+    args = parser.parse_args()
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'runs': []
+    }
+
+    print(f"{'格式':>6} {'行数':>8} {'引擎':>10} {'耗时':>8} {'行/秒':>10} {'加速':>6} {'结果一致':>8}")
+    for file_format in args.formats:
+        candidates = excel_reader.ENGINE_PREFERENCES[file_format]
+        engines = [engine for engine in candidates if excel_reader.is_available(engine)]
+        skipped = [engine for engine in candidates if engine not in engines]
+        if skipped:
+            print(f".{file_format}: 未安装 {', '.join(skipped)}，跳过")
+        # 默认引擎（纯 Python 实现）作为速度和结果的对照
+        baseline_engine = excel_reader.HEADER_ENGINES[file_format]
+
+        for rows in args.rows:
+            if file_format == 'xls' and rows > XLS_MAX_ROWS:
+                print(f".xls 最多 {XLS_MAX_ROWS} 行，跳过 {rows} 行")
+                continue
+            try:
+                paths = ensure_inputs(rows, file_format, args.data, args.seed)
+            except RuntimeError as e:
+                print(f'.{file_format}: {e}，跳过')
+                break
+
+            baseline_seconds, reference = time_engine(paths, baseline_engine, args.repeat)
+            total_rows = sum(len(df) for df in reference.values())
+
+            for engine in engines:
+                if engine == baseline_engine:
+                    seconds, match = baseline_seconds, True
+                else:
+                    seconds, frames = time_engine(paths, engine, args.repeat)
+                    match = frames_match(frames, reference)
+
+                report['runs'].append({
+                    'format': file_format,
+                    'rows': rows,
+                    'engine': engine,
+                    'seconds': round(seconds, 4),
+                    'rows_per_second': round(total_rows / seconds),
+                    'speedup': round(baseline_seconds / seconds, 2),
+                    'matches_baseline': match
+                })
+                print(f'{file_format:>6} {rows:>8} {engine:>10} {seconds:>8.3f} '
+                      f'{total_rows / seconds:>10.0f} {baseline_seconds / seconds:>6.2f} '
+                      f"{'是' if match else '否':>8}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'结果已写入: {args.output}')
+
+    if any(not run['matches_baseline'] for run in report['runs']):
+        print('存在与默认引擎解析结果不一致的引擎')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+字段差异比对基准测试 - 对比逐字段合并与单次合并的耗时
+
+用法:
+    python scripts/benchmark_field_diff.py --rows 50000 100000 --repeat 3
+"""
+import sys
+import os
+import argparse
+import time
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from core.comparison import ComparisonEngine
+
+
+def make_frames(rows, seed=0):
+    """
+    生成用于基准测试的单机库/全国库 DataFrame（已预处理形态）
+
+    Args:
+        rows: 每个库的行数
+        seed: 随机种子
+
+    Returns:
+        tuple: (df_local, df_national)
+    """
+    rng = np.random.default_rng(seed)
+    ids = pd.Series([f'{140203000000000000 + i:018d}' for i in range(rows)])
+
+    def column(choices):
+        return pd.Series(rng.choice(choices, size=rows))
+
+    df_local = pd.DataFrame({
+        '姓名': [f'党员{i}' for i in range(rows)],
+        '身份证号': ids,
+        '性别': column(['男', '女']),
+        '民族': column(['汉族', '回族', '蒙古族']),
+        '出生日期': column(['1970-01-01', '1985-06-15', '1999-12-31']),
+        '学历': column(['高中', '大专', '大学', '研究生']),
+        '入党时间': column(['2001-07-01', '2010-10-01', '2025-03-01']),
+        '个人身份': column(['公有经济控制企业管理岗位', '公有制经济控制单位工勤岗位']),
+        '人员类别': column(['正式党员', '预备党员']),
+        '所在支部': column(['综采一队党支部', '综采二队党支部']),
+    })
+
+    # 全国库：打乱顺序，并对约 1% 的值做修改
+    df_national = df_local.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    df_national = df_national.rename(columns={
+        '身份证号': '身份证号码',
+        '入党时间': '入党日期',
+        '个人身份': '工作岗位',
+        '所在支部': '所在党支部',
+    })
+    for col in ['性别', '民族', '学历', '入党日期']:
+        mask = rng.random(rows) < 0.01
+        df_national.loc[mask, col] = '变更'
+
+    return df_local, df_national
+
+
+def legacy_field_differences(df_local, df_national):
+    """逐字段重复合并的原始实现，作为基准对照"""
+    df_local_suffixed = df_local.add_suffix('_local').rename(
+        columns={'身份证号_local': '身份证号'}
+    )
+    df_national_suffixed = df_national.add_suffix('_national').rename(
+        columns={'身份证号码_national': '身份证号码'}
+    )
+
+    field_diffs = {}
+    for field in ComparisonEngine.COMPARE_FIELDS:
+        national_field = ComparisonEngine.FIELD_MAPPING.get(field, field)
+        merged = pd.merge(
+            df_local_suffixed,
+            df_national_suffixed,
+            left_on='身份证号',
+            right_on='身份证号码',
+            how='inner'
+        )
+        local_col = f'{field}_local'
+        national_col = f'{national_field}_national'
+        diff_mask = merged[local_col] != merged[national_col]
+        field_diffs[f'diff_{field}'] = merged[diff_mask][[
+            '姓名_local', '身份证号', local_col, national_col
+        ]]
+    return field_diffs
+
+
+def time_call(func, repeat):
+    """返回多次执行中的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字段差异比对基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'行数':>10} {'逐字段合并(s)':>14} {'单次合并(s)':>12} {'加速比':>8}")
+    for rows in args.rows:
+        df_local, df_national = make_frames(rows)
+
+        engine = ComparisonEngine(df_local, df_national)
+        legacy = time_call(
+            lambda: legacy_field_differences(df_local, df_national),
+            args.repeat
+        )
+        current = time_call(engine.find_field_differences, args.repeat)
+
+        # 校验两种实现结果一致
+        expected = legacy_field_differences(df_local, df_national)
+        actual = engine.find_field_differences()
+        for key, frame in expected.items():
+            assert len(frame) == len(actual[key]), f'{key} 结果行数不一致'
+
+        print(f'{rows:>10} {legacy:>14.3f} {current:>12.3f} {legacy / current:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+内存基准测试 - 对比不同数据类型模式下各比对阶段的峰值内存
+
+每种模式在独立子进程中运行，按阶段采样进程常驻内存（RSS）峰值，
+用于估算 gunicorn worker 的内存需求。仅支持 Linux（读取 /proc）。
+
+模式:
+    object   所有文本列为 object（pandas 2 默认行为）
+    default  pandas 解析得到的默认类型
+    compact  紧凑类型（core.dtypes.compact_frame）
+
+用法:
+    python scripts/benchmark_memory.py --rows 100000 --modes object default compact
+"""
+import sys
+import os
+import json
+import argparse
+import tempfile
+import threading
+import subprocess
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_field_diff import make_frames
+from core.comparison import ComparisonEngine
+from core.dtypes import compact_frame, frame_memory
+from core.result_store import ResultStore
+
+MODES = ('object', 'default', 'compact')
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """读取当前进程的常驻内存（字节）"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+class PeakRSS:
+    """在后台线程中采样 RSS，记录 with 块内的峰值"""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def run_mode(rows, mode):
+    """
+    在当前进程中运行一种模式
+
+    Returns:
+        dict: {'mode', 'rows', 'frame_mb', 'phases': {阶段: 峰值 RSS MB}}
+    """
+    mb = 1024 * 1024
+    phases = {}
+
+    with PeakRSS() as peak:
+        df_local, df_national = make_frames(rows)
+        if mode == 'object':
+            df_local = df_local.astype(object)
+            df_national = df_national.astype(object)
+        elif mode == 'compact':
+            df_local = compact_frame(df_local)
+            df_national = compact_frame(df_national)
+    phases['load'] = peak.peak / mb
+    frame_mb = (frame_memory(df_local) + frame_memory(df_national)) / mb
+
+    engine = ComparisonEngine(df_local, df_national)
+    del df_local, df_national
+
+    for phase, func in [
+        ('preprocess', engine.preprocess),
+        ('find_differences', engine.find_differences),
+        ('find_field_differences', engine.find_field_differences),
+    ]:
+        with PeakRSS() as peak:
+            func()
+        phases[phase] = peak.peak / mb
+
+    results = dict(engine.results)
+    results['local_preprocessed'] = engine.df_local
+    results['national_preprocessed'] = engine.df_national
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with PeakRSS() as peak:
+            ResultStore.save(results, os.path.join(tmp_dir, 'results'))
+        phases['save'] = peak.peak / mb
+
+    return {'mode': mode, 'rows': rows, 'frame_mb': round(frame_mb, 1),
+            'phases': {name: round(value, 1) for name, value in phases.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比对阶段峰值内存基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--json', action='store_true', help='以 JSON 行输出结果')
+    parser.add_argument('--child', nargs=2, metavar=('ROWS', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(int(args.child[0]), args.child[1])))
+        return
+
+    reports = []
+    for rows in args.rows:
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', str(rows), mode],
+                check=True, capture_output=True, text=True
+            ).stdout
+            reports.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        for report in reports:
+            print(json.dumps(report, ensure_ascii=False))
+        return
+
+    phases = list(reports[0]['phases']) if reports else []
+    print(f"{'行数':>8} {'模式':>8} {'数据(MB)':>9} " + ' '.join(f'{p:>22}' for p in phases))
+    for report in reports:
+        print(f"{report['rows']:>8} {report['mode']:>8} {report['frame_mb']:>9.1f} " +
+              ' '.join(f"{report['phases'][p]:>22.1f}" for p in phases))
+    print('各阶段数值为该阶段内进程 RSS 峰值（MB）')
+
+
+if __name__ == '__main__':
+    main()
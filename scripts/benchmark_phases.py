@@ -0,0 +1,222 @@
+"""
+分阶段基准测试 - 对真实处理链路的每个阶段分别计时
+
+阶段：read（解析 Excel）、validate（模板校验）、preprocess、
+find_differences、find_field_differences、store（保存结果存储）、
+export（生成 Excel 报告）。
+
+输入文件由 generate_rosters.py 生成（不存在时自动生成），结果以 JSON
+写出，便于跟踪性能回归；指定 --baseline 时与基准结果比较，任一阶段
+超过阈值即以非零状态退出。
+
+用法:
+    python scripts/benchmark_phases.py --rows 1000 100000 --format xlsx --output benchmarks/results.json
+    python scripts/benchmark_phases.py --rows 100000 --baseline benchmarks/results.json --tolerance 1.3
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import pandas as pd
+
+from generate_rosters import TEMPLATES_FOLDER, write_roster_pair
+from core import exporter, file_handler
+from core.comparison import ComparisonEngine
+from core.result_store import ResultStore
+from core.validator import TemplateValidator
+
+PHASES = ['read', 'validate', 'preprocess', 'find_differences',
+          'find_field_differences', 'store', 'export']
+
+
+def git_revision():
+    """当前代码版本（不在 git 仓库中时返回 None）"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_ROOT, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ensure_inputs(rows, file_format, data_folder, seed):
+    """返回输入文件路径，文件不存在时先生成"""
+    folder = os.path.join(data_folder, file_format)
+    paths = {
+        'local': os.path.join(folder, f'local_{rows}.{file_format}'),
+        'national': os.path.join(folder, f'national_{rows}.{file_format}'),
+        'truth': os.path.join(folder, f'truth_{rows}.json'),
+    }
+    if not all(os.path.exists(path) for path in paths.values()):
+        print(f'生成输入数据: {rows} 行 .{file_format}')
+        paths = write_roster_pair(rows, folder, file_format, seed=seed)
+    return paths
+
+
+def run_once(paths, compact):
+    """
+    执行一次完整链路并对每个阶段计时
+
+    Returns:
+        tuple: (阶段耗时字典, 结果统计字典)
+    """
+    timings = {}
+
+    def timed(phase, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[phase] = time.perf_counter() - start
+        return value
+
+    def read():
+        return (
+            file_handler.read_roster(paths['local'], compact=compact),
+            file_handler.read_roster(paths['national'], compact=compact)
+        )
+
+    df_local, df_national = timed('read', read)
+
+    validator = TemplateValidator(TEMPLATES_FOLDER)
+
+    def validate():
+        for result in (validator.validate_local_template(paths['local']),
+                       validator.validate_national_template(paths['national'])):
+            if not result['valid']:
+                raise RuntimeError(f"模板校验失败: {result}")
+
+    timed('validate', validate)
+
+    engine = ComparisonEngine(df_local, df_national)
+    timed('preprocess', engine.preprocess)
+    timed('find_differences', engine.find_differences)
+    timed('find_field_differences', engine.find_field_differences)
+
+    results = dict(engine.results)
+    results['local_preprocessed'] = engine.df_local
+    results['national_preprocessed'] = engine.df_national
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = timed('store', ResultStore.save, results, os.path.join(tmp_dir, 'results'))
+        timed('export', lambda: exporter.write_report(
+            store.load_many(exporter.EXPORT_SECTIONS),
+            store.artifact_path(exporter.REPORT_FILENAME)
+        ))
+
+    counts = {
+        'local_extra': len(results['local_extra']),
+        'national_extra': len(results['national_extra']),
+        'field_diffs': {
+            field: len(results[f'diff_{field}'])
+            for field in ComparisonEngine.COMPARE_FIELDS
+        }
+    }
+    return timings, counts
+
+
+def check_truth(counts, truth_path):
+    """核对比对结果与生成时植入的差异数量"""
+    with open(truth_path, 'r', encoding='utf-8') as f:
+        truth = json.load(f)
+    expected = {key: truth[key] for key in ('local_extra', 'national_extra', 'field_diffs')}
+    if counts != expected:
+        raise AssertionError(f'比对结果与植入数量不一致: {counts} != {expected}')
+
+
+def compare_baseline(report, baseline_path, tolerance):
+    """
+    与基准结果比较
+
+    Returns:
+        list: 回归描述，空列表表示没有回归
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    baseline_runs = {(run['rows'], run['format']): run for run in baseline['runs']}
+    regressions = []
+    for run in report['runs']:
+        base = baseline_runs.get((run['rows'], run['format']))
+        if base is None:
+            continue
+        for phase, seconds in run['phases'].items():
+            base_seconds = base['phases'].get(phase)
+            # 忽略极短阶段的抖动
+            if base_seconds and seconds > 0.05 and seconds > base_seconds * tolerance:
+                regressions.append(
+                    f"{run['rows']} 行 .{run['format']} {phase}: "
+                    f"{base_seconds:.3f}s -> {seconds:.3f}s"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比对链路分阶段基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--format', dest='file_format', choices=['xlsx', 'xls'], default='xlsx')
+    parser.add_argument('--data', default='benchmarks/data', help='输入数据目录')
+    parser.add_argument('--repeat', type=int, default=1, help='重复次数（各阶段取最短耗时）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-compact', action='store_true', help='不使用紧凑类型')
+    parser.add_argument('--output', help='结果 JSON 文件路径')
+    parser.add_argument('--baseline', help='基准结果 JSON 文件路径')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='回归阈值（耗时倍数）')
+    args = parser.parse_args()
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'compact': not args.no_compact,
+        'runs': []
+    }
+
+    print(f"{'行数':>8} " + ' '.join(f'{phase:>22}' for phase in PHASES) + f" {'合计':>8}")
+    for rows in args.rows:
+        paths = ensure_inputs(rows, args.file_format, args.data, args.seed)
+
+        best = {}
+        for _ in range(args.repeat):
+            timings, counts = run_once(paths, compact=not args.no_compact)
+            for phase, seconds in timings.items():
+                best[phase] = min(best.get(phase, seconds), seconds)
+        check_truth(counts, paths['truth'])
+
+        report['runs'].append({
+            'rows': rows,
+            'format': args.file_format,
+            'phases': {phase: round(best[phase], 4) for phase in PHASES},
+            'total': round(sum(best.values()), 4)
+        })
+        print(f'{rows:>8} ' + ' '.join(f'{best[phase]:>22.3f}' for phase in PHASES) +
+              f' {sum(best.values()):>8.3f}')
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'结果已写入: {args.output}')
+
+    if args.baseline:
+        regressions = compare_baseline(report, args.baseline, args.tolerance)
+        if regressions:
+            print('性能回归:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('未发现性能回归')
+
+
+if __name__ == '__main__':
+    main()
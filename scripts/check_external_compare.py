@@ -0,0 +1,114 @@
+"""
+外部排序比对一致性检查 - 核对外部排序比对与内存比对的结果一致
+
+对生成的花名册（各行数）以及只有表头的空花名册（单侧或两侧为空），
+分别用 ComparisonEngine（内存比对）和 external_compare.compare_files
+（外部排序比对，输入为上传时缓存的解析结果）生成结果，逐个分区比较取值
+（不比较列类型：外部排序结果从 Arrow 读回，空列等的类型可能不同）。
+
+输入文件由 generate_rosters.py 生成（不存在时自动生成）；空花名册使用
+core/templates 中的单机模板和全国模板。
+
+用法:
+    python scripts/check_external_compare.py --rows 1000 10000 --chunk-rows 300
+"""
+import sys
+import os
+import argparse
+import tempfile
+import shutil
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import pandas as pd
+
+from benchmark_phases import ensure_inputs
+from core.comparison import ComparisonEngine
+from core.external_compare import compare_files
+from core.file_handler import read_roster, save_parsed_frame
+
+TEMPLATE_FOLDER = os.path.join(PROJECT_ROOT, 'core', 'templates')
+EMPTY_ROSTERS = {
+    'local': os.path.join(TEMPLATE_FOLDER, '单机模板.xls'),
+    'national': os.path.join(TEMPLATE_FOLDER, '全国模板.xls'),
+}
+
+
+def normalized(df):
+    """统一为 object 类型、缺失值统一为 None，便于只比较取值"""
+    df = df.reset_index(drop=True).astype(object)
+    return df.where(df.notna(), None)
+
+
+def check_case(name, paths, chunk_rows, work_dir):
+    """
+    用两种方式比对同一对花名册并核对各分区
+
+    Returns:
+        list: 不一致的分区名称
+    """
+    frames = {key: read_roster(paths[key]) for key in ('local', 'national')}
+    expected = ComparisonEngine(frames['local'], frames['national']).generate_report()
+
+    case_dir = os.path.join(work_dir, name)
+    os.makedirs(case_dir)
+    cached = {
+        key: save_parsed_frame(df, os.path.join(case_dir, key))
+        for key, df in frames.items()
+    }
+    store = compare_files(
+        cached['local'], cached['national'], os.path.join(case_dir, 'store'),
+        chunk_rows=chunk_rows
+    )
+
+    mismatched = []
+    for section, df in expected.items():
+        try:
+            pd.testing.assert_frame_equal(
+                normalized(df), normalized(store.load(section)),
+                check_dtype=False, check_column_type=False, check_index_type=False
+            )
+        except AssertionError as e:
+            print(f'  {section}: {str(e).splitlines()[0]}')
+            mismatched.append(section)
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='外部排序比对一致性检查')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--chunk-rows', type=int, default=300, help='外部排序比对每块行数')
+    parser.add_argument('--data', default='benchmarks/data', help='输入数据目录')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cases = {
+        'empty_both': EMPTY_ROSTERS,
+    }
+    for rows in args.rows:
+        paths = ensure_inputs(rows, 'xlsx', args.data, args.seed)
+        cases[f'rows_{rows}'] = paths
+        if rows == args.rows[0]:
+            cases['empty_local'] = dict(paths, local=EMPTY_ROSTERS['local'])
+            cases['empty_national'] = dict(paths, national=EMPTY_ROSTERS['national'])
+
+    work_dir = tempfile.mkdtemp(prefix='check-external-')
+    failed = []
+    try:
+        for name, paths in cases.items():
+            mismatched = check_case(name, paths, args.chunk_rows, work_dir)
+            print(f"{name:>16} {'一致' if not mismatched else '不一致'}")
+            if mismatched:
+                failed.append(name)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failed:
+        print(f"结果不一致: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
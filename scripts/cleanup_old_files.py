@@ -7,7 +7,8 @@ import os
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core import file_handler
+from config import Config
+from core import file_handler, storage
 import logging
 
 logging.basicConfig(
@@ -18,14 +19,15 @@ logger = logging.getLogger(__name__)
 
 
 def main():
-    """清理超过1小时的临时文件"""
-    base_upload_folder = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)),
-        'uploads'
+    """清理超过1小时的临时文件（共享存储时同时清理本机临时目录）"""
+    backend = storage.create_storage(
+        Config.STORAGE_BACKEND,
+        Config.UPLOAD_FOLDER,
+        Config.SCRATCH_FOLDER
     )
 
-    logger.info(f"开始清理临时文件: {base_upload_folder}")
-    file_handler.cleanup_old_files(base_upload_folder, max_age_hours=1)
+    logger.info(f"开始清理临时文件: {backend.root}")
+    backend.cleanup_expired(file_handler.cleanup_old_files, max_age_hours=1)
     logger.info("清理完成")
 
 
@@ -0,0 +1,359 @@
+"""
+花名册生成脚本 - 生成用于测试和基准测试的单机库/全国库数据
+
+表头直接取自 core/templates 中的模板文件，生成的文件可以通过模板校验。
+按比例植入单机多出、全国多出人员和字段差异，植入数量写入 truth 文件，
+可用于核对比对结果。
+
+用法:
+    python scripts/generate_rosters.py --rows 1000 100000 --formats xlsx xls --output benchmarks/data
+
+说明:
+    .xls 最多 65535 行数据，写入需要安装 xlwt（requirements-dev.txt）；.xlsx 使用 xlsxwriter 流式写入。
+"""
+import sys
+import os
+import json
+import argparse
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from core.comparison import ComparisonEngine
+
+TEMPLATES_FOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'core', 'templates'
+)
+
+# .xls 单个工作表最多 65536 行（含表头）
+XLS_MAX_ROWS = 65535
+
+# 身份证号校验码（GB 11643）
+ID_WEIGHTS = np.array([7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2])
+ID_CHECK_CODES = np.array(list('10X98765432'))
+
+SURNAMES = list('王李张刘陈杨赵黄周吴徐孙胡朱高林何郭马罗梁宋郑谢韩唐冯于董萧程曹袁邓许傅沈曾彭吕苏卢蒋蔡贾丁魏薛叶阎余潘杜戴夏钟汪田任姜范方石姚谭廖邹熊金陆郝孔白崔康毛邱秦江史顾侯邵孟龙万段雷钱汤尹黎易常武乔贺赖龚文')
+GIVEN_CHARS = list('伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红娥玲芬燕彩春菊兰凤洁梅琳素云莲真环雪荣爱妹香月莺媛瑞凡佳嘉琼勤珍贞莉桂娣叶璧璐娅琦晶妍茜秋珊莎锦黛青倩婷姣婉娴瑾颖露瑶怡婵雁蓓纨仪荷丹蓉眉君琴蕊薇菁梦岚苑婕馨瑗琰韵融园艺咏卿聪澜纯毓悦昭冰爽琬茗羽希宁欣飘育滢馥筠柔竹霭凝晓欢霄枫芸菲寒伊亚宜可姬舒影荔枝思丽')
+REGION_CODES = ['140203', '140211', '140212', '140213', '140214', '140221', '140222',
+                '140223', '140224', '140225', '140226', '140623', '142124', '140302']
+BRANCHES = [f'燕子山矿{name}党支部' for name in
+            ['综采一队', '综采二队', '综掘一队', '综掘二队', '机电队', '运输队',
+             '通风队', '准备一区', '准备二区', '洗煤厂', '机关第一', '生产管理（联合）']]
+ETHNICITIES = ['汉族'] * 18 + ['回族', '蒙古族']
+EDUCATIONS = ['初中', '高中', '中专', '大专', '大学', '硕士研究生']
+POSITIONS = ['公有经济控制企业管理岗位', '公有制经济控制单位工勤岗位', '公有经济控制企业专业技术岗位']
+ORIGINS = ['山西大同', '山西大同市', '山西朔州', '山西原平', '山西灵丘', '河北张家口']
+JOIN_SOURCES = ['新入党', '本系统内部其他支部转入', '外系统转入']
+
+
+def read_template_columns(filename):
+    """读取模板文件的原始表头（保留空格等原样，保证生成文件能通过校验）"""
+    return list(pd.read_excel(os.path.join(TEMPLATES_FOLDER, filename), nrows=0).columns)
+
+
+def make_ids(birth_ymd, rng):
+    """
+    生成带正确校验码的 18 位身份证号
+
+    Args:
+        birth_ymd: 出生日期字符串数组（YYYYMMDD）
+        rng: numpy 随机数生成器
+
+    Returns:
+        np.ndarray: 身份证号字符串数组
+    """
+    n = len(birth_ymd)
+    regions = rng.choice(REGION_CODES, size=n)
+    sequence = np.char.zfill(rng.integers(0, 1000, size=n).astype(str), 3)
+    body = np.char.add(np.char.add(regions, birth_ymd), sequence).astype('U17')
+    digits = np.frombuffer(body.astype('S17').tobytes(), dtype=np.uint8).reshape(n, 17) - ord('0')
+    check = ID_CHECK_CODES[(digits.astype(np.int64) @ ID_WEIGHTS) % 11]
+    return np.char.add(body, check)
+
+
+def random_dates(rng, start, end, size):
+    """生成 [start, end] 范围内的随机日期"""
+    start_day = pd.Timestamp(start).value // 86400_000_000_000
+    end_day = pd.Timestamp(end).value // 86400_000_000_000
+    return pd.to_datetime(rng.integers(start_day, end_day + 1, size=size), unit='D')
+
+
+def make_population(size, rng, reference_date):
+    """
+    生成人员基础信息（单机库和全国库共用）
+
+    Returns:
+        DataFrame: 以模板字段名为列的人员信息
+    """
+    # 多生成一些以便去除重复身份证号
+    oversized = int(size * 1.05) + 10
+    birth = random_dates(rng, '1960-01-01', '2003-12-31', oversized)
+    ids = make_ids(np.asarray(birth.strftime('%Y%m%d'), dtype='U8'), rng)
+    keep = np.flatnonzero(~pd.Index(ids).duplicated(keep='first'))[:size]
+    if len(keep) < size:
+        raise RuntimeError('生成的身份证号重复过多，请更换随机种子')
+    birth = birth[keep]
+    ids = ids[keep]
+
+    # 入党时间：18 岁之后、基准日期之前
+    reference = pd.Timestamp(reference_date)
+    earliest_join = (birth + pd.DateOffset(years=18)).values.astype('datetime64[D]').astype(np.int64)
+    latest_join = np.int64(reference.value // 86400_000_000_000)
+    earliest_join = np.minimum(earliest_join, latest_join)
+    join = pd.to_datetime(
+        earliest_join + (rng.random(size) * (latest_join - earliest_join)).astype(np.int64),
+        unit='D'
+    )
+    confirm = join + pd.DateOffset(years=1)
+
+    names = np.char.add(
+        rng.choice(SURNAMES, size=size),
+        np.where(
+            rng.random(size) < 0.7,
+            np.char.add(rng.choice(GIVEN_CHARS, size=size), rng.choice(GIVEN_CHARS, size=size)),
+            rng.choice(GIVEN_CHARS, size=size)
+        )
+    )
+    join_text = join.strftime('%Y-%m-%d')
+    sex_digit = np.frombuffer(ids.astype('S18').tobytes(), dtype=np.uint8).reshape(size, 18)[:, 16]
+    phones = np.char.add('1', rng.integers(3000000000, 9999999999, size=size).astype(str))
+
+    return pd.DataFrame({
+        '姓名': names,
+        '身份证号': ids,
+        # 身份证号第 17 位奇数为男性
+        '性别': np.where(sex_digit % 2 == 1, '男', '女'),
+        '民族': rng.choice(ETHNICITIES, size=size),
+        '籍贯': rng.choice(ORIGINS, size=size),
+        '出生日期': birth.strftime('%Y-%m-%d'),
+        '学历': rng.choice(EDUCATIONS, size=size),
+        '学位': None,
+        '个人身份': rng.choice(POSITIONS, size=size),
+        '国民经济行业': '煤炭开采和洗选业',
+        '手机号码': phones,
+        '入党时间': join_text,
+        '转正时间': confirm.strftime('%Y-%m-%d'),
+        '增加时间': join_text,
+        '党员增加': rng.choice(JOIN_SOURCES, size=size),
+        '所在单位': '燕子山矿',
+        '一线情况': '企业生产第一线',
+        '家庭地址': rng.choice(ORIGINS, size=size),
+        '所在支部': rng.choice(BRANCHES, size=size),
+        '人员类别': np.where(
+            np.asarray(join_text, dtype='U10').astype('U4') == str(reference_date)[:4],
+            '预备党员', '正式党员'
+        ),
+    })
+
+
+def _plant_mismatch(values, field, rng):
+    """返回与原值一定不同的新取值"""
+    values = np.asarray(values, dtype=object)
+    if field == '性别':
+        return np.where(values == '男', '女', '男')
+    if field == '人员类别':
+        return np.where(values == '正式党员', '预备党员', '正式党员')
+    if field in ('出生日期', '入党时间'):
+        # 修改日（保持年份不变，避免影响人员类别）
+        day = np.array([int(value[8:10]) for value in values])
+        new_day = np.where(day == 1, 2, 1)
+        return np.array([f'{value[:8]}{d:02d}' for value, d in zip(values, new_day)], dtype=object)
+    if field == '姓名':
+        return np.array([f'{value}某' for value in values], dtype=object)
+
+    choices = {
+        '民族': ['汉族', '回族', '蒙古族', '满族'],
+        '学历': EDUCATIONS,
+        '个人身份': POSITIONS,
+    }[field]
+    shifted = rng.choice(choices, size=len(values))
+    clash = shifted == values
+    # 与原值相同的替换为列表中的下一个取值
+    shifted[clash] = [choices[(choices.index(v) + 1) % len(choices)] for v in values[clash]]
+    return shifted
+
+
+def generate_roster_pair(rows, local_extra_rate=0.01, national_extra_rate=0.01,
+                         mismatch_rate=0.01, seed=0,
+                         reference_date=ComparisonEngine.REFERENCE_DATE):
+    """
+    生成一对单机库/全国库数据
+
+    Args:
+        rows: 单机库行数
+        local_extra_rate: 单机多出人员比例（占单机库行数）
+        national_extra_rate: 全国多出人员比例（占单机库行数）
+        mismatch_rate: 每个比对字段的差异比例（占共同人员数）
+        seed: 随机种子
+        reference_date: 基准日期（决定预备党员年份）
+
+    Returns:
+        tuple: (df_local, df_national, truth)
+            truth 为植入数量：{'local_extra', 'national_extra', 'field_diffs': {字段: 数量}}
+    """
+    rng = np.random.default_rng(seed)
+
+    local_only = int(round(rows * local_extra_rate))
+    national_only = int(round(rows * national_extra_rate))
+    common = rows - local_only
+    population = make_population(rows + national_only, rng, reference_date)
+
+    local = population.iloc[:rows].reset_index(drop=True)
+    national = pd.concat([
+        population.iloc[:common],
+        population.iloc[rows:]
+    ], ignore_index=True)
+
+    # 在共同人员中植入字段差异
+    field_diffs = {}
+    for field in ComparisonEngine.COMPARE_FIELDS:
+        mask = np.zeros(len(national), dtype=bool)
+        mask[:common] = rng.random(common) < mismatch_rate
+        national.loc[mask, field] = _plant_mismatch(national.loc[mask, field], field, rng)
+        field_diffs[field] = int(mask.sum())
+
+    # 打乱全国库顺序
+    national = national.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+    local_columns = read_template_columns('单机模板.xls')
+    national_columns = read_template_columns('全国模板.xls')
+
+    national_sources = {
+        '身份证号码': '身份证号',
+        '入党日期': '入党时间',
+        '转正日期': '转正时间',
+        '工作岗位': '个人身份',
+        '所在党支部': '所在支部',
+        '现居住地': '家庭地址',
+    }
+    national_defaults = {'学位': '无', '是否农民工': '否', '信息完整度': 85.0}
+
+    df_local = pd.DataFrame({
+        col: local[col.strip()] if col.strip() in local else None
+        for col in local_columns
+    })
+    df_national = pd.DataFrame({
+        col: national_defaults[col.strip()] if col.strip() in national_defaults
+        else national[national_sources.get(col.strip(), col.strip())]
+        if national_sources.get(col.strip(), col.strip()) in national
+        else None
+        for col in national_columns
+    })
+
+    truth = {
+        'rows_local': len(df_local),
+        'rows_national': len(df_national),
+        'local_extra': local_only,
+        'national_extra': national_only,
+        'field_diffs': field_diffs,
+        'seed': seed,
+        'reference_date': str(reference_date),
+    }
+    return df_local, df_national, truth
+
+
+def write_xlsx(df, filepath):
+    """以 xlsxwriter constant_memory 模式写出 .xlsx"""
+    workbook = xlsxwriter.Workbook(filepath, {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'strings_to_numbers': False
+    })
+    worksheet = workbook.add_worksheet('Sheet1')
+    worksheet.write_row(0, 0, [str(col) for col in df.columns])
+    columns = [df[col].to_numpy(dtype=object) for col in df.columns]
+    for row in range(len(df)):
+        for col, values in enumerate(columns):
+            value = values[row]
+            if value is not None and value == value:
+                worksheet.write(row + 1, col, value)
+    workbook.close()
+
+
+def write_xls(df, filepath):
+    """使用 xlwt 写出 .xls（最多 65535 行）"""
+    if len(df) > XLS_MAX_ROWS:
+        raise ValueError(f'.xls 最多支持 {XLS_MAX_ROWS} 行数据，当前 {len(df)} 行')
+    try:
+        import xlwt
+    except ImportError:
+        raise RuntimeError('写入 .xls 需要安装 xlwt: pip install -r requirements-dev.txt')
+
+    workbook = xlwt.Workbook(encoding='utf-8')
+    worksheet = workbook.add_sheet('Sheet1')
+    for col, name in enumerate(df.columns):
+        worksheet.write(0, col, str(name))
+    for col, name in enumerate(df.columns):
+        for row, value in enumerate(df[name].to_numpy(dtype=object), start=1):
+            if value is not None and value == value:
+                worksheet.write(row, col, value)
+    workbook.save(filepath)
+
+
+WRITERS = {'xlsx': write_xlsx, 'xls': write_xls}
+
+
+def write_roster_pair(rows, output_folder, file_format='xlsx', **kwargs):
+    """
+    生成并写出一对花名册文件及 truth 文件
+
+    Args:
+        rows: 单机库行数
+        output_folder: 输出目录
+        file_format: 'xlsx' 或 'xls'
+        **kwargs: 传给 generate_roster_pair 的参数
+
+    Returns:
+        dict: {'local': 路径, 'national': 路径, 'truth': 路径}
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    df_local, df_national, truth = generate_roster_pair(rows, **kwargs)
+
+    paths = {
+        'local': os.path.join(output_folder, f'local_{rows}.{file_format}'),
+        'national': os.path.join(output_folder, f'national_{rows}.{file_format}'),
+        'truth': os.path.join(output_folder, f'truth_{rows}.json'),
+    }
+    WRITERS[file_format](df_local, paths['local'])
+    WRITERS[file_format](df_national, paths['national'])
+    with open(paths['truth'], 'w', encoding='utf-8') as f:
+        json.dump(truth, f, ensure_ascii=False, indent=2)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成测试用花名册')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000])
+    parser.add_argument('--formats', nargs='+', choices=list(WRITERS), default=['xlsx'])
+    parser.add_argument('--output', default='benchmarks/data')
+    parser.add_argument('--local-extra-rate', type=float, default=0.01)
+    parser.add_argument('--national-extra-rate', type=float, default=0.01)
+    parser.add_argument('--mismatch-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        for file_format in args.formats:
+            if file_format == 'xls' and rows > XLS_MAX_ROWS:
+                print(f'跳过 {rows} 行 .xls（超过 {XLS_MAX_ROWS} 行上限）')
+                continue
+            paths = write_roster_pair(
+                rows,
+                os.path.join(args.output, file_format),
+                file_format,
+                local_extra_rate=args.local_extra_rate,
+                national_extra_rate=args.national_extra_rate,
+                mismatch_rate=args.mismatch_rate,
+                seed=args.seed
+            )
+            print(f"已生成 {rows} 行 .{file_format}: {paths['local']}, {paths['national']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+多名册核对命令 - 核对一个党委的党员花名册与入党申请人、发展党员、转入、转出、死亡党员名册
+
+用法:
+    python scripts/reconcile_rosters.py --dir 表格/某党委 --output 核对结果.xlsx
+    python scripts/reconcile_rosters.py 1党员花名册.xls 7转出党员名册.xls 10死亡党员名册.xls --output 核对结果.xlsx
+
+名册类型按模板表头签名、文件名、标题或表头识别，必须包含党员花名册；每种名册最多一个。
+所有名册的身份证号只建立一次共享索引，各核对项都在该索引上完成。
+"""
+import sys
+import os
+import argparse
+import logging
+
+import pandas as pd
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core import reconciliation
+from core.file_handler import allowed_file
+from core.comparison import ComparisonEngine
+from core.template_registry import TemplateRegistry
+
+TEMPLATES_FOLDER = os.path.join(PROJECT_ROOT, 'core', 'templates')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多名册交叉核对')
+    parser.add_argument('files', nargs='*', help='名册文件')
+    parser.add_argument('--dir', dest='directory', help='名册所在目录（读取其中全部 .xls/.xlsx 文件）')
+    parser.add_argument('--output', required=True, help='核对报告路径')
+    parser.add_argument('--reference-date', default=ComparisonEngine.REFERENCE_DATE,
+                        help='出生日期校验的基准日期')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    paths = list(args.files)
+    if args.directory:
+        paths.extend(
+            os.path.join(args.directory, name)
+            for name in sorted(os.listdir(args.directory))
+            if allowed_file(name) and not name.startswith('~$')
+        )
+
+    if not paths:
+        print('没有待核对的名册')
+        return 1
+
+    try:
+        results = reconciliation.reconcile_files(
+            paths, args.output, args.reference_date,
+            registry=TemplateRegistry(TEMPLATES_FOLDER).load()
+        )
+    except ValueError as e:
+        print(f'核对失败: {e}')
+        return 1
+
+    for item in results['summary'].to_dict('records'):
+        count = '-' if pd.isna(item['人数']) else item['人数']
+        print(f"{item['检查项']}: {count}（{item['状态']}）")
+    invalid = len(results['invalid_ids'])
+    if invalid:
+        print(f'无效身份证号: {invalid}')
+    print(f'报告: {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
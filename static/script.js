@@ -6,6 +6,7 @@ let nationalFileValid = false;
 document.addEventListener('DOMContentLoaded', function() {
     initializeFileUploads();
     initializeCompareButton();
+    initializeReconcile();
 });
 
 // 初始化文件上传
@@ -26,6 +27,12 @@ function initializeFileUploads() {
     }
 }
 
+// 断点续传记录在 localStorage 中的键前缀
+const UPLOAD_RESUME_PREFIX = 'chunkedUpload:';
+
+// 分块上传网络中断时的重试次数
+const UPLOAD_CHUNK_RETRIES = 3;
+
 // 处理文件上传
 async function handleFileUpload(file, type) {
     if (!file) return;
@@ -33,13 +40,6 @@ async function handleFileUpload(file, type) {
     const statusElement = document.getElementById(`${type}Status`);
     const progressElement = document.getElementById(`${type}Progress`);
 
-    // 检查文件大小（10MB）
-    const maxSize = 10 * 1024 * 1024;
-    if (file.size > maxSize) {
-        showStatus(statusElement, 'error', '文件大小超过限制（最大10MB）');
-        return;
-    }
-
     // 检查文件扩展名
     const allowedExtensions = ['.xls', '.xlsx'];
     const fileExtension = file.name.substring(file.name.lastIndexOf('.')).toLowerCase();
@@ -52,27 +52,24 @@ async function handleFileUpload(file, type) {
     showStatus(statusElement, 'validating', '正在上传和校验...');
     progressElement.style.display = 'block';
 
-    // 创建表单数据
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-        // 上传文件
-        const endpoint = type === 'local' ? '/upload/local' : '/upload/national';
-        const response = await fetch(endpoint, {
-            method: 'POST',
-            body: formData
+        // 分块上传文件（.xlsx 表头不符合模板时服务器提前终止上传）
+        const data = await uploadInChunks(file, type, function(offset) {
+            if (offset < file.size) {
+                const percent = Math.floor(offset * 100 / file.size);
+                showStatus(statusElement, 'validating', `正在上传... ${percent}%`);
+            } else {
+                showStatus(statusElement, 'validating', '上传完成，正在校验...');
+            }
         });
 
-        const data = await response.json();
-
         // 隐藏进度条
         progressElement.style.display = 'none';
 
         if (data.success) {
             if (data.valid) {
                 // 校验成功
-                showStatus(statusElement, 'success', '✓ 文件上传成功，格式校验通过');
+                showStatus(statusElement, 'success', '✓ ' + (data.message || '文件上传成功，格式校验通过'));
                 if (type === 'local') {
                     localFileValid = true;
                 } else {
@@ -114,15 +111,113 @@ async function handleFileUpload(file, type) {
     }
 }
 
+// 分块上传文件，返回最后一个请求的结果（与普通上传的响应相同）
+// 同一文件再次上传时从服务器已接收的位置继续
+async function uploadInChunks(file, type, onProgress) {
+    const resumeKey = `${UPLOAD_RESUME_PREFIX}${type}:${file.name}:${file.size}:${file.lastModified}`;
+
+    let upload = await getChunkedUpload(localStorage.getItem(resumeKey));
+    if (!upload) {
+        const response = await fetch(`/upload/${type}/chunked`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        upload = await response.json();
+        if (!upload.success) {
+            return upload;
+        }
+        localStorage.setItem(resumeKey, upload.upload_id);
+    }
+
+    let offset = upload.offset;
+    let retries = 0;
+    onProgress(offset);
+
+    while (true) {
+        let response;
+        try {
+            response = await fetch(`/upload/chunked/${upload.upload_id}`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                    'Upload-Offset': String(offset)
+                },
+                body: file.slice(offset, offset + upload.chunk_size)
+            });
+        } catch (error) {
+            // 网络中断：查询服务器已接收的字节数后重试
+            const status = retries < UPLOAD_CHUNK_RETRIES ? await getChunkedUpload(upload.upload_id) : null;
+            if (!status) {
+                throw error;
+            }
+            retries++;
+            offset = status.offset;
+            continue;
+        }
+
+        const data = await response.json();
+
+        if (response.status === 409 && retries < UPLOAD_CHUNK_RETRIES) {
+            // 服务器已接收的字节数与本地不一致，从服务器的位置继续
+            retries++;
+            offset = data.offset;
+            continue;
+        }
+
+        if (!data.success || data.valid === false || data.complete !== false) {
+            // 上传完成、表头校验失败或出错
+            localStorage.removeItem(resumeKey);
+            return data;
+        }
+
+        retries = 0;
+        offset = data.offset;
+        onProgress(offset);
+    }
+}
+
+// 查询分块上传的状态，不存在或已过期时返回 null
+async function getChunkedUpload(uploadId) {
+    if (!uploadId) return null;
+
+    try {
+        const response = await fetch(`/upload/chunked/${uploadId}`);
+        if (!response.ok) return null;
+
+        const data = await response.json();
+        return data.success ? { upload_id: uploadId, offset: data.offset, chunk_size: data.chunk_size } : null;
+    } catch (error) {
+        return null;
+    }
+}
+
 // 显示状态消息
 function showStatus(element, type, message) {
     element.className = `status-message ${type}`;
     element.textContent = message;
 }
 
+// 比对任务阶段名称
+const JOB_PHASE_LABELS = {
+    'admission': '服务器繁忙，正在排队等待比对...',
+    'read': '正在读取数据...',
+    'preprocess': '正在预处理数据...',
+    'find_differences': '正在查找人员差异...',
+    'find_field_differences': '正在比对字段差异...',
+    'save': '正在保存比对结果...'
+};
+
+// 状态轮询间隔（毫秒）
+const JOB_POLL_INTERVAL = 1000;
+
+// 当前比对任务 ID
+let currentJobId = null;
+
 // 初始化比对按钮
 function initializeCompareButton() {
     const compareBtn = document.getElementById('compareBtn');
+    const cancelBtn = document.getElementById('cancelCompareBtn');
 
     if (compareBtn) {
         compareBtn.addEventListener('click', async function() {
@@ -135,42 +230,120 @@ function initializeCompareButton() {
             compareBtn.disabled = true;
 
             // 显示加载动画
-            const progressElement = document.getElementById('compareProgress');
-            if (progressElement) {
-                progressElement.style.display = 'flex';
-            }
+            showCompareProgress(true, '正在排队等待比对...');
 
             try {
-                // 执行比对
+                // 提交比对任务
                 const response = await fetch('/compare', {
                     method: 'POST'
                 });
 
                 const data = await response.json();
 
-                if (data.success) {
-                    // 跳转到结果页面
+                if (data.success && data.cached) {
+                    // 命中缓存，直接跳转到结果页面
                     window.location.href = '/result';
+                } else if (data.success) {
+                    currentJobId = data.job_id;
+                    pollJobStatus(currentJobId);
                 } else {
                     alert('比对失败: ' + (data.error || '未知错误'));
-                    compareBtn.disabled = false;
-                    if (progressElement) {
-                        progressElement.style.display = 'none';
-                    }
+                    resetCompareState();
                 }
 
             } catch (error) {
                 console.error('比对失败:', error);
                 alert('比对失败，请重试');
-                compareBtn.disabled = false;
-                if (progressElement) {
-                    progressElement.style.display = 'none';
-                }
+                resetCompareState();
+            }
+        });
+    }
+
+    if (cancelBtn) {
+        cancelBtn.addEventListener('click', async function() {
+            if (!currentJobId) return;
+
+            cancelBtn.disabled = true;
+            try {
+                await fetch(`/jobs/${currentJobId}/cancel`, {
+                    method: 'POST'
+                });
+            } catch (error) {
+                console.error('取消比对失败:', error);
+                cancelBtn.disabled = false;
             }
         });
     }
 }
 
+// 轮询比对任务状态
+async function pollJobStatus(jobId) {
+    if (jobId !== currentJobId) return;
+
+    try {
+        const response = await fetch(`/jobs/${jobId}`);
+        const data = await response.json();
+
+        if (!data.success) {
+            alert('比对失败: ' + (data.error || '未知错误'));
+            resetCompareState();
+            return;
+        }
+
+        if (data.status === 'done') {
+            // 跳转到结果页面
+            window.location.href = '/result';
+            return;
+        }
+
+        if (data.status === 'failed') {
+            alert('比对失败: ' + (data.error || '未知错误'));
+            resetCompareState();
+            return;
+        }
+
+        if (data.status === 'cancelled') {
+            resetCompareState();
+            return;
+        }
+
+        if (data.status === 'running') {
+            showCompareProgress(true, JOB_PHASE_LABELS[data.phase] || '正在比对中，请稍候...');
+        }
+
+    } catch (error) {
+        // 网络抖动时继续轮询
+        console.error('查询比对状态失败:', error);
+    }
+
+    setTimeout(() => pollJobStatus(jobId), JOB_POLL_INTERVAL);
+}
+
+// 显示或隐藏比对进度
+function showCompareProgress(visible, message) {
+    const progressElement = document.getElementById('compareProgress');
+    if (!progressElement) return;
+
+    progressElement.style.display = visible ? 'flex' : 'none';
+
+    const textElement = progressElement.querySelector('p');
+    if (textElement && message) {
+        textElement.textContent = message;
+    }
+
+    const cancelBtn = document.getElementById('cancelCompareBtn');
+    if (cancelBtn) {
+        cancelBtn.disabled = !visible;
+    }
+}
+
+// 比对结束（失败或取消）后恢复按钮状态
+function resetCompareState() {
+    currentJobId = null;
+    showCompareProgress(false);
+    updateCompareButton();
+}
+
 // 更新比对按钮状态
 function updateCompareButton() {
     const compareBtn = document.getElementById('compareBtn');
@@ -192,6 +365,7 @@ function toggleSection(id) {
         if (icon) {
             icon.textContent = icon.classList.contains('toggle-icon') ? '▼' : '▼';
         }
+        loadVisiblePagedTables(element);
     } else {
         element.classList.add('collapsed');
         if (icon) {
@@ -199,3 +373,248 @@ function toggleSection(id) {
         }
     }
 }
+
+// 结果表格每页行数
+const RESULT_PAGE_SIZE = 50;
+
+// 初始化结果页面的分页表格，只加载当前可见的表格
+function initializePagedTables() {
+    document.querySelectorAll('.paged-table').forEach(container => {
+        container.state = {
+            page: 1,
+            sort: null,
+            order: 'asc',
+            column: '',
+            value: '',
+            q: '',
+            loaded: false
+        };
+    });
+    loadVisiblePagedTables(document);
+}
+
+// 加载指定区域内可见且尚未加载的表格
+function loadVisiblePagedTables(root) {
+    root.querySelectorAll('.paged-table').forEach(container => {
+        if (container.state && !container.state.loaded && !container.closest('.collapsed')) {
+            fetchTablePage(container);
+        }
+    });
+}
+
+// 请求一页结果数据
+async function fetchTablePage(container) {
+    const state = container.state;
+    state.loaded = true;
+
+    const params = new URLSearchParams({
+        page: state.page,
+        page_size: RESULT_PAGE_SIZE,
+        order: state.order
+    });
+    if (state.sort) params.set('sort', state.sort);
+    if (state.column && state.value) {
+        params.set('column', state.column);
+        params.set('value', state.value);
+    }
+    if (state.q) params.set('q', state.q);
+
+    try {
+        const section = encodeURIComponent(container.dataset.section);
+        const response = await fetch(`/api/results/${section}?${params}`);
+        const data = await response.json();
+
+        if (!data.success) {
+            container.innerHTML = `<p class="no-data">${escapeHtml(data.error || '加载失败')}</p>`;
+            return;
+        }
+
+        renderPagedTable(container, data);
+
+    } catch (error) {
+        console.error('加载结果失败:', error);
+        container.innerHTML = '<p class="no-data">加载失败，请重试</p>';
+        state.loaded = false;
+    }
+}
+
+// 渲染表格、筛选栏和分页栏
+function renderPagedTable(container, data) {
+    const state = container.state;
+    state.page = data.page;
+
+    if (data.columns.length === 0) {
+        container.innerHTML = '<p class="no-data">暂无数据</p>';
+        return;
+    }
+
+    const columnOptions = data.columns.map(col =>
+        `<option value="${escapeHtml(col)}"${col === state.column ? ' selected' : ''}>${escapeHtml(col)}</option>`
+    ).join('');
+
+    const headerCells = data.columns.map(col => {
+        let arrow = '';
+        if (col === state.sort) {
+            arrow = state.order === 'asc' ? ' ▲' : ' ▼';
+        }
+        return `<th data-column="${escapeHtml(col)}">${escapeHtml(col)}${arrow}</th>`;
+    }).join('');
+
+    const bodyRows = data.rows.map(row =>
+        '<tr>' + row.map(cell => `<td>${cell === null ? '' : escapeHtml(String(cell))}</td>`).join('') + '</tr>'
+    ).join('');
+
+    container.innerHTML = `
+        <div class="table-toolbar">
+            <input type="text" class="table-search" placeholder="搜索身份证号或姓名" value="${escapeHtml(state.q)}">
+            <select class="table-filter-column"><option value="">筛选列</option>${columnOptions}</select>
+            <input type="text" class="table-filter-value" placeholder="筛选值" value="${escapeHtml(state.value)}">
+            <button type="button" class="table-apply">查询</button>
+        </div>
+        <div class="table-wrapper">
+            ${data.total === 0 ? '<p class="no-data">暂无数据</p>' : `
+            <table class="result-table">
+                <thead><tr>${headerCells}</tr></thead>
+                <tbody>${bodyRows}</tbody>
+            </table>`}
+        </div>
+        <div class="table-pager">
+            <button type="button" class="table-prev"${data.page <= 1 ? ' disabled' : ''}>上一页</button>
+            <span>第 ${data.page} / ${data.pages} 页，共 ${data.total} 条</span>
+            <button type="button" class="table-next"${data.page >= data.pages ? ' disabled' : ''}>下一页</button>
+        </div>
+    `;
+
+    container.querySelectorAll('th[data-column]').forEach(th => {
+        th.addEventListener('click', function() {
+            const column = th.dataset.column;
+            if (state.sort === column) {
+                state.order = state.order === 'asc' ? 'desc' : 'asc';
+            } else {
+                state.sort = column;
+                state.order = 'asc';
+            }
+            fetchTablePage(container);
+        });
+    });
+
+    const applyFilters = function() {
+        state.q = container.querySelector('.table-search').value.trim();
+        state.column = container.querySelector('.table-filter-column').value;
+        state.value = container.querySelector('.table-filter-value').value.trim();
+        state.page = 1;
+        fetchTablePage(container);
+    };
+
+    container.querySelector('.table-apply').addEventListener('click', applyFilters);
+    container.querySelectorAll('.table-toolbar input').forEach(input => {
+        input.addEventListener('keydown', function(e) {
+            if (e.key === 'Enter') applyFilters();
+        });
+    });
+
+    container.querySelector('.table-prev').addEventListener('click', function() {
+        state.page -= 1;
+        fetchTablePage(container);
+    });
+    container.querySelector('.table-next').addEventListener('click', function() {
+        state.page += 1;
+        fetchTablePage(container);
+    });
+}
+
+// 转义 HTML 特殊字符
+function escapeHtml(text) {
+    return String(text)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+// 初始化多名册核对
+function initializeReconcile() {
+    const fileInput = document.getElementById('reconcileFiles');
+    const reconcileBtn = document.getElementById('reconcileBtn');
+    const statusElement = document.getElementById('reconcileStatus');
+    if (!fileInput || !reconcileBtn) return;
+
+    fileInput.addEventListener('change', function() {
+        const count = fileInput.files.length;
+        reconcileBtn.disabled = count === 0;
+        showStatus(statusElement, count ? 'success' : '', count ? `已选择 ${count} 个名册` : '');
+    });
+
+    reconcileBtn.addEventListener('click', async function() {
+        reconcileBtn.disabled = true;
+
+        try {
+            // 逐个分块上传名册（不受单次请求大小限制）
+            const files = [];
+            for (const file of fileInput.files) {
+                const data = await uploadInChunks(file, 'reconcile', function(offset) {
+                    const percent = Math.floor(offset * 100 / file.size);
+                    showStatus(statusElement, 'validating', `正在上传 ${file.name}... ${percent}%`);
+                });
+                if (!data.success) {
+                    showStatus(statusElement, 'error', `✗ ${file.name}: ${data.error || '上传失败'}`);
+                    return;
+                }
+                files.push({ upload_id: data.upload_id, filename: file.name });
+            }
+
+            // 提交核对任务
+            showStatus(statusElement, 'validating', '正在排队等待核对...');
+            const response = await fetch('/reconcile', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ files: files })
+            });
+            const data = await response.json();
+            if (!data.success) {
+                showStatus(statusElement, 'error', '✗ ' + (data.error || '核对失败'));
+                return;
+            }
+
+            const status = await waitForReconcile(data.job_id, statusElement);
+            if (status.status !== 'done') {
+                showStatus(statusElement, 'error', '✗ ' + (status.error || '核对失败'));
+                return;
+            }
+
+            // 下载核对报告
+            const link = document.createElement('a');
+            link.href = `/reconcile/${data.job_id}/download`;
+            link.click();
+            showStatus(statusElement, 'success', '✓ 核对完成，报告已下载');
+
+        } catch (error) {
+            console.error('核对失败:', error);
+            showStatus(statusElement, 'error', '✗ 核对失败，请重试');
+        } finally {
+            reconcileBtn.disabled = fileInput.files.length === 0;
+        }
+    });
+}
+
+// 轮询多名册核对任务直到结束，返回最终状态
+async function waitForReconcile(jobId, statusElement) {
+    while (true) {
+        try {
+            const response = await fetch(`/reconcile/${jobId}`);
+            const data = await response.json();
+            if (!data.success || ['done', 'failed', 'cancelled'].includes(data.status)) {
+                return data;
+            }
+            if (data.status === 'running') {
+                showStatus(statusElement, 'validating',
+                    data.phase === 'admission' ? '服务器繁忙，正在排队等待核对...' : '正在核对...');
+            }
+        } catch (error) {
+            // 网络抖动时继续轮询
+            console.error('查询核对状态失败:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}